@@ -140,6 +140,7 @@ class OscilloMainMenu():
         button_attributes = {"Averaged Waveforms":self.pwf.average_waveform,
                             "Gaussian Timing":self.pwf.gaussian_timing,
                             "Gaussian Timing (variable zoom)":self.pwf.gaussian_timing_zoom,
+                            "Gaussian Timing (all instruments)":self.pwf.gaussian_timing_instruments,
                             "Cross Correlate Envelopes":self.pwf.cross_correlation_envelopes_zoom,
                             "Cross Correlate Waveforms":self.pwf.cross_correlation_waveforms_average_old_data}
                             
@@ -181,6 +182,8 @@ class OscilloMainMenu():
         
         buttons = []
         button_attributes = {"Restore Oscilloscope Settings":self.cf.scope_reset,
+                            "Save Oscilloscope Settings":self.cf.save_scope_profile,
+                            "Compare Averaging Strategies":self.cf.compare_averaging,
 
                             }
         for key in button_attributes:
@@ -200,7 +203,8 @@ class OscilloMainMenu():
         
         buttons = []
         button_attributes = {"Graph Data From File":self.cf.scope_reset,
-                            "Sense Temperature":self.ts.gaussian_sensing
+                            "Sense Temperature":self.ts.gaussian_sensing,
+                            "Sense Temperature (all instruments)":self.ts.gaussian_sensing_instruments
                             }
         for key in button_attributes:
             button = tk.Button(self.other_options_frame,text=key,command=button_attributes[key],width=30)
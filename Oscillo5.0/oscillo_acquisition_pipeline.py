@@ -0,0 +1,232 @@
+'''
+@author Manish Roy
+
+This module contains the acquisition pipeline. Without it, the collection options collect a
+waveform, process it, and only then collect the next waveform, so the oscilloscope sits idle
+while the data is being processed. The pipeline collects waveforms in a background thread and
+places them in a queue, while the waveforms already in the queue are processed. The queue has
+a limited size. When processing falls behind and the queue is full, the pipeline either waits
+for room in the queue (backpressure) or drops a waveform, depending on its drop policy.
+
+The pipeline can also collect from several oscilloscopes at once. Each oscilloscope gets its own
+collecting thread, and the waveforms from all of them are merged into the same queue, tagged with
+the oscilloscope they came from. The throughput then grows with the number of oscilloscopes, as
+long as the processing keeps up.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import the threading library. The waveforms are collected and processed in separate threads.
+import threading
+#Import the queue library. The queue passes the waveforms from the collecting thread to the processing threads.
+import queue
+#Import time. This is used to measure the number of waveforms processed per minute.
+import time as t
+
+#These are the things that the pipeline can do when the queue is full.
+# "block" waits until there is room in the queue, so every waveform collected is processed.
+# "drop_oldest" throws away the oldest waveform in the queue, so the newest waveforms are processed.
+# "drop_newest" throws away the waveform that was just collected.
+DROP_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+
+class source_exhausted(Exception):
+    '''
+    This exception is raised by an acquire function when there are no more waveforms to collect,
+    which happens when saved waveforms are replayed (see the oscillo_replay.py module). It isn't
+    an error. The waveforms already in the queue are still processed, and then the pipeline stops.
+    '''
+    pass
+
+
+class acquisition_pipeline():
+
+    def __init__(self, acquire, process, depth=4, workers=1, drop_policy='block', limit=None):
+        '''
+        acquire is called with no arguments to collect one waveform. process is called with what
+        acquire returned, and its result is handed back by the run method. acquire can also be a
+        dictionary of such functions, keyed by a tag (like the name of an oscilloscope). Each one is
+        then called in its own collecting thread, and the index handed back by run becomes a
+        (tag, index) pair. depth is the number of
+        waveforms that the queue can hold. With one worker, the waveforms are processed in the
+        thread that calls run, which must be the case if the processing shows plots or updates the
+        GUI. With more workers, the waveforms are processed in that many background threads.
+        If limit is given, each collecting thread stops after collecting that many waveforms, so a
+        faster oscilloscope can't take the place of a slower one.
+        '''
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError("drop_policy must be one of {}".format(DROP_POLICIES))
+        self.acquire = acquire
+        self.process = process
+        self.depth = depth
+        self.workers = workers
+        self.drop_policy = drop_policy
+        self.limit = limit
+        #the waveforms waiting to be processed
+        self.frames = queue.Queue(maxsize=depth)
+        #the results waiting to be handed back (only used with more than one worker)
+        self.results = queue.Queue()
+        #this is set when no more waveforms are needed
+        self.stop_event = threading.Event()
+        #counters used to report the throughput of the pipeline
+        self.acquired = 0
+        self.processed = 0
+        self.dropped = 0
+        self.started = None
+        self.error = None
+        #the number of collecting threads whose source has run out of waveforms
+        self.exhausted = 0
+        #the counters are changed by every collecting thread
+        self.counter_lock = threading.Lock()
+
+    def put(self, frame):
+        '''
+        This method places a waveform in the queue, applying the drop policy if the queue is full.
+        '''
+        if self.drop_policy == 'block':
+            #wait for room in the queue, but give up if the pipeline is stopped
+            while not self.stop_event.is_set():
+                try:
+                    self.frames.put(frame, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        elif self.drop_policy == 'drop_newest':
+            try:
+                self.frames.put_nowait(frame)
+            except queue.Full:
+                with self.counter_lock:
+                    self.dropped += 1
+
+        else:
+            #make room by removing the oldest waveform. The loop is needed because a worker may take
+            # a waveform between the two steps.
+            while True:
+                try:
+                    self.frames.put_nowait(frame)
+                    return
+                except queue.Full:
+                    try:
+                        self.frames.get_nowait()
+                        with self.counter_lock:
+                            self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def producer(self, acquire, tag=None):
+        '''
+        This method runs in a collecting thread. It keeps collecting waveforms with acquire until
+        the pipeline is stopped, or until it has collected limit waveforms. If a tag is given, each
+        waveform is tagged with it.
+        '''
+        index = 0
+        try:
+            while not self.stop_event.is_set():
+                if self.limit is not None and index >= self.limit:
+                    #this source has collected its share, which is the same as running out
+                    raise source_exhausted()
+                frame = acquire()
+                with self.counter_lock:
+                    self.acquired += 1
+                index += 1
+                if tag is None:
+                    self.put((index, frame))
+                else:
+                    self.put(((tag, index), frame))
+        except source_exhausted:
+            #there is nothing more to collect, so let the waveforms in the queue be processed
+            with self.counter_lock:
+                self.exhausted += 1
+        except Exception as error:
+            #hand the error to the thread that called run
+            self.error = error
+            self.stop_event.set()
+
+    def worker(self):
+        '''
+        This method runs in each of the worker threads when there is more than one worker.
+        '''
+        while not self.stop_event.is_set():
+            try:
+                index, frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self.results.put((index, self.process(frame)))
+            except Exception as error:
+                self.error = error
+                self.stop_event.set()
+
+    def run(self, n):
+        '''
+        This method starts the pipeline and hands back (index, result) for each of the first n
+        waveforms that are processed. The index is the number of the waveform in the order it
+        was collected, so gaps in the index show which waveforms were dropped. The pipeline is
+        stopped when n results have been handed back, when every source has run out of waveforms
+        and they have all been processed, or if collecting or processing fails.
+        '''
+        self.started = t.time()
+        #start one collecting thread, or one for each tag
+        if isinstance(self.acquire, dict):
+            threads = [threading.Thread(target=self.producer, args=(self.acquire[tag], tag), daemon=True)
+                       for tag in self.acquire]
+        else:
+            threads = [threading.Thread(target=self.producer, args=(self.acquire,), daemon=True)]
+        producers = len(threads)
+        if self.workers > 1:
+            for i in range(self.workers):
+                threads.append(threading.Thread(target=self.worker, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while self.processed < n:
+                if self.error is not None:
+                    raise self.error
+
+                #wait for the next result
+                if self.workers > 1:
+                    source = self.results
+                else:
+                    source = self.frames
+                try:
+                    item = source.get(timeout=0.1)
+                except queue.Empty:
+                    #stop if every source has run out, and every waveform they collected is finished
+                    with self.counter_lock:
+                        if self.exhausted == producers and self.processed + self.dropped >= self.acquired:
+                            break
+                    continue
+
+                #with one worker, the waveform is processed here, in the calling thread
+                if self.workers > 1:
+                    index, result = item
+                else:
+                    index, frame = item
+                    result = self.process(frame)
+
+                self.processed += 1
+                yield index, result
+
+            if self.error is not None:
+                raise self.error
+
+        finally:
+            #stop the threads, and wait for them to finish what they are doing
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+
+    def report(self):
+        '''
+        This method returns a short summary of the throughput of the pipeline.
+        '''
+        elapsed = t.time() - self.started
+        if elapsed > 0:
+            rate = 60 * self.processed / elapsed
+        else:
+            rate = 0
+        return "Collected {}, processed {}, dropped {} waveforms ({:.1f} per minute).".format(
+            self.acquired, self.processed, self.dropped, rate)
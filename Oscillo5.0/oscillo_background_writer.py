@@ -0,0 +1,227 @@
+'''
+@author Manish Roy
+
+This module contains the background writer. The collection options used to save each waveform in
+a new thread of its own, so that the collection could continue while the waveform was saved. When
+the waveforms were collected faster than they could be saved, the threads (and the waveforms they
+were holding) piled up, the memory grew without limit, and anything that hadn't been saved yet was
+lost if the program was closed.
+
+The background writer saves the waveforms with a fixed number of threads. The waveforms waiting to
+be saved are held in a queue whose size is limited by the number of bytes it holds. When the queue
+is full, the writer either waits for room in the queue (backpressure) or drops a waveform, depending
+on its drop policy. The writer is flushed before the program exits, so that every waveform that was
+handed to it is saved.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import the threading library. The waveforms are saved in separate threads.
+import threading
+#Import collections. Each writing thread has its own queue of waveforms.
+import collections
+#Import atexit. This is used to flush the writer before the program exits.
+import atexit
+#Import the operating system. This is used to read the settings of the writer from the environment.
+import os
+#Import time. This is used to measure the rate at which the waveforms are saved.
+import time as t
+#Import numpy. The size of a waveform is measured from its arrays.
+import numpy as np
+#Import the drop policies. They mean the same thing here as in the acquisition pipeline.
+from oscillo_acquisition_pipeline import DROP_POLICIES
+
+#This is the number of threads that save the waveforms.
+WRITER_WORKERS = int(os.environ.get('OSCILLO_WRITER_WORKERS', '2'))
+
+#This is the number of bytes (of waveform arrays) that can wait to be saved before the writer is full.
+WRITER_CAPACITY = int(os.environ.get('OSCILLO_WRITER_CAPACITY', str(256 * 1024 * 1024)))
+
+#This is what the writer does when it is full (see DROP_POLICIES in the oscillo_acquisition_pipeline.py module).
+WRITER_DROP_POLICY = os.environ.get('OSCILLO_WRITER_DROP_POLICY', 'block')
+
+#This is the writer that is shared by all of the collection options (see get_writer).
+shared_writer = None
+#This lock protects the shared writer while it is created.
+writer_lock = threading.Lock()
+
+
+def get_writer():
+    '''
+    This function returns the shared background writer. The writer is created the first time it is
+    requested, and it is flushed and closed when the program exits.
+    '''
+    global shared_writer
+    with writer_lock:
+        if shared_writer is None:
+            shared_writer = background_writer(WRITER_WORKERS, WRITER_CAPACITY, WRITER_DROP_POLICY)
+            atexit.register(shared_writer.close)
+        return shared_writer
+
+
+def size_of(args):
+    '''
+    This function returns the number of bytes held by the arrays among the arguments of a save.
+    '''
+    size = 0
+    for arg in args:
+        if isinstance(arg, np.ndarray):
+            size += arg.nbytes
+    return size
+
+
+class background_writer():
+
+    def __init__(self, workers=WRITER_WORKERS, capacity=WRITER_CAPACITY, drop_policy='block'):
+        '''
+        workers is the number of threads that save the waveforms. capacity is the number of bytes
+        that can wait to be saved. drop_policy is what is done when a waveform is handed to the
+        writer while it is full.
+        '''
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError("drop_policy must be one of {}".format(DROP_POLICIES))
+        self.capacity = capacity
+        self.drop_policy = drop_policy
+        #each thread has its own queue, so that saves with the same key are done in order
+        self.queues = [collections.deque() for i in range(workers)]
+        #this protects everything below, and is used to wake the threads
+        self.condition = threading.Condition()
+        #the saves that haven't finished yet, and the bytes that they hold
+        self.pending = 0
+        self.pending_bytes = 0
+        #counters used to report the throughput of the writer
+        self.count = 0
+        self.written = 0
+        self.written_bytes = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self.errors = []
+        self.closing = False
+        self.threads = [threading.Thread(target=self.worker, args=(i,), daemon=True) for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, function, *args, key=None):
+        '''
+        This method hands a save to the writer. function is called with args in one of the writing
+        threads. Saves that are given the same key (like a run file) are done one at a time, in the
+        order they were submitted. It returns False if the save was dropped because the writer was full.
+        '''
+        size = size_of(args)
+        with self.condition:
+            if self.closing:
+                raise RuntimeError("the background writer is closed")
+
+            #a save that is bigger than the whole queue is only accepted when the queue is empty
+            while self.pending > 0 and self.pending_bytes + size > self.capacity:
+                if self.drop_policy == 'block':
+                    self.condition.wait()
+                elif self.drop_policy == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                elif not self.drop_oldest():
+                    #the oldest saves are already being written, so wait for them
+                    self.condition.wait()
+
+            #choose the thread that does the save
+            if key is None:
+                queue = self.queues[self.count % len(self.queues)]
+            else:
+                queue = self.queues[hash(key) % len(self.queues)]
+            queue.append((self.count, size, function, args))
+            self.count += 1
+            self.pending += 1
+            self.pending_bytes += size
+            self.condition.notify_all()
+            return True
+
+    def drop_oldest(self):
+        '''
+        This method removes the oldest save that is still waiting in a queue. It must be called while
+        holding the condition. It returns False if there is nothing waiting to be removed.
+        '''
+        oldest = None
+        for queue in self.queues:
+            #only saves that hold waveforms are dropped, so that a run file is still closed
+            if len(queue) > 0 and queue[0][1] > 0 and (oldest is None or queue[0][0] < oldest[0][0]):
+                oldest = queue
+        if oldest is None:
+            return False
+        number, size, function, args = oldest.popleft()
+        self.pending -= 1
+        self.pending_bytes -= size
+        self.dropped += 1
+        return True
+
+    def worker(self, i):
+        '''
+        This method runs in each of the writing threads. It saves the waveforms in its queue until
+        the writer is closed.
+        '''
+        queue = self.queues[i]
+        while True:
+            with self.condition:
+                while len(queue) == 0 and not self.closing:
+                    self.condition.wait()
+                if len(queue) == 0:
+                    return
+                number, size, function, args = queue.popleft()
+
+            started = t.time()
+            try:
+                function(*args)
+            except Exception as error:
+                #keep the error, so that it can be raised by flush
+                with self.condition:
+                    self.errors.append(error)
+
+            with self.condition:
+                self.busy_time += t.time() - started
+                self.pending -= 1
+                self.pending_bytes -= size
+                self.written += 1
+                self.written_bytes += size
+                self.condition.notify_all()
+
+    def flush(self):
+        '''
+        This method waits until every save handed to the writer is finished. If any of them failed,
+        the first error is raised.
+        '''
+        with self.condition:
+            while self.pending > 0:
+                self.condition.wait()
+            errors = self.errors
+            self.errors = []
+        if len(errors) > 0:
+            raise errors[0]
+
+    def close(self):
+        '''
+        This method waits for every save to finish, and then stops the writing threads.
+        '''
+        with self.condition:
+            if self.closing:
+                return
+        try:
+            self.flush()
+        finally:
+            with self.condition:
+                self.closing = True
+                self.condition.notify_all()
+            for thread in self.threads:
+                thread.join()
+
+    def report(self):
+        '''
+        This method returns a short summary of the queue and of the throughput of the writer.
+        '''
+        with self.condition:
+            #the rate of a writing thread while it is saving
+            if self.busy_time > 0:
+                rate = self.written_bytes / self.busy_time / 1e6
+            else:
+                rate = 0
+            return "Saving: {} waiting ({:.1f} MB), {} saved ({:.1f} MB/s per thread), {} dropped.".format(
+                self.pending, self.pending_bytes / 1e6, self.written, rate, self.dropped)
@@ -10,15 +10,25 @@ its contribution to the overal functionality of the method.
 '''
 Import the libraries and modules that are needed to run the methods in this module.
 '''
-#Import unpack from struct. This converts the data from the oscilloscope into usable numbers.
-from struct import unpack
 #Import the plotting library for plotting data.
 import matplotlib.pyplot as plt
 #Import numpy. This library contains many methods used in vectorized calculations, and other
 # operations involving arrays.
 import numpy as np
-#Import the visa. This is a library that finds the oscilloscope and allows python to interact with it.
-import visa 
+#Import the module that holds the shared connection to the oscilloscope. (See the oscillo_scope_session.py module.)
+import oscillo_scope_session
+#Import the data processing functions. These are used to measure the noise in the waveforms.
+import oscillo_data_processing_functions
+#Import the binary waveform files. (See the oscillo_waveform_files.py module.)
+import oscillo_waveform_files as owf
+#Import the run files. (See the oscillo_run_files.py module.)
+import oscillo_run_files as orf
+#Import the background writer. (See the oscillo_background_writer.py module.)
+import oscillo_background_writer as obw
+#Import the settings profiles. (See the oscillo_scope_profiles.py module.)
+import oscillo_scope_profiles as osp
+#Import the module that contains the dialog box functions. (See the oscillo_option_windows.py module.)
+import oscillo_option_windows as oow
 #Import the operating system. This allows python to run terminal commands.
 import os
 #Import datetime. This allows python to create time stamps for naming files. It also allows it to 
@@ -26,9 +36,39 @@ import os
 import datetime as dt
 #Import time. This like datetime, but it is higher level, and easier to use in many situations.
 import time as t
+#Import the threading library. This is used to check which thread a message is being printed from.
+import threading
 #import the threading library. This allows some of the more time-consuming processes to be completed in the background.
 import _thread as th
 
+#This is the number of points in the oscilloscope's record.
+RECORD_LENGTH = 1000000
+
+#These are the ways that several waveforms can be averaged (see the retrieve_average method).
+# "host" collects every waveform and averages them here, "scope" lets the oscilloscope average them
+# and sends only the result, and "fastframe" captures every waveform in one sequence and sends them
+# all in a single transfer.
+AVERAGING_STRATEGIES = ('host', 'scope', 'fastframe')
+#This is the strategy used when none is given. It can be chosen with the OSCILLO_AVERAGING environment variable.
+AVERAGING_STRATEGY = os.environ.get('OSCILLO_AVERAGING', 'host')
+#The oscilloscope can only average a power of two waveforms, from the first to the second of these. It
+# quietly changes any other number, so the number is rounded here instead (see scope_average_count).
+SCOPE_AVERAGES = (2, 512)
+
+#These are the ways that the zoomed out and zoomed in waveforms can be captured (see the retrieve_dual_range
+# method). "zoom" changes the vertical scale of channel 1 between two triggers, "channels" captures the same
+# trigger on channel 1 and channel 2 (which must both be connected to the transducer) at different scales.
+DUAL_RANGE_MODES = ('zoom', 'channels')
+#This is the mode used when none is given. It can be chosen with the OSCILLO_DUAL_RANGE environment variable.
+DUAL_RANGE_MODE = os.environ.get('OSCILLO_DUAL_RANGE', 'zoom')
+
+#These are the ways that the waveforms of a long collection can be saved (see the open_run method). "run"
+# saves every frame whole, in a run file, and "archive" saves keyframes and compressed differences, in an
+# archive file that is much smaller. (See the oscillo_run_files.py module.)
+RUN_FORMATS = ('run', 'archive')
+#This is the format used when none is given. It can be chosen with the OSCILLO_RUN_FORMAT environment variable.
+RUN_FORMAT = os.environ.get('OSCILLO_RUN_FORMAT', 'run')
+
 class data_collection(): 
 
     def __init__(self,rootwindow,strvar):
@@ -44,7 +84,13 @@ class data_collection():
         '''
         This method is alot like the built-in print() method in python. But instead of 
         "printing" the text to the terminal, it displays it in the GUI message center.
+        The GUI can only be updated from the main thread, so when this method is called from
+        a background thread (like the acquisition pipeline), the text is printed instead.
         '''
+        #check if this is a background thread
+        if threading.current_thread() is not threading.main_thread():
+            print(text)
+            return
         #Set the inherited string variable to the new text.
         self.strvar.set(text)
         #update the GUI window so that the text immediately appears.
@@ -61,6 +107,9 @@ class data_collection():
         in the particular collection method being used. If this is done, then the setup_scope()
         method must be commented out of the respective collection option, and all lines that attempt
         to send settings to the oscilloscope must be commented out as well.
+
+        To run the collection options without an oscilloscope and without changing any code, use the
+        simulated oscilloscope instead (see the oscillo_scope_simulator.py module).
         '''
 
         #fake data for development. This is just a waveform that I collected on the 
@@ -138,14 +187,129 @@ class data_collection():
         #return the name of the directory for use by other methods
         return(dir_name)
 
-    def save_me(self,path_name,time,amplitude,metal,DL,freq,gain):
+    def recover_codes(self, time, amplitude, preamble):
+
+        '''
+        This method undoes the scaling done by retrieve_waveform. It returns the codes of the
+        analog-to-digital converter, and the position of the first point in the oscilloscope's
+        record, so that the time axis can be rebuilt.
+        '''
+
+        ymult, yzero, yoff, xincr, xzero = preamble
+        codes = owf.volts_to_codes(amplitude, ymult, yzero, yoff)
+        if len(time) > 0:
+            first_point = int(round(time[0] / xincr))
+        else:
+            first_point = 0
+        return codes, first_point
+
+    def open_run(self, path_name, metal, DL, freq, gain, run_format=None):
+
+        '''
+        This method creates a run file (see the oscillo_run_files.py module) in the directory created
+        by the make_directory method. Every waveform of a collection is added to this one file with
+        the save_frame method, instead of being saved to a file of its own. The run must be closed
+        with its close method when the collection is finished. run_format is one of RUN_FORMATS. If
+        it is "archive", the frames are saved as keyframes and compressed differences.
+        '''
+
+        if run_format is None:
+            run_format = RUN_FORMAT
+        if run_format not in RUN_FORMATS:
+            raise ValueError("run_format must be one of {}".format(RUN_FORMATS))
+
+        #obtain a new time stamp
+        mytime = self.get_time_stamp()
+        parameters = {'metal': metal, 'DL': DL, 'freq': freq, 'gain': gain, 'time_stamp': mytime}
+        #name the file
+        file_name_run = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime
+        if run_format == 'archive':
+            return orf.archive_writer(file_name_run + orf.ARCHIVE_EXTENSION, parameters)
+        return orf.run_writer(file_name_run + orf.EXTENSION, parameters)
+
+    def save_frame(self, run, time, amplitude, preamble, time_stamp=None):
+
+        '''
+        This method adds a raw waveform to the end of a run file opened by the open_run method.
+        preamble is the preamble of the waveform (see the preamble method of the session), and
+        time_stamp is when it was collected (now, if it isn't given).
+        '''
+
+        if time_stamp is None:
+            time_stamp = t.time()
+        ymult, yzero, yoff, xincr, xzero = preamble
+        codes, first_point = self.recover_codes(time, amplitude, preamble)
+        return run.append(codes, ymult, yzero, yoff, xincr, xzero, first_point, time_stamp=time_stamp)
+
+    def save_later(self,path_name,time,amplitude,metal,DL,freq,gain,preamble=None):
+
+        '''
+        This method saves a waveform with the save_me method in the background, so that the collection
+        can continue while it is saved. The waveform is handed to the shared background writer (see the
+        oscillo_background_writer.py module), which limits the memory used by the waveforms waiting to
+        be saved. It returns False if the waveform was dropped because the writer was full.
+        '''
+
+        return obw.get_writer().submit(self.save_me, path_name, time, amplitude, metal, DL, freq, gain, preamble)
+
+    def save_frame_later(self, run, time, amplitude, preamble, time_stamp=None):
+
+        '''
+        This method adds a waveform to a run file in the background (see the save_frame method). The
+        frames of a run are always written in the order that they were collected. The time stamp is
+        taken now, when the frame has just been collected, and not when the writer gets to it, which
+        can be much later when the writer is busy.
+        '''
+
+        if time_stamp is None:
+            time_stamp = t.time()
+        return obw.get_writer().submit(self.save_frame, run, time, amplitude, preamble, time_stamp, key=run)
+
+    def close_run_later(self, run):
+
+        '''
+        This method closes a run file once every frame handed to the background writer has been written.
+        '''
+
+        obw.get_writer().submit(run.close, key=run)
+
+    def finish_saving(self):
+
+        '''
+        This method waits until every waveform handed to the background writer has been saved, and
+        shows the throughput of the writer in the message center.
+        '''
+
+        writer = obw.get_writer()
+        self.myprint("Finishing saving the data...\n" + writer.report())
+        writer.flush()
+        self.myprint(writer.report())
+
+    def save_me(self,path_name,time,amplitude,metal,DL,freq,gain,preamble=None):
         
         '''
         This method saves the raw or processed waveform data provided in the form of two arrays. The data
         is saved in the directory created by the make_directory method. And a new time stamp is given to 
         the file to distinguish it from other data that were collected using the same parameters.
+
+        If the preamble of the waveform is given (see the preamble method of the session), the waveform is
+        saved as a binary .osc file (see the oscillo_waveform_files.py module), which stores the codes sent
+        by the oscilloscope instead of text. Otherwise it is saved as a CSV file like before.
         '''
 
+        if preamble is not None:
+            #obtain a new time stamp
+            mytime = self.get_time_stamp()
+            #name the file
+            file_name_osc = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + owf.EXTENSION
+            #recover the codes of the analog-to-digital converter from the volts
+            ymult, yzero, yoff, xincr, xzero = preamble
+            codes, first_point = self.recover_codes(time, amplitude, preamble)
+            parameters = {'metal': metal, 'DL': DL, 'freq': freq, 'gain': gain, 'time_stamp': mytime}
+            #save the file to the path name created in the make_directory method
+            owf.write_waveform(file_name_osc, codes, ymult, yzero, yoff, xincr, xzero, first_point, parameters)
+            return
+
         #create an array of arrays
         myarray = np.array([time,amplitude])
         #transpose the arrays so that instead of being row vectors, they are now column vectors
@@ -190,54 +354,53 @@ class data_collection():
 
 
 
-    def setup_scope(self):
+    def setup_scope(self, xend=None, resource_name=None):
 
         '''
-        This method uses the visa library to identify the oscilloscope instrument. It then
-        creates an object that serves as a handle for the instrument so that other methods 
-        can interact with it. Additionally, this method sends some key settings to the oscilloscope
-        to ensure that the proper data set is retrieved.
+        This method retrieves the shared session for the oscilloscope (see the oscillo_scope_session.py
+        module). The session serves as a handle for the instrument so that other methods can interact
+        with it. The instrument is only opened the first time this method is called. After that, the
+        session just checks that the instrument is still responding. Additionally, this method makes
+        sure that the key settings are in place so that the proper data set is retrieved. Settings that
+        are already in place are not sent again.
+
+        If xend is given, only the part of the record between the trigger point and xend is sent by the
+        oscilloscope (see set_acquisition_window). Otherwise the whole record is sent. If resource_name
+        is given, that oscilloscope is used instead of the one in SCOPE_RESOURCE.
         '''
 
         #During development, the oscilloscope was prone to crashing. This try block catches that problem
         # ans alerts the user that the oscilloscope needs to be rebooted.
         try:
 
-            #create a resource manager object. This object contains a list of all the instruments connected to the 
-            # computer.
-            rm = visa.ResourceManager()
-
-            #create an object that acts as a handel for the oscilloscope. The argument presented her is the name of the
-            # oscilloscope that was used during development. If a new oscilloscope is being used, then the name of the new
-            # oscilloscope must be discovered by running the following commands in a terminal.
-            '''
-            >python
-            >>>import visa
-            >>>rm = visa.ResourceManager()
-            >>>rm.list_resources()
-            '''
-            #the last line displays a list of all the instruments connected to the computer. Select the name that corresponds
-            # to the oscilloscope that you are using, and place it here in the argument below.
-            scope = rm.open_resource('USB0::0x0699::0x0378::C011202::INSTR')
+            #retrieve the shared session. If a new oscilloscope is being used, then the name of the new
+            # oscilloscope must be placed in the SCOPE_RESOURCE variable of the oscillo_scope_session.py module.
+            if resource_name is None:
+                resource_name = oscillo_scope_session.SCOPE_RESOURCE
+            scope = oscillo_scope_session.get_session(resource_name)
+
+            #open the instrument if it is not open yet, or reconnect to it if it has stopped responding.
+            scope.connect()
 
             #these are settings that the oscilloscope needs in order to collect the spectrum properly
             self.myprint("Sending Parameters...")
             #The data source needs to be Channel 1 if that is the channel being used.
-            scope.write('DATA:SOU CH1')
-            #I have no idea what this one does.
-            scope.write('DATA:WIDTH 1')
+            scope.configure('DATA:SOU CH1')
+            #This is the number of bytes sent for each point. (retrieve_dual_range uses 2 in high resolution mode.)
+            scope.configure('DATA:WIDTH 1')
+            #Each trigger is acquired as a single waveform. (retrieve_average and retrieve_dual_range change this.)
+            scope.configure('ACQUIRE:MODE SAMPLE')
             #This tells the oscilloscope how to encode the data. Other encoding formats have proven not to work. 
-            scope.write('DATA:ENC RPB')
-            #The data collected starts at data point 1
-            scope.write('DATA:START 1') 
-            #The data collected ends at 1 million data points
-            scope.write('DATA:STOP 1000000') 
-            #Full resolution needs to be collected. If you replace "FULL" with "REDUCED" then the data collection will be faster
-            # but you will lose a considerable ammount of resolution.
-            scope.write('DATA:RESOLUTION FULL')
+            scope.configure('DATA:ENC RPB')
+            #Full resolution is collected. If you replace "FULL" with "REDUCED" then the data collection will be faster
+            # and the waveforms will have far fewer points. The peaks are found between the samples (see the
+            # oscillo_peak_interpolation.py module), so the times of flight keep most of their precision.
+            scope.configure('DATA:RESOLUTION FULL')
             #This indicates the amount of vertical offeset from the y=0 axis. If this is not set to zero,
             #  then the envelope computation will not work. 
-            scope.write("CH1:OFFSET 0.0E+0") 
+            scope.configure("CH1:OFFSET 0.0E+0") 
+            #choose the part of the record that the oscilloscope sends
+            self.set_acquisition_window(scope, xend)
             
 
             
@@ -248,33 +411,113 @@ class data_collection():
         #return the object handle.
         return scope
 
-    def scope_reset(self):
+    def set_acquisition_window(self, scope, xend=None):
+
+        '''
+        Most of the record is thrown away by clip_tails, which keeps only the data between the signal
+        trigger point and xend. Instead of transferring the whole record and then clipping it, this
+        method tells the oscilloscope to send only that part of the record (with one extra point on each
+        side, so that clip_tails still finds both ends). Transfer time grows with the number of points,
+        so this makes every collection faster. If xend is None, the whole record is sent.
+
+        The time axis returned by retrieve_waveform still measures time from the start of the record, so
+        clip_tails and the processing methods work the same way whether or not the window is set.
+        '''
+
+        #send the whole record
+        if xend is None:
+            #The data collected starts at data point 1
+            scope.configure('DATA:START 1')
+            #The data collected ends at 1 million data points
+            scope.configure('DATA:STOP {}'.format(RECORD_LENGTH))
+            return
+
+        #obtain the horizontal scale factor and the signal trigger point
+        ymult, yzero, yoff, xincr, xzero = scope.preamble()
+
+        #find the record points of the trigger point and of xend, the same way clip_tails does.
+        # DATA:START and DATA:STOP count from one, not zero.
+        start = max(int(np.floor(abs(xzero) / xincr)) - 1, 0)
+        stop = min(int(np.ceil(xend / xincr)) + 2, RECORD_LENGTH)
+
+        #only send the setting if it is different from what the oscilloscope already has
+        scope.configure('DATA:START {}'.format(start + 1))
+        scope.configure('DATA:STOP {}'.format(stop))
+
+    def scope_reset(self, profile=None):
 
         '''
-        This method resets the oscilloscope settings. The module that contains the settings is 
-        very large, and should only be imported if the oscilloscope needs to be reset. That is
-        why this import line appears here instead of at the top of this module. 
+        This method resets the oscilloscope settings to a settings profile (see the
+        oscillo_scope_profiles.py module). If no profile is given, the user is asked which one to
+        restore. Only the settings that are different from the profile are sent, so a reset
+        between runs is quick.
         '''
         
+        #ask the user which profile to restore
+        if profile is None:
+            profile = oow.get_value(self.rootwindow, "Which settings profile would you like to restore?\n\
+                (Available: {}. Leave blank for {}.)".format(", ".join(osp.list_profiles()), osp.DEFAULT_PROFILE),'str').show()
+            if profile is None or profile.strip() == '':
+                profile = osp.DEFAULT_PROFILE
+
         #the object handle for the oscilloscope is retrieved
         scope = self.setup_scope()
         self.myprint("Resetting Oscilloscope...")
-        #the module containing the settings is imported
-        import oscillo_settings0000 as oss
-        #the method in the settings module is executed. 
-        oss.oscillo_settings(scope)
+        #send the settings that are different from the profile
+        sent, total = osp.restore_profile(scope, profile.strip())
 
+        print("{} of the {} settings in the '{}' profile had to be sent.".format(sent, total, profile.strip()))
         self.myprint("Oscilloscope was returned to its original settings.")
 
+    def save_scope_profile(self, profile=None):
+
+        '''
+        This method saves the current settings of the oscilloscope as a settings profile, so
+        that they can be restored later with scope_reset. This is useful when a different
+        waveguide needs different settings.
+        '''
+
+        #ask the user what to call the profile
+        if profile is None:
+            profile = oow.get_value(self.rootwindow, "What would you like to call this settings profile?",'str').show()
+            if profile is None or profile.strip() == '':
+                return
+
+        #the object handle for the oscilloscope is retrieved
+        scope = self.setup_scope()
+        self.myprint("Saving Oscilloscope Settings...")
+        count = osp.snapshot_profile(scope, profile.strip())
+
+        self.myprint("{} settings were saved in the '{}' profile.".format(count, profile.strip()))
+
         
 
-    def retrieve_waveform(self, scope):
+    def allocate_buffer(self, n=1000000, dtype=np.float64):
+
+        '''
+        This method creates an array that retrieve_waveform can reuse to store the voltages of every
+        waveform it collects (see the "out" argument of retrieve_waveform). Reusing the same array
+        avoids allocating a new 8 MB array for every waveform. The array is overwritten each time a
+        waveform is collected, so it should only be used by methods that are finished with one waveform
+        before they collect the next one. Passing dtype=np.float32 halves the memory used.
+        '''
+
+        #create the empty array
+        return np.empty(n, dtype=dtype)
+
+    def retrieve_waveform(self, scope, out=None, lazy_time=False, frames=1):
 
         '''
         This method retrieves the data from the oscilloscope and converts it into
         numbers that can be used for calculations. It also retrieves ceratin parameters
         from the oscilloscope such as the signal trigger point, the y-offset, the horizontal
         scale factor, the vertical scale factor, etc. 
+
+        The raw bytes are used directly as an array, without being unpacked into a list of numbers
+        first. If an array created by allocate_buffer is passed as "out", the voltages are written
+        into that array instead of a new one. If lazy_time is True, the time axis is returned as a
+        time_axis object (see the end of this module) instead of an array of a million time values.
+        If the block holds more than one frame (see retrieve_average), the frames are averaged.
         '''
         
         #Alert the user if the instrument was not found. 
@@ -287,50 +530,248 @@ class data_collection():
             Time, Volts, xzero, xincr = 10, 10, 10, 10
             return Time, Volts, xzero, xincr
 
-        '''
-        These lines obtain parameters from the oscilloscope so that they can be used later
-        by other methods.
-        '''
-        #obtain the vertiacl scale factor.
-        ymult = float(scope.query('WFMPRE:YMULT?'))
-        #I don't know what this one is.
-        yzero = float(scope.query('WFMPRE:YZERO?'))
-        #obtain the vertical offset
-        yoff = float(scope.query('WFMPRE:YOFF?'))
-        #obtain the horizontal scale factor
-        xincr = float(scope.query('WFMPRE:XINCR?'))
-        #obtain the signal trigger point
-        xzero = float(scope.query('WFMPRE:XZERO?'))
-        
         self.myprint("Collecting Data...")
         print("Collecting Data...")
         
-        #I have no idea what this line does, I just know it's necessary. See the programmers manual 
-        # if you really want to know.
-        scope.write('CURVE?')
-        
-        #Retrieve the raw data from the oscilloscope
-        data = scope.read_raw()
+        #Ask the oscilloscope for the waveform data and retrieve the raw bytes. The session sends the
+        # query again if the instrument had to be reconnected. See the programmers manual if you want
+        # to know more about the CURVE? query.
+        data = scope.query_raw('CURVE?')
+
+        '''
+        These lines obtain parameters from the oscilloscope so that they can be used later
+        by other methods. The session only asks the oscilloscope for them when a setting that
+        changes them has been sent. Otherwise the values from the last query are used. They are
+        obtained after the data, so that a replayed waveform (see the oscillo_replay.py module)
+        is scaled with its own preamble.
+        '''
+        #obtain the vertical scale factor, the vertical offsets, the horizontal scale factor, and
+        # the signal trigger point.
+        ymult, yzero, yoff, xincr, xzero = scope.preamble()
+
+        #view the bytes as an array of numbers without copying them (see decode_block below)
+        ADC_wave = self.decode_block(data, scope.data_width())
+        #average the frames point-by-point if FastFrame sent more than one
+        if frames > 1:
+            ADC_wave = ADC_wave.reshape(frames, -1).mean(axis=0)
+        n = len(ADC_wave)
+
+        #use the array that was passed in if it is big enough. Otherwise, create a new one.
+        if out is None or len(out) < n:
+            Volts = np.empty(n, dtype=np.float64)
+        else:
+            Volts = out[:n]
+
+        #Scale the data to physically significant values. Each step is performed in place, so no
+        # temporary arrays are created.
+        np.subtract(ADC_wave, yoff, out=Volts, casting='unsafe')
+        Volts *= ymult
+        Volts += yzero
+
+        #create a time domain according to the length of the amplitude data retrieved and the x-scale factor.
+        # If only part of the record was sent (see set_acquisition_window), the time axis starts at the
+        # first point that was sent, so that times are still measured from the start of the record.
+        Time = time_axis(xzero, xincr, n, scope.first_point())
+        if not lazy_time:
+            Time = Time.materialise()
 
-        #These lines remove the header from the data.
-        headerlen = 2 + int(data[1])
-        header = data[:headerlen]
-        ADC_wave = data[headerlen:-1]
+        #return the arrays and parameters for later use by other methods.
+        return Time, Volts, xzero, xincr
 
-        #unpack the data and convert it into a numpy array
-        ADC_wave = np.array(unpack('%sB' % len(ADC_wave),ADC_wave))
+    def retrieve_average(self, scope, k, strategy=None, out=None, lazy_time=False):
 
-        #Scale the data to physically significant values
-        Volts = (ADC_wave - yoff) * ymult  + yzero
+        '''
+        This method returns the average of k waveforms, in the same form as retrieve_waveform. The
+        strategy (see AVERAGING_STRATEGIES at the top of this module) decides where the averaging is
+        done. Averaging on the oscilloscope, or capturing the waveforms with FastFrame, avoids sending
+        every waveform over USB separately, which is where most of the collection time goes.
+        '''
 
-        #create a time domain according to the length of the amplitude data retrieved and the x-scale factor
-        Time = np.linspace(0, xincr*len(Volts), len(Volts))
-        
-        #check to make sure that the arrays are the same length
-        Time, Volts = self.check_data(Time, Volts)
+        if strategy is None:
+            strategy = AVERAGING_STRATEGY
+        if strategy not in AVERAGING_STRATEGIES:
+            raise ValueError("strategy must be one of {}".format(AVERAGING_STRATEGIES))
 
-        #return the arrays and parameters for later use by other methods.
-        return Time, Volts, xzero, xincr
+        #let retrieve_waveform alert the user if the instrument was not found
+        if scope == "instrument error":
+            return self.retrieve_waveform(scope)
+
+        if strategy == 'host':
+            #collect the first waveform, and then add the others to it point-by-point
+            Time, Volts, xzero, xincr = self.retrieve_waveform(scope, out=out, lazy_time=lazy_time)
+            other = None
+            for i in range(1, k):
+                self.myprint("Collected waveform #{} of {}".format(i, k))
+                #the same array is reused for each of the other waveforms
+                t_other, other, xzero, xincr = self.retrieve_waveform(scope, out=other, lazy_time=True)
+                Volts += other
+            Volts /= k
+            return Time, Volts, xzero, xincr
+
+        if strategy == 'scope':
+            #the oscilloscope averages k triggers and keeps the result. k has to be a power of two.
+            count = self.scope_average_count(k)
+            if count != k:
+                self.myprint("The oscilloscope can only average a power of two waveforms,\n\
+                        so {} waveforms are averaged instead of {}.".format(count, k))
+            scope.configure('ACQUIRE:MODE AVERAGE')
+            scope.configure('ACQUIRE:NUMAVG {}'.format(count))
+            frames = 1
+        else:
+            #the oscilloscope captures one frame for each of k triggers, and sends them all at once
+            scope.configure('HORIZONTAL:FASTFRAME:STATE ON')
+            scope.configure('HORIZONTAL:FASTFRAME:COUNT {}'.format(k))
+            scope.configure('DATA:FRAMESTART 1')
+            scope.configure('DATA:FRAMESTOP {}'.format(k))
+            frames = k
+
+        try:
+            #run a single sequence, and wait for it to finish
+            self.single_sequence(scope)
+            return self.retrieve_waveform(scope, out=out, lazy_time=lazy_time, frames=frames)
+        finally:
+            #put the oscilloscope back the way the other collection methods expect it
+            self.free_run(scope)
+
+    def scope_average_count(self, k):
+
+        '''
+        This method returns the number of waveforms that the oscilloscope averages when k are asked
+        for: the nearest power of two within SCOPE_AVERAGES.
+        '''
+        count = 2 ** int(round(np.log2(max(k, 1))))
+        return int(min(max(count, SCOPE_AVERAGES[0]), SCOPE_AVERAGES[1]))
+
+    def single_sequence(self, scope):
+
+        '''
+        This method starts a single sequence on the oscilloscope and waits for it to finish. With
+        averaging on, a sequence ends once all of the averages have been acquired. With FastFrame on,
+        it ends once all of the frames have been captured.
+        '''
+        scope.configure('ACQUIRE:STOPAFTER SEQUENCE')
+        scope.write('ACQUIRE:STATE RUN')
+        #*OPC? is only answered after the sequence is complete
+        scope.query('*OPC?')
+
+    def free_run(self, scope):
+
+        '''
+        This method undoes retrieve_average. The oscilloscope goes back to acquiring single
+        waveforms continuously.
+        '''
+        scope.configure('ACQUIRE:MODE SAMPLE')
+        scope.configure('HORIZONTAL:FASTFRAME:STATE OFF')
+        scope.configure('ACQUIRE:STOPAFTER RUNSTOP')
+        scope.write('ACQUIRE:STATE RUN')
+
+    def compare_averaging(self, k=10, repeats=3):
+
+        '''
+        This method collects an averaged waveform with each of the averaging strategies and reports how
+        long each one takes and how much noise is left in the result. More averages leave less noise but
+        take longer, and the strategies differ in how much data has to be sent for the same average.
+        '''
+        #the noise is measured by the data processing module
+        odf = oscillo_data_processing_functions.data_process(self.rootwindow, self.strvar)
+
+        #retrieve the oscilloscope object handle
+        scope = self.setup_scope(xend=5.22e-4)
+        if scope == "instrument error":
+            return self.retrieve_waveform(scope)
+
+        results = {}
+        for strategy in AVERAGING_STRATEGIES:
+            noise = []
+            then = t.time()
+            for i in range(repeats):
+                time, amplitude, xzero, xincr = self.retrieve_average(scope, k, strategy)
+                noise.append(odf.estimate_noise(amplitude))
+            seconds = (t.time() - then) / repeats
+            results[strategy] = (seconds, np.median(noise))
+
+        #report the trade-off between the strategies. Noise smaller than one code of the analog-to-digital
+        # converter can't be seen in a single byte per point, so the size of one code is reported too.
+        lines = ["Averaging {} waveforms (one code is {:.2e} V):".format(k, scope.preamble().ymult)]
+        for strategy in results:
+            seconds, noise = results[strategy]
+            #the oscilloscope may have averaged another number of waveforms (see scope_average_count)
+            count = self.scope_average_count(k) if strategy == 'scope' else k
+            lines.append("{}: {} waveforms, {:.2f} s per average, {:.2f} per minute, noise {:.2e} V".format(
+                strategy, count, seconds, 60 / seconds, noise))
+        print("\n".join(lines))
+        self.myprint("\n".join(lines))
+        return results
+
+    def decode_block(self, data, width=1):
+
+        '''
+        The oscilloscope sends the waveform as an IEEE 488.2 block: a "#", one digit that says how
+        many digits follow, those digits (which give the number of data bytes), the data bytes, and
+        finally a new line character. This method returns the data bytes as an array of unsigned
+        8-bit integers, or of unsigned 16-bit integers (most significant byte first) if the width is 2.
+        The array is a view of the bytes, so nothing is copied.
+        '''
+
+        #the number of digits in the byte count
+        ndigits = int(chr(data[1]))
+        #the header is the "#", the digit, and the byte count
+        headerlen = 2 + ndigits
+        #the number of data bytes
+        nbytes = int(data[2:headerlen])
+
+        #view the data bytes as an array
+        if width == 2:
+            return np.frombuffer(data, dtype='>u2', count=nbytes // 2, offset=headerlen)
+        return np.frombuffer(data, dtype=np.uint8, count=nbytes, offset=headerlen)
+
+    def retrieve_dual_range(self, scope, scale=10, zscale=0.5, out=None, zout=None, lazy_time=False, mode=None):
+
+        '''
+        The zoomed timing methods need the waveform at two vertical scales: a large scale, so that the
+        distal end echoes aren't clipped, and a small scale, so that the small features are resolved.
+        This method returns both, as time, amplitude, ztime, zamplitude, xzero, xincr. The mode (see
+        DUAL_RANGE_MODES at the top of this module) decides how they are captured. The "channels" mode
+        captures both from the same trigger, so the echoes that are compared come from the same shot and
+        the vertical scale never has to be changed between waveforms.
+        '''
+
+        if mode is None:
+            mode = DUAL_RANGE_MODE
+        if mode not in DUAL_RANGE_MODES:
+            raise ValueError("mode must be one of {}".format(DUAL_RANGE_MODES))
+
+        #let retrieve_waveform alert the user if the instrument was not found
+        if scope == "instrument error":
+            time, amplitude, xzero, xincr = self.retrieve_waveform(scope)
+            return time, amplitude, time, amplitude, xzero, xincr
+
+        if mode == 'zoom':
+            #retrieve waveform zoomed out
+            self.scope_change_zoom(scope, scale)
+            time, amplitude, xzero, xincr = self.retrieve_waveform(scope, out=out, lazy_time=lazy_time)
+            #retrieve waveform zoomed in
+            self.scope_change_zoom(scope, zscale)
+            ztime, zamplitude, xzero, xincr = self.retrieve_waveform(scope, out=zout, lazy_time=lazy_time)
+            return time, amplitude, ztime, zamplitude, xzero, xincr
+
+        #channel 1 sees the whole signal, and channel 2 sees the small features
+        scope.configure('SELECT:CH2 ON')
+        scope.configure('CH1:SCALE {}'.format(scale))
+        scope.configure('CH2:SCALE {}'.format(zscale))
+        scope.configure('CH2:OFFSET 0.0E+0')
+        try:
+            #capture one trigger on both channels, and then send each channel
+            self.single_sequence(scope)
+            scope.configure('DATA:SOU CH1')
+            time, amplitude, xzero, xincr = self.retrieve_waveform(scope, out=out, lazy_time=lazy_time)
+            scope.configure('DATA:SOU CH2')
+            ztime, zamplitude, xzero, xincr = self.retrieve_waveform(scope, out=zout, lazy_time=lazy_time)
+        finally:
+            #send channel 1 again, and go back to acquiring continuously
+            scope.configure('DATA:SOU CH1')
+            self.free_run(scope)
+        return time, amplitude, ztime, zamplitude, xzero, xincr
 
     def scope_change_zoom(self, scope, zoom_factor):
 
@@ -344,7 +785,8 @@ class data_collection():
         
         #Try to change the vertical scale on th oscilloscope
         try:
-            scope.write("CH1:SCALE {}".format(zoom_factor)) #this successfully lets me see the smaller features with more information
+            #the scale is only sent if it is different from the current one, so that the cached preamble stays valid.
+            scope.configure("CH1:SCALE {}".format(zoom_factor)) #this successfully lets me see the smaller features with more information
         
         #Alert the user if the instrument was not found. 
         except:
@@ -370,3 +812,61 @@ class data_collection():
         plt.close()
 
 
+class time_axis():
+    '''
+    This class stands in for the time array of a waveform without storing a million time values.
+    The time of point i is simply (start + i) * xincr, where start is the position of the first
+    point in the oscilloscope's record. The time axis can be sliced like an array, and the
+    materialise method builds the real array whenever one is needed (for plotting or saving).
+    '''
+
+    def __init__(self, xzero, xincr, n, start=0):
+        '''
+        Store the trigger point, the horizontal scale factor, the number of points, and the position
+        of the first point.
+        '''
+        self.xzero = xzero
+        self.xincr = xincr
+        self.n = n
+        self.start = start
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, key):
+        '''
+        Slicing returns a new time_axis. Indexing returns the time of a single point.
+        '''
+        if isinstance(key, slice):
+            first, last, step = key.indices(self.n)
+            if step != 1:
+                return self.materialise()[key]
+            return time_axis(self.xzero, self.xincr, max(last - first, 0), self.start + first)
+
+        #allow negative indecies, like an array
+        if key < 0:
+            key = key + self.n
+        return (self.start + key) * self.xincr
+
+    def __array__(self, dtype=None, copy=None):
+        return self.materialise()
+
+    def materialise(self):
+        '''
+        This method builds the array of time values.
+        '''
+        return (self.start + np.arange(self.n)) * self.xincr
+
+    def search(self, value):
+        '''
+        This method returns the index of the first point whose time is greater than or equal to
+        the value. It gives the same answer as searching the materialised array with numpy.where.
+        '''
+        #estimate the index, and then correct it for rounding errors
+        index = int(np.ceil(value / self.xincr)) - self.start
+        while index < self.n and self[index] < value:
+            index += 1
+        while index > 0 and self[index - 1] >= value:
+            index -= 1
+        #keep the index inside the axis
+        return min(max(index, 0), self.n)
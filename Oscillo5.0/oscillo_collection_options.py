@@ -27,6 +27,8 @@ import oscillo_data_processing_functions
 import time as t
 #Import the threading module. This allows some of the slower processes to be executed in the background
 import _thread as th
+#Import the threading library. This is used to check which thread a message is being printed from.
+import threading
 #Import the plotting library. This is a very useful library for developers. (See the matplotlib.pyplot documentation online.)
 import matplotlib.pyplot as plt
 #Import numpy. This library contains many methods used in vectorized calculations, and other
@@ -35,6 +37,19 @@ import numpy as np
 #Import the module that contains the dialog box functions. Any dialog box seen in Oscillo(TM) is created in this module.
 # (see the oscillo_option_windows.py module.)
 import oscillo_option_windows as oow
+#Import the acquisition pipeline. This collects waveforms in the background while others are processed.
+# (See the oscillo_acquisition_pipeline.py module.)
+import oscillo_acquisition_pipeline as oap
+#Import the reference library. (See the oscillo_reference_library.py module.)
+import oscillo_reference_library as orl
+#Import the result store. (See the oscillo_result_store.py module.)
+import oscillo_result_store as ors
+#Import the sigma tuner. This finds the filtering that gives the right number of peaks. (See the
+# oscillo_sigma_tuner.py module.)
+import oscillo_sigma_tuner as ost
+#Import the module that holds the connections to the oscilloscopes. This is used to find every connected
+# oscilloscope. (See the oscillo_scope_session.py module.)
+import oscillo_scope_session
 import os
 
 
@@ -78,7 +93,8 @@ class Raw_waveforms():
         '''
 
         #retrieve the oscilloscope object handle
-        scope = self.osf.setup_scope()
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=7e-4)
 
         #set the vertical scale to the desired value
         self.osf.scope_change_zoom(scope,5)
@@ -102,7 +118,7 @@ class Raw_waveforms():
             #create a directory for the new data file
             path_name = self.osf.make_directory(metal, DL, freq, gain)
             #save the new data to file
-            self.osf.save_me(path_name, time, amplitude, metal, DL, freq, gain)
+            self.osf.save_me(path_name, time, amplitude, metal, DL, freq, gain, scope.preamble())
         
         self.myprint("Waveform(s) collected successfully")
  
@@ -121,7 +137,8 @@ class Raw_waveforms():
         #create a directory for the new data file
         path_name = self.osf.make_directory(metal, DL, freq, gain)
         #retrieve the oscilloscope object handle
-        scope = self.osf.setup_scope()
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=5.22e-4)
         #set the vertical scale to the desired value
         self.osf.scope_change_zoom(scope,5)
 
@@ -131,22 +148,29 @@ class Raw_waveforms():
         '''
         #create a counting variable
         i = 1
-        #set the looping condition.
-        while i <= n:
-            #retrieve the waveform, time axis, trigger point, and horizontal scale
-            time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-            #clip off the superfluous data.
-            time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
-            #save the data in the background so that the loop can continue collecting data.
-            th.start_new_thread(self.osf.save_me,(path_name, time, amplitude, metal, DL, freq, gain))
-            
-            self.myprint('Waveform #{} collected and saving'.format(i))
-            
-            #increment the counting variable
-            i += 1
+        #every waveform of the collection is added to this one run file
+        run = self.osf.open_run(path_name, metal, DL, freq, gain)
+        try:
+            #set the looping condition.
+            while i <= n:
+                #retrieve the waveform, time axis, trigger point, and horizontal scale
+                time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
+                #clip off the superfluous data.
+                time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
+                #add the waveform to the end of the run file in the background, so that the loop can continue collecting data.
+                self.osf.save_frame_later(run, time, amplitude, scope.preamble())
+                
+                self.myprint('Waveform #{} collected and saving'.format(i))
+                
+                #increment the counting variable
+                i += 1
+        finally:
+            #write the index of the frames once they are written, even if the collection was stopped
+            self.osf.close_run_later(run)
+            #wait for the waveforms that are still being saved
+            self.osf.finish_saving()
 
-        self.myprint("Waveform(s) collected successfully. Data will\n\
-        continue to save for several minutes.")
+        self.myprint("Waveform(s) collected and saved successfully.")
 
     def continuous_waveform(self):
 
@@ -159,7 +183,8 @@ class Raw_waveforms():
         '''
 
         #retrieve the oscilloscope object handle
-        scope = self.osf.setup_scope()    
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=5.22e-4)
 
         #ask the user to specify the duration of the collection
         duration = oow.get_value(self.rootwindow, "For how many minutes would you like to collect?",'int').show()
@@ -182,36 +207,43 @@ class Raw_waveforms():
 
         #create a counting variable
         i = 1
+        #every waveform of the collection is added to this one run file
+        run = self.osf.open_run(path_name, metal, DL, freq, gain)
         '''
         This loop will run until the current run time exceeds the collection duration
         specified by the user. 
         '''
-        while (now - then) < duration:
+        try:
+            while (now - then) < duration:
             
-            #retrieve the current time
-            now = t.time()
+                #retrieve the current time
+                now = t.time()
 
-            #computre the current run time, and see if it is time to collect a waveform. 
-            if (now - then) % interval < 0.9:
+                #computre the current run time, and see if it is time to collect a waveform. 
+                if (now - then) % interval < 0.9:
                 
-                #retrieve the waveform, time axis, trigger point, and horizontal scale
-                time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-                #clip off the superfluous data.
-                time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
-                #save the data in the background so that the loop can continue collecting data.
-                th.start_new_thread(self.osf.save_me,(path_name, time, amplitude, metal, DL, freq, gain))
+                    #retrieve the waveform, time axis, trigger point, and horizontal scale
+                    time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
+                    #clip off the superfluous data.
+                    time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
+                    #add the waveform to the end of the run file in the background, so that the loop can continue collecting data.
+                    self.osf.save_frame_later(run, time, amplitude, scope.preamble())
                 
-                self.myprint('Waveform #{} collected and saving'.format(i))
+                    self.myprint('Waveform #{} collected and saving'.format(i))
                 
-                #increment the counting variable
-                i += 1
-                #This loop runs way too fast for the if statement above to be effective by itself.
-                # So I slowed it down here by having the program sleep (wait) for 1 second before it
-                # continues through the loop.
-                t.sleep(1)
-        
-        self.myprint("Waveform(s) collected successfully. Data will\n\
-        continue to save for several minutes.")
+                    #increment the counting variable
+                    i += 1
+                    #This loop runs way too fast for the if statement above to be effective by itself.
+                    # So I slowed it down here by having the program sleep (wait) for 1 second before it
+                    # continues through the loop.
+                    t.sleep(1)
+        finally:
+            #write the index of the frames once they are written, even if the collection was stopped
+            self.osf.close_run_later(run)
+            #wait for the waveforms that are still being saved
+            self.osf.finish_saving()
+
+        self.myprint("Waveform(s) collected and saved successfully.")
 
 class Processed_waveforms():
     '''
@@ -240,7 +272,13 @@ class Processed_waveforms():
         '''
         This method is alot like the built-in print() method in python. But instead of 
         "printing" the text to the terminal, it displays it in the GUI message center.
+        The GUI can only be updated from the main thread, so when this method is called from
+        a background thread (like the acquisition pipeline), the text is printed instead.
         '''
+        #check if this is a background thread
+        if threading.current_thread() is not threading.main_thread():
+            print(text)
+            return
         #Set the inherited string variable to the new text.
         self.strvar.set(text)
         #update the GUI window so that the text immediately appears.
@@ -256,7 +294,8 @@ class Processed_waveforms():
         '''
 
         #retrieve the oscilloscope object handle
-        scope = self.osf.setup_scope()
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=5.22e-4)
 
         #Ask user how many waveforms should be averaged
         n = oow.get_value(self.rootwindow, "How many waveforms would you like to collect and average?",'int').show()
@@ -266,33 +305,17 @@ class Processed_waveforms():
         path_name = self.osf.make_directory(metal, DL, freq, gain)
 
 
-        #create lists to store the data to be averaged
-        times = []
-        amplitudes = []
-
-        #collect waveforms in loop.
-        for i in range(n):
-
-            #retrieve the waveform, time axis, trigger point, and horizontal scale
-            time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-            #clip off the superfluous data.
-            time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
-
-            #Append the time array to the list of time arrays
-            times.append(time)
-            #Append the amplitude array to the list of amplitude arrays
-            amplitudes.append(amplitude)
-
-            self.myprint("Collected waveform #{}".format(i+1))
-
-        #compute average in data processing module
-        time, amplitude = self.odf.compute_average(times,amplitudes)
+        #collect the waveforms and average them. The averaging strategy decides whether the waveforms are
+        # averaged here or on the oscilloscope (see retrieve_average in the oscillo_collection_functions.py module).
+        time, amplitude, xzero, xincr = self.osf.retrieve_average(scope, n)
+        #clip off the superfluous data.
+        time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
 
         #plot averaged data
         self.osf.plot_waveform(time, amplitude)
         
-        #save the data in a new thread
-        th.start_new_thread(self.osf.save_me,(path_name, time, amplitude, metal, DL, freq, gain))
+        #save the data in the background
+        self.osf.save_later(path_name, time, amplitude, metal, DL, freq, gain, scope.preamble())
 
         self.myprint("Waveforms collected successfully")
 
@@ -322,83 +345,178 @@ class Processed_waveforms():
         mytime = self.osf.get_time_stamp()
         #name the new data file
         file_name_csv = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + ".csv"
-        #open the new data file for writing
-        myfile = open(file_name_csv,'w')
-
-        #create a dictionary to contain the peaks obtained from the convolution
-        peaks = {}
-        #write column headers to the file
-        myfile.write("fwg, s1, s2, s3, s4\n")
+        #the results are kept in the result store, and written to the data file at the end
+        # (see the oscillo_result_store.py module)
+        results = ors.result_sink(metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime, 'gaussian_timing', metal, DL, freq, gain)
 
         #retrieve the oscilloscope object handle
-        scope = self.osf.setup_scope()
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=5.22e-4)
+
+        #create the array that each waveform is stored in. The same array is reused for every waveform.
+        buffer = self.osf.allocate_buffer()
+
+        #collect the waveforms in a background thread while the waveforms that were already collected are
+        # processed here. (See the oscillo_acquisition_pipeline.py module.)
+        pipeline = oap.acquisition_pipeline(lambda: self.gaussian_timing_acquire(scope, buffer), self.gaussian_timing_process)
 
-        #create a counting variable
-        i = 1
         #this loop will run until the specified number of waveforms have been collected and processed.
-        while i <= n:
-            
-            #set the vertical zoom factor to the desired value
-            self.osf.scope_change_zoom(scope,0.5)
-            #retrieve the waveform, time axis, trigger point, and horizontal scale
-            time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-            #clip off the superfluous data.
-            time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
-                      
-            
-            #compute the envelope of the amplitude data
-            A_of_t = self.odf.compute_envelope(amplitude)
+        for i, times_of_flight in pipeline.run(n):
 
-            #zero the ends of the envelope to avoid error
-            A_of_t = self.odf.clip_envelope(A_of_t)
+            #Add these times of flight to the results.
+            results.add(fwg=times_of_flight[0], segments=times_of_flight[1:])
 
-            #Plot the amplitude and envelope. This shoud be commented out 
-            '''
-            plt.plot(time, amplitude, 'b', time, A_of_t,"r")
-            plt.show()
-            '''
+            print("Collected and wrote data set {}.".format(i))
 
-            #Convolve the envelope with a gaussian function of the same size produces
-            # a graph whose peaks are very easy to find. Each index in 'peaks' is
-            # the index corresponding to the instance of a feature in the waveguide.
-            sigma = 1.9 #this is the standard deviation of the gaussian function used in the convolution
-            peaks, cc, x_axis = self.odf.gausian_convolution(A_of_t,sigma,.01, 2500)
-
-            #correct for the error in the initial bang
-            tof = peaks[8] - peaks[4]
-            tofsudo = peaks[4] - peaks[0]
-            dt = tof - tofsudo
-            peaks[0] = peaks[0] - dt
-
-
-            #Now that we have a very consistant number of peaks, we can use them to
-            # find the time of flight between the features. Each peak represents an 
-            # echo off of an echogenic feature. The first peak is the initial bang,
-            # and the peaks that follow conform to the order that the echogenic features
-            # appear on the waveguide. Remember that the peaks are numbered from zero, as
-            # is the convention in python.
-            #The next few lines take the data from the peaks list and creates a list of the 
-            # times of flight between echogenic features.
-            times_of_flight = ['','','','','']
-            times_of_flight[0] = (peaks[4] - peaks[0]) * xincr #TOF for full wave guide in seconds
-            j = 0
-            while j <= 3:
-                times_of_flight[j+1] = (peaks[j+1] - peaks[j]) * xincr #TOF for a segment of the waveguide in seconds
-                j += 1
+        #report how many waveforms were collected and processed per minute
+        print(pipeline.report())
 
+        #write the results to the database and the data file
+        results.close(file_name_csv)
+        print()
+        print("Waveform(s) collected successfully.")
+        self.myprint("Waveform(s) collected successfully")
 
-            
-            #Write these times of flight to a file.
-            for item in times_of_flight:
-                myfile.write('{},'.format(item))
-            myfile.write("\n")
+    def gaussian_timing_acquire(self, scope, buffer):
 
-            print("Collected and wrote data set {}.".format(i))
-            i += 1
+        '''
+        This method collects one waveform for gaussian_timing. It is called by the acquisition pipeline
+        in a background thread. The clipped data is copied out of the buffer, so that the buffer can be
+        reused for the next waveform while this one waits to be processed.
+        '''
+
+        #set the vertical zoom factor to the desired value
+        self.osf.scope_change_zoom(scope,0.5)
+        #retrieve the waveform, time axis, trigger point, and horizontal scale
+        time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope, out=buffer, lazy_time=True)
+        #clip off the superfluous data.
+        time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
+
+        return time, np.copy(amplitude), xzero, xincr
+
+    def gaussian_timing_process(self, frame):
+
+        '''
+        This method processes one waveform collected by gaussian_timing_acquire and returns the
+        times of flight. It is called by the acquisition pipeline (see gaussian_timing).
+        '''
+
+        #unpack the clipped waveform, trigger point, and horizontal scale
+        time, amplitude, xzero, xincr = frame
+
+        #compute the envelope of the amplitude data
+        A_of_t = self.odf.compute_envelope(amplitude)
+
+        #zero the ends of the envelope to avoid error
+        A_of_t = self.odf.clip_envelope(A_of_t)
+
+        #Plot the amplitude and envelope. This shoud be commented out 
+        '''
+        plt.plot(time, amplitude, 'b', time, A_of_t,"r")
+        plt.show()
+        '''
+
+        #Convolve the envelope with a gaussian function of the same size produces
+        # a graph whose peaks are very easy to find. Each index in 'peaks' is
+        # the index corresponding to the instance of a feature in the waveguide.
+        sigma = 1.9 #this is the standard deviation of the gaussian function used in the convolution
+        peaks, cc, x_axis = self.odf.gausian_convolution(A_of_t,sigma,.01, 2500)
+        #the peaks are indexes of samples, so they are refined to their positions between the samples.
+        # (See refine_convolution_peaks.)
+        peaks, errors = self.odf.refine_convolution_peaks(A_of_t, sigma, cc, peaks)
+
+        #correct for the error in the initial bang
+        tof = peaks[8] - peaks[4]
+        tofsudo = peaks[4] - peaks[0]
+        dt = tof - tofsudo
+        peaks[0] = peaks[0] - dt
+
+
+        #Now that we have a very consistant number of peaks, we can use them to
+        # find the time of flight between the features. Each peak represents an 
+        # echo off of an echogenic feature. The first peak is the initial bang,
+        # and the peaks that follow conform to the order that the echogenic features
+        # appear on the waveguide. Remember that the peaks are numbered from zero, as
+        # is the convention in python.
+        #The next few lines take the data from the peaks list and creates a list of the 
+        # times of flight between echogenic features.
+        #the positions of the peaks are turned into times (see peak_times)
+        times = self.odf.peak_times(time, peaks, xzero, xincr)
+        times_of_flight = ['','','','','']
+        times_of_flight[0] = times[4] - times[0] #TOF for full wave guide in seconds
+        j = 0
+        while j <= 3:
+            times_of_flight[j+1] = times[j+1] - times[j] #TOF for a segment of the waveguide in seconds
+            j += 1
+
+        return times_of_flight
+
+    def gaussian_timing_instruments(self):
+
+        '''
+        This method does the same thing as gaussian_timing, but for every connected oscilloscope at
+        once (one oscilloscope for each waveguide). Each oscilloscope is collected from in its own
+        thread, and the waveforms from all of them are processed as a single stream. Every row of the
+        data file starts with the serial number of the oscilloscope that it came from, and the number
+        of the waveform from that oscilloscope.
+        '''
+
+        #Ask user how many waveforms to collect and process
+        n = oow.get_value(self.rootwindow, "How many waveforms would you like to collect from each instrument?",'int').show()
+        #ask the user for the parameters of the collection
+        metal, DL, freq, gain = oow.get_value(self.rootwindow, "Please fill out the following parameters","parameters").show()
+        #create a directory for the new data file
+        path_name = self.osf.make_directory(metal, DL, freq, gain)
+        #create a new time stamp
+        mytime = self.osf.get_time_stamp()
+        #name the new data file
+        file_name_csv = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + ".csv"
+        #the results are kept in the result store, and written to the data file at the end
+        # (see the oscillo_result_store.py module)
+        results = ors.result_sink(metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime, 'gaussian_timing_instruments', metal, DL, freq, gain)
+
+        #set up each of the oscilloscopes, and give each one its own buffer and collecting function
+        acquires = {}
+        for resource_name in oscillo_scope_session.list_instruments():
+            # The oscilloscope only sends the part of the waveform that is kept by clip_tails.
+            scope = self.osf.setup_scope(xend=5.22e-4, resource_name=resource_name)
+            if scope == "instrument error":
+                print("The instrument {} was not found, so it will be skipped.".format(resource_name))
+                continue
+            buffer = self.osf.allocate_buffer()
+            #the default arguments keep this scope and buffer with this function
+            acquires[scope.instrument_id()] = lambda scope=scope, buffer=buffer: self.gaussian_timing_acquire(scope, buffer)
+
+        #stop if none of the oscilloscopes were found
+        if len(acquires) == 0:
+            results.close()
+            self.myprint("None of the instruments were found.")
+            return
+
+        self.myprint("Collecting from {} instrument(s)".format(len(acquires)))
+
+        #collect from every oscilloscope at once, and process the merged waveforms here.
+        # (See the oscillo_acquisition_pipeline.py module.)
+        # Each oscilloscope stops after n waveforms, so every one of them contributes n data sets.
+        pipeline = oap.acquisition_pipeline(acquires, self.gaussian_timing_process, depth=4*len(acquires), limit=n)
+
+        #count the rows written for each oscilloscope
+        rows = dict((instrument, 0) for instrument in acquires)
+        for (instrument, i), times_of_flight in pipeline.run(n*len(acquires)):
+
+            #Add these times of flight to the results, with the oscilloscope they came from.
+            results.add(fwg=times_of_flight[0], segments=times_of_flight[1:], instrument=instrument, waveform=i)
+            rows[instrument] += 1
+
+            print("Collected and wrote data set {} from {}.".format(i, instrument))
 
+        #report how many waveforms were collected and processed per minute
+        print(pipeline.report())
+        for instrument in rows:
+            print("{}: {} data sets".format(instrument, rows[instrument]))
 
-        #close the data file
-        myfile.close()
+        #write the results to the database and the data file
+        results.close(file_name_csv)
         print()
         print("Waveform(s) collected successfully.")
         self.myprint("Waveform(s) collected successfully")
@@ -421,106 +539,138 @@ class Processed_waveforms():
         mytime = self.osf.get_time_stamp()
         #name the new data file
         file_name_csv = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + ".csv"
-        #open the new data file for writing
-        myfile = open(file_name_csv,'w')
-
-        
-        #create a dictionary to contain the peaks obtained from the convolution
-        peaks = {}
-        #write column headers to the file
-        myfile.write("fwg, s1, s2, s3, s4\n")
+        #the results are kept in the result store, and written to the data file at the end
+        # (see the oscillo_result_store.py module)
+        results = ors.result_sink(metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime, 'gaussian_timing_zoom', metal, DL, freq, gain)
 
         #retrieve the oscilloscope object handle
-        scope = self.osf.setup_scope()
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=5.22e-4)
+
+        #create the arrays that the zoomed out and zoomed in waveforms are stored in. The same arrays
+        # are reused for every waveform.
+        buffer = self.osf.allocate_buffer()
+        zbuffer = self.osf.allocate_buffer()
+
+        #collect the waveforms in a background thread while the waveforms that were already collected are
+        # processed here. (See the oscillo_acquisition_pipeline.py module.)
+        pipeline = oap.acquisition_pipeline(lambda: self.zoom_acquire(scope, buffer, zbuffer, True), self.gaussian_timing_zoom_process)
 
-        #create a counting variable
-        i = 1
         #this loop will run until the specified number of waveforms have been collected and processed.
-        while i <= n:
-            
-            #retrieve waveform zoomed out
-            self.osf.scope_change_zoom(scope,10) #change this back to 5 for the waveguide
-            time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-            time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
-            
-            #retrieve waveform zoomed in
-            self.osf.scope_change_zoom(scope,0.5)
-            ztime, zamplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-            ztime, zamplitude = self.odf.clip_tails(ztime, zamplitude, xzero, xincr, 5.22e-4)           
-            
-            #compute the envelopes
-            A_of_t = self.odf.compute_envelope(amplitude)
-            zA_of_t = self.odf.compute_envelope(zamplitude)
+        for i, times_of_flight in pipeline.run(n):
 
-            #zero the ends of the envelope to avoid error
-            A_of_t = self.odf.clip_envelope(A_of_t)
-            zA_of_t = self.odf.clip_envelope(zA_of_t)
+            #Add these times of flight to the results.
+            results.add(fwg=times_of_flight[0], segments=times_of_flight[1:])
 
-            '''
-            #These plotting tools can be useful during development
-            plt.plot(time, amplitude, 'b', time, A_of_t,"r")
-            plt.show()
-            plt.plot(ztime,zamplitude,'b',ztime, zA_of_t, 'r')
-            plt.show()
-            '''
+            print("Collected and wrote data set {}.".format(i))
 
-            #Correlating the envelope with a gaussian function of the same size produces
-            # a graph whose peaks are very easy to find. Each index in 'peak_indexes' is
-            # the index corresponding to the instance of a feature in the waveguide.
-            sigma = 1.8
-            peak_indexes, cc, x_axis = self.odf.gausian_convolution(A_of_t,sigma,.1, 2500)
-            zpeak_indexes, zcc, zx_axis = self.odf.gausian_convolution(zA_of_t,sigma, .05, 2500)
-
-            #I now have 2 sets of peaks, from the zoomed-out set, I need to extract the
-            # peaks of the distal-end echos. From the zoomed-in set, I need to extract
-            # the peaks of the smaller echogenic features.
-            j = 0
-            while j <= 8:
-                
-                if j == 0 or j == 4 or j == 8:
-                    k = int(j/4)
-                    peaks[j] = peak_indexes[k]
-                
-                else:
-                    peaks[j] = zpeak_indexes[j]
-                
-                j += 1
+        #report how many waveforms were collected and processed per minute
+        print(pipeline.report())
+
+        #write the results to the database and the data file
+        results.close(file_name_csv)
+        print()
+        print("Waveform(s) collected successfully.")
+        self.myprint("Waveform(s) collected successfully")
+
+    def zoom_acquire(self, scope, buffer, zbuffer, lazy_time):
+
+        '''
+        This method collects a zoomed out and a zoomed in waveform for gaussian_timing_zoom and
+        cross_correlation_envelopes_zoom. It is called by the acquisition pipeline in a background
+        thread. The clipped data is copied out of the buffers, so that the buffers can be reused for
+        the next waveforms while these ones wait to be processed.
+        '''
+
+        #retrieve the waveform zoomed out and zoomed in. Depending on the dual range mode, both come from
+        # the same trigger (see retrieve_dual_range in the oscillo_collection_functions.py module).
+        time, amplitude, ztime, zamplitude, xzero, xincr = self.osf.retrieve_dual_range(
+            scope, 10, 0.5, out=buffer, zout=zbuffer, lazy_time=lazy_time) #change 10 back to 5 for the waveguide
+        time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
+        ztime, zamplitude = self.odf.clip_tails(ztime, zamplitude, xzero, xincr, 5.22e-4)
+
+        #copy the clipped time arrays too, unless they are lazy time axes
+        if not lazy_time:
+            time = np.copy(time)
+            ztime = np.copy(ztime)
+
+        return time, np.copy(amplitude), ztime, np.copy(zamplitude), xzero, xincr
+
+    def gaussian_timing_zoom_process(self, frame):
+
+        '''
+        This method processes one pair of waveforms collected by zoom_acquire and returns the times
+        of flight. It is called by the acquisition pipeline (see gaussian_timing_zoom).
+        '''
 
-            #correct for the error in the initial bang
-            tof = peaks[8] - peaks[4]
-            tofsudo = peaks[4] - peaks[0]
-            dt = tof - tofsudo
-            peaks[0] = peaks[0] - dt
+        #unpack the clipped waveforms, trigger point, and horizontal scale
+        time, amplitude, ztime, zamplitude, xzero, xincr = frame
+
+        #create a dictionary to contain the peaks obtained from the convolution
+        peaks = {}
 
+        #compute the envelopes
+        A_of_t = self.odf.compute_envelope(amplitude)
+        zA_of_t = self.odf.compute_envelope(zamplitude)
 
-            #Now that we have a very consistant number of peaks, we can use them to
-            # find the time of flight between the features. Each peak represents an 
-            # echo off of an echogenic feature. The first peak is the initial bang,
-            # and the peaks that follow conform to the order that the echogenic features
-            # appear on the waveguide. Remember that the peaks are numbered from zero, as
-            # is the convention in python.
-            times_of_flight = ['','','','','']
-            times_of_flight[0] = (peaks[4] - peaks[0]) * xincr #TOF for full wave guide in seconds
-            j = 0
-            while j <= 3:
-                times_of_flight[j+1] = (peaks[j+1] - peaks[j]) * xincr #TOF for a segment of the waveguide in seconds
-                j += 1
+        #zero the ends of the envelope to avoid error
+        A_of_t = self.odf.clip_envelope(A_of_t)
+        zA_of_t = self.odf.clip_envelope(zA_of_t)
 
+        '''
+        #These plotting tools can be useful during development
+        plt.plot(time, amplitude, 'b', time, A_of_t,"r")
+        plt.show()
+        plt.plot(ztime,zamplitude,'b',ztime, zA_of_t, 'r')
+        plt.show()
+        '''
 
+        #Correlating the envelope with a gaussian function of the same size produces
+        # a graph whose peaks are very easy to find. Each index in 'peak_indexes' is
+        # the index corresponding to the instance of a feature in the waveguide.
+        sigma = 1.8
+        peak_indexes, cc, x_axis = self.odf.gausian_convolution(A_of_t,sigma,.1, 2500)
+        zpeak_indexes, zcc, zx_axis = self.odf.gausian_convolution(zA_of_t,sigma, .05, 2500)
+        #refine the peaks to their positions between the samples (see refine_convolution_peaks)
+        peak_indexes, errors = self.odf.refine_convolution_peaks(A_of_t, sigma, cc, peak_indexes)
+        zpeak_indexes, zerrors = self.odf.refine_convolution_peaks(zA_of_t, sigma, zcc, zpeak_indexes)
+
+        #I now have 2 sets of peaks, from the zoomed-out set, I need to extract the
+        # peaks of the distal-end echos. From the zoomed-in set, I need to extract
+        # the peaks of the smaller echogenic features.
+        j = 0
+        while j <= 8:
             
-            #Write these times of flight to a file.
-            for item in times_of_flight:
-                myfile.write('{},'.format(item))
-            myfile.write("\n")
+            if j == 0 or j == 4 or j == 8:
+                k = int(j/4)
+                peaks[j] = peak_indexes[k]
+            
+            else:
+                peaks[j] = zpeak_indexes[j]
+            
+            j += 1
 
-            print("Collected and wrote data set {}.".format(i))
-            i += 1
+        #correct for the error in the initial bang
+        tof = peaks[8] - peaks[4]
+        tofsudo = peaks[4] - peaks[0]
+        dt = tof - tofsudo
+        peaks[0] = peaks[0] - dt
+
+
+        #Now that we have a very consistant number of peaks, we can use them to
+        # find the time of flight between the features. Each peak represents an 
+        # echo off of an echogenic feature. The first peak is the initial bang,
+        # and the peaks that follow conform to the order that the echogenic features
+        # appear on the waveguide. Remember that the peaks are numbered from zero, as
+        # is the convention in python.
+        times_of_flight = ['','','','','']
+        times_of_flight[0] = (peaks[4] - peaks[0]) * xincr #TOF for full wave guide in seconds
+        j = 0
+        while j <= 3:
+            times_of_flight[j+1] = (peaks[j+1] - peaks[j]) * xincr #TOF for a segment of the waveguide in seconds
+            j += 1
 
-        #close the data file.
-        myfile.close()
-        print()
-        print("Waveform(s) collected successfully.")
-        self.myprint("Waveform(s) collected successfully")
+        return times_of_flight
 
     def cross_correlation_envelopes_zoom(self):
 
@@ -545,247 +695,252 @@ class Processed_waveforms():
         mytime = self.osf.get_time_stamp()
         #name the new data file
         file_name_csv = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + ".csv"
-        #open the new data file for writing
-        myfile = open(file_name_csv,'w')
+        #the results are kept in the result store, and written to the data file at the end
+        # (see the oscillo_result_store.py module)
+        results = ors.result_sink(metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime, 'cross_correlation_envelopes_zoom', metal, DL, freq, gain)
+
+        #retrieve the oscilloscope object handle
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=5.22e-4)
+
+        #create the arrays that the zoomed out and zoomed in waveforms are stored in. The same arrays
+        # are reused for every waveform.
+        buffer = self.osf.allocate_buffer()
+        zbuffer = self.osf.allocate_buffer()
+
+        #collect the waveforms in a background thread while the waveforms that were already collected are
+        # processed here. (See the oscillo_acquisition_pipeline.py module.)
+        pipeline = oap.acquisition_pipeline(lambda: self.zoom_acquire(scope, buffer, zbuffer, False), self.cross_correlation_envelopes_zoom_process)
+
+        #this loop will run until the specified number of waveforms have been collected and processed.
+        for i, times_of_flight in pipeline.run(n):
+
+            #Add these times of flight to the results.
+            results.add(fwg=times_of_flight[0], segments=times_of_flight[1:])
+
+            print("Collected and wrote data set {}.".format(i))
+
+        #report how many waveforms were collected and processed per minute
+        print(pipeline.report())
+
+        #write the results to the database and the data file
+        results.close(file_name_csv)
+        print()
+        print("Waveform(s) collected successfully.")
+        self.myprint("Waveform(s) collected successfully")
+
+    def cross_correlation_envelopes_zoom_process(self, frame):
+
+        '''
+        This method processes one pair of waveforms collected by zoom_acquire and returns the times
+        of flight. It is called by the acquisition pipeline (see cross_correlation_envelopes_zoom).
+        '''
+
+        #unpack the clipped waveforms, trigger point, and horizontal scale
+        time, amplitude, ztime, zamplitude, xzero, xincr = frame
 
-        
         #create a dictionary to contain the peaks obtained from the convolution
         peaks = {}
-        #write column headers to the file
-        myfile.write("fwg, s1, s2, s3, s4\n")
 
-        #retrieve the oscilloscope object handle
-        scope = self.osf.setup_scope()
+        #compute the envelopes
+        self.myprint("Processing Data.")
+        A_of_t = self.odf.compute_envelope(amplitude)
+        zA_of_t = self.odf.compute_envelope(zamplitude)
 
-        #create a counting variable
-        i = 1
-        #this loop will run until the specified number of waveforms have been collected and processed.
-        while i <= n:
+        #zero the ends of the envelope to avoid error
+        A_of_t = self.odf.clip_envelope(A_of_t)
+        zA_of_t = self.odf.clip_envelope(zA_of_t)
+        
+        '''
+        #these plotting tools are useful during development
+        plt.plot(time, amplitude, 'b', time, A_of_t,"r")
+        plt.show()
+        plt.plot(ztime,zamplitude,'b',ztime, zA_of_t, 'r')
+        plt.show()
+        '''
+
+        #Correlating the envelope with a gaussian function of the same size produces
+        # a graph whose peaks are very easy to find. Each index in 'peak_indexes' is
+        # the index corresponding to the instance of a feature in the waveguide.
+        sigma = 1.8
+        peak_indexes, cc, x_axis = self.odf.gausian_convolution(A_of_t,sigma,.1, 2500)
+        zpeak_indexes, zcc, zx_axis = self.odf.gausian_convolution(zA_of_t,sigma, .05, 2500)
+
+        #I now have 2 sets of peaks, from the zoomed-out set, I need to extract the
+        # peaks of the distal-end echos. From the zoomed-in set, I need to extract
+        # the peaks of the smaller echogenic features.
+        j = 0
+        while j <= 8:
             
-            #retrieve waveform zoomed out
-            self.osf.scope_change_zoom(scope,10) #change this back to 5 for the waveguide
-            time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-            time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
+            if j == 0 or j == 4 or j == 8:
+                k = int(j/4)
+                peaks[j] = peak_indexes[k]
             
-            #retrieve waveform zoomed in
-            self.osf.scope_change_zoom(scope,0.5)
-            ztime, zamplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-            ztime, zamplitude = self.odf.clip_tails(ztime, zamplitude, xzero, xincr, 5.22e-4)           
+            else:
+                peaks[j] = zpeak_indexes[j]
             
-            #compute the envelopes
-            self.myprint("Processing Data. This could take up\n\
-                         to a 60 seconds")
-            A_of_t = self.odf.compute_envelope(amplitude)
-            zA_of_t = self.odf.compute_envelope(zamplitude)
+            j += 1
 
-            #zero the ends of the envelope to avoid error
-            A_of_t = self.odf.clip_envelope(A_of_t)
-            zA_of_t = self.odf.clip_envelope(zA_of_t)
-            
-            '''
-            #these plotting tools are useful during development
-            plt.plot(time, amplitude, 'b', time, A_of_t,"r")
-            plt.show()
-            plt.plot(ztime,zamplitude,'b',ztime, zA_of_t, 'r')
-            plt.show()
-            '''
+        times_of_flight = ['','','','','']
 
-            #Correlating the envelope with a gaussian function of the same size produces
-            # a graph whose peaks are very easy to find. Each index in 'peak_indexes' is
-            # the index corresponding to the instance of a feature in the waveguide.
-            sigma = 1.8
-            peak_indexes, cc, x_axis = self.odf.gausian_convolution(A_of_t,sigma,.1, 2500)
-            zpeak_indexes, zcc, zx_axis = self.odf.gausian_convolution(zA_of_t,sigma, .05, 2500)
-
-            #I now have 2 sets of peaks, from the zoomed-out set, I need to extract the
-            # peaks of the distal-end echos. From the zoomed-in set, I need to extract
-            # the peaks of the smaller echogenic features.
-            j = 0
-            while j <= 8:
-                
-                if j == 0 or j == 4 or j == 8:
-                    k = int(j/4)
-                    peaks[j] = peak_indexes[k]
-                
-                else:
-                    peaks[j] = zpeak_indexes[j]
-                
-                j += 1
 
-            times_of_flight = ['','','','','']
+        #these are the time locations of the distal end features
+        DE1 = peaks[4] * xincr - xzero
+        DE2 = peaks[8] * xincr - xzero
+
+        #now I need to find these time locations on the original spectrum.
+        # I do this by buffering the time location of the feature of 
+        # interest and then using the numpy.where method.
+        buffer = xincr
+        DE1min = DE1 - buffer
+        DE1max = DE1 + buffer
+        DE2min = DE2 - buffer
+        DE2max = DE2 + buffer
+
+        DE1 = np.where(np.logical_and(time <= DE1max, time >= DE1min))
+        DE2 = np.where(np.logical_and(time <= DE2max, time >= DE2min))
+
+        #extract integer from tuple and array
+        while type(DE1) != type(np.int64(4)):
+            DE1 = DE1[0]
+        while type(DE2) != type(np.int64(4)):
+            DE2 = DE2[0]
+
+        #now I have the indecies if the two distal features along the
+        # temporal axis. With these, I am going to zero everything
+        # except a few microseconds in each direction along the temporal
+        # axis.
+        DE1_env = np.copy(A_of_t)
+        DE2_env = np.copy(A_of_t)  
+
+        half_width =  500#in indecies
 
+        DE1_env[DE1+half_width:] = 0
+        DE1_env[:DE1-half_width] = 0
+        
+        DE2_env[:DE2-half_width] = 0
+        DE2_env[DE2+half_width:] = 0
+
+        '''
+        #plotting tools that are useful during developement
+        plt.plot(time,amplitude,'k')
+        plt.plot(time,A_of_t,'b')
+        plt.plot(time,DE1_env,'g')
+        plt.plot(time,DE2_env,'r')
+        plt.show()
+        '''
+
+        #With these zero-padded, isolated segments of the envelope, I can perform
+        # a cross correlation, find the peaks of this cross correlation, and from
+        # that, determine the TOF for a complete round trip.
+        shift, uncertainty = self.odf.cross_correlate_shift(DE1_env, DE2_env)
+        #the shift is found between the samples (see cross_correlate_shift), and it is rounded
+        # where a whole number of samples is needed
+        index_shift = int(round(shift))
+        times_of_flight[0] = shift * xincr
+        
+        #correct for the error in the initial bang
+        peaks[0] = peaks[4] - index_shift
+        
 
-            #these are the time locations of the distal end features
-            DE1 = peaks[4] * xincr - xzero
-            DE2 = peaks[8] * xincr - xzero
 
-            #now I need to find these time locations on the original spectrum.
-            # I do this by buffering the time location of the feature of 
-            # interest and then using the numpy.where method.
+        
+        #this just graphs the shifted waveform features
+        DE2_env = DE2_env[index_shift:]
+        zero_pad = np.zeros(index_shift)
+        DE2_env = np.concatenate((DE2_env,zero_pad))
+        '''
+        plt.plot(time,DE2_env,'b',time,DE1_env,'r.')
+        plt.show()
+        '''
+        
+
+        j = 1 #if you start this at zero, it will cause problems. Start it at 1
+        while j <= 4:
+
+            '''
+            The architecture of this loop is almost identical to that of the code
+            preceeding it. The only difference is that now the operation is being
+            performed on the smaller features.
+            '''
+
+            #these are the time locations of the features of interest
+            f1 = peaks[j] * xincr - xzero
+            f2 = peaks[j+1] * xincr - xzero
+
+            #now I need to find these time locations on the original spectrum
             buffer = xincr
-            DE1min = DE1 - buffer
-            DE1max = DE1 + buffer
-            DE2min = DE2 - buffer
-            DE2max = DE2 + buffer
+            f1min = f1 - buffer
+            f1max = f1 + buffer
+            f2min = f2 - buffer
+            f2max = f2 + buffer
 
-            DE1 = np.where(np.logical_and(time <= DE1max, time >= DE1min))
-            DE2 = np.where(np.logical_and(time <= DE2max, time >= DE2min))
+            f1 = np.where(np.logical_and(time <= f1max, time >= f1min))
+            f2 = np.where(np.logical_and(time <= f2max, time >= f2min))
 
             #extract integer from tuple and array
-            while type(DE1) != type(np.int64(4)):
-                DE1 = DE1[0]
-            while type(DE2) != type(np.int64(4)):
-                DE2 = DE2[0]
+            while type(f1) != type(np.int64(4)):
+                f1 = f1[0]
+            while type(f2) != type(np.int64(4)):
+                f2 = f2[0]
 
-            #now I have the indecies if the two distal features along the
+            #now I have the indecies if the two along the
             # temporal axis. With these, I am going to zero everything
             # except a few microseconds in each direction along the temporal
             # axis.
-            DE1_env = np.copy(A_of_t)
-            DE2_env = np.copy(A_of_t)  
+            half_width =  500 #in indecies
+            if j == 4:
+                f1_env = np.copy(A_of_t)
+                f2_env = np.copy(zA_of_t)
+                half_width = 1500 #this case needs a larger window
 
-            half_width =  500#in indecies
+            elif j == 3:
+                f1_env = np.copy(zA_of_t)
+                f2_env = np.copy(A_of_t)
 
-            DE1_env[DE1+half_width:] = 0
-            DE1_env[:DE1-half_width] = 0
-            
-            DE2_env[:DE2-half_width] = 0
-            DE2_env[DE2+half_width:] = 0
+            else:
+                f1_env = np.copy(zA_of_t)
+                f2_env = np.copy(zA_of_t)  
+
+            f1_env[f1+half_width:] = 0
+            f1_env[:f1-half_width] = 0
+
+            f2_env[:f2-half_width] = 0
+            f2_env[f2+half_width:] = 0
 
             '''
-            #plotting tools that are useful during developement
-            plt.plot(time,amplitude,'k')
-            plt.plot(time,A_of_t,'b')
-            plt.plot(time,DE1_env,'g')
-            plt.plot(time,DE2_env,'r')
+            plt.plot(time,zamplitude,'k')
+            plt.plot(time,zA_of_t,'b')
+            plt.plot(time,f1_env,'g')
+            plt.plot(time,f2_env,'r')
             plt.show()
             '''
+            
 
             #With these zero-padded, isolated segments of the envelope, I can perform
             # a cross correlation, find the peaks of this cross correlation, and from
             # that, determine the TOF for a complete round trip.
-            peak_indexes = self.odf.cross_correlate(DE1_env, DE2_env)
-            index_shift = (int(len(time)/2) - peak_indexes[0])
-            times_of_flight[0] = index_shift * xincr
-            
-            #correct for the error in the initial bang
-            peaks[0] = peaks[4] - index_shift
+            shift, uncertainty = self.odf.cross_correlate_shift(f1_env, f2_env)
+            #the shift is found between the samples (see cross_correlate_shift), and it is rounded
+            # where a whole number of samples is needed
+            index_shift = int(round(shift))
+            times_of_flight[j] = shift * xincr
             
 
 
             
             #this just graphs the shifted waveform features
-            DE2_env = DE2_env[index_shift:]
+            f2_env = f2_env[index_shift:]
             zero_pad = np.zeros(index_shift)
-            DE2_env = np.concatenate((DE2_env,zero_pad))
+            f2_env = np.concatenate((f2_env,zero_pad))
             '''
-            plt.plot(time,DE2_env,'b',time,DE1_env,'r.')
+            plt.plot(time,f2_env,'b',time,f1_env,'r.')
             plt.show()
             '''
-            
-
-            j = 1 #if you start this at zero, it will cause problems. Start it at 1
-            while j <= 4:
-
-                '''
-                The architecture of this loop is almost identical to that of the code
-                preceeding it. The only difference is that now the operation is being
-                performed on the smaller features.
-                '''
-
-                #these are the time locations of the features of interest
-                f1 = peaks[j] * xincr - xzero
-                f2 = peaks[j+1] * xincr - xzero
-
-                #now I need to find these time locations on the original spectrum
-                buffer = xincr
-                f1min = f1 - buffer
-                f1max = f1 + buffer
-                f2min = f2 - buffer
-                f2max = f2 + buffer
-
-                f1 = np.where(np.logical_and(time <= f1max, time >= f1min))
-                f2 = np.where(np.logical_and(time <= f2max, time >= f2min))
-
-                #extract integer from tuple and array
-                while type(f1) != type(np.int64(4)):
-                    f1 = f1[0]
-                while type(f2) != type(np.int64(4)):
-                    f2 = f2[0]
-
-                #now I have the indecies if the two along the
-                # temporal axis. With these, I am going to zero everything
-                # except a few microseconds in each direction along the temporal
-                # axis.
-                half_width =  500 #in indecies
-                if j == 4:
-                    f1_env = np.copy(A_of_t)
-                    f2_env = np.copy(zA_of_t)
-                    half_width = 1500 #this case needs a larger window
-
-                elif j == 3:
-                    f1_env = np.copy(zA_of_t)
-                    f2_env = np.copy(A_of_t)
-
-                else:
-                    f1_env = np.copy(zA_of_t)
-                    f2_env = np.copy(zA_of_t)  
-
-                f1_env[f1+half_width:] = 0
-                f1_env[:f1-half_width] = 0
-
-                f2_env[:f2-half_width] = 0
-                f2_env[f2+half_width:] = 0
-
-                '''
-                plt.plot(time,zamplitude,'k')
-                plt.plot(time,zA_of_t,'b')
-                plt.plot(time,f1_env,'g')
-                plt.plot(time,f2_env,'r')
-                plt.show()
-                '''
-                
-
-                #With these zero-padded, isolated segments of the envelope, I can perform
-                # a cross correlation, find the peaks of this cross correlation, and from
-                # that, determine the TOF for a complete round trip.
-                peak_indexes = self.odf.cross_correlate(f1_env, f2_env)
-                index_shift = (int(len(time)/2) - peak_indexes[0])
-                times_of_flight[j] = index_shift * xincr
-                
-
-
-                
-                #this just graphs the shifted waveform features
-                f2_env = f2_env[index_shift:]
-                zero_pad = np.zeros(index_shift)
-                f2_env = np.concatenate((f2_env,zero_pad))
-                '''
-                plt.plot(time,f2_env,'b',time,f1_env,'r.')
-                plt.show()
-                '''
-
-                j += 1
-                
 
+            j += 1
 
-
-
-            
-            #Write these times of flight to a file.
-            for item in times_of_flight:
-                myfile.write('{},'.format(item))
-            myfile.write("\n")
-
-            print("Collected and wrote data set {}.".format(i))
-            
-            i += 1
-
-        #close the data file
-        myfile.close()
-        print()
-        print("Waveform(s) collected successfully.")
-        self.myprint("Waveform(s) collected successfully")
+        return times_of_flight
 
     def cross_correlation_waveforms_average_old_data(self):
 
@@ -811,141 +966,179 @@ class Processed_waveforms():
         mytime = self.osf.get_time_stamp()
         #name the new data file
         file_name_csv = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + ".csv"
-        #open the new data file for writing
-        myfile = open(file_name_csv,'w')
-
-        
-        #create a dictionary to contain the peaks obtained from the convolution
-        peaks = {}
-        #write column headers to the file
-        myfile.write("s1, s2, s3, s4, fwg\n")
+        #the results are kept in the result store, and written to the data file at the end
+        # (see the oscillo_result_store.py module)
+        results = ors.result_sink(metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime, 'cross_correlation_waveforms_average_old_data', metal, DL, freq, gain)
 
         #retrieve the oscilloscope object handle
-        scope = self.osf.setup_scope()
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=5.22e-4)
         #set the zoom of the oscilloscope
         self.osf.scope_change_zoom(scope,10)
 
-        #create a counting variable
-        i = 1
+        #collect the waveforms in a background thread while the waveforms that were already collected are
+        # processed here. (See the oscillo_acquisition_pipeline.py module.)
+        pipeline = oap.acquisition_pipeline(lambda: self.average_acquire(scope, 10), self.cross_correlation_waveforms_average_old_data_process)
+
         #this loop will run until the specified number of waveforms have been collected and processed.
+        for i, times_of_flight in pipeline.run(n):
+
+            #Add these times of flight to the results. The full waveguide is last for this method.
+            results.add(fwg=times_of_flight[4], segments=times_of_flight[:4])
+
+            print("Collected and wrote data set {}.".format(i))
+
+        #report how many waveforms were collected and processed per minute
+        print(pipeline.report())
+
+        #write the results to the database and the data file
+        results.close(file_name_csv)
+        print()
+        print("Waveform(s) collected successfully.")
+        self.myprint("Waveform(s) collected successfully")
+    
+
+    def average_acquire(self, scope, k):
+
+        '''
+        This method collects k waveforms and averages them for cross_correlation_waveforms_average_old_data.
+        It is called by the acquisition pipeline in a background thread.
+        '''
+
+        #collect k waveforms and average them (see retrieve_average in the oscillo_collection_functions.py module)
+        time, amplitude, xzero, xincr = self.osf.retrieve_average(scope, k)
+        time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
+
+        return time, amplitude, xzero, xincr
+
+    def cross_correlation_waveforms_average_old_data_process(self, frame):
+
+        '''
+        This method processes one averaged waveform collected by average_acquire and returns the
+        times of flight. It is called by the acquisition pipeline (see
+        cross_correlation_waveforms_average_old_data).
+        '''
+
+        #unpack the averaged waveform, trigger point, and horizontal scale
+        time, amplitude, xzero, xincr = frame
+
+        #record the averaged waveform for diagnostics (see the oscillo_diagnostics.py module)
+        self.odf.diagnostics.record("averaged waveform", [(time, amplitude, 'b')])
+
         
-        while i <= n:
-
-            #collect 10 waveforms and average them
-            times = []
-            amplitudes = []
-            j = 1
-            k = 10
-            while j <= k:
-                #retrieve waveform from oscilloscope
-                time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-                
-                #append to the lists of lists
-                times.append(time)
-                amplitudes.append(amplitude)
-                j += 1
-                self.myprint("Collected subset {} of {}".format(j,k))
-            
-            time, amplitude = self.odf.compute_average(times, amplitudes)
-            time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 5.22e-4)
-            
-            plt.plot(time,amplitude)
-            plt.show()
+        self.myprint("Processing Data.")
+        
+        #compute the envelopes
+        A_of_t = self.odf.compute_envelope(amplitude)
 
-            
-            self.myprint("Processing Data. This could take up\n\
-                         to a 60 seconds")
-            
-            #compute the envelopes
-            A_of_t = self.odf.compute_envelope(amplitude)
+        #zero the ends of the envelope to avoid error
+        A_of_t = self.odf.clip_envelope(A_of_t)
+        
+        #plt.plot(time, amplitude, 'b', time, A_of_t,"r")
+        #plt.show()
+        #plt.plot(ztime,zamplitude,'b',ztime, zA_of_t, 'r')
+        #plt.show()
+
+        #Correlating the envelope with a gaussian function of the same size produces
+        # a graph whose peaks are very easy to find. Each index in 'peak_indexes' is
+        # the index corresponding to the instance of a feature in the waveguide.
+        sigma = 1.4
+        peaks, cc, x_axis = self.odf.gausian_convolution(A_of_t,sigma,0, 3000)
+        
+        times_of_flight = ['','','','','']
 
-            #zero the ends of the envelope to avoid error
-            A_of_t = self.odf.clip_envelope(A_of_t)
-            
-            #plt.plot(time, amplitude, 'b', time, A_of_t,"r")
-            #plt.show()
-            #plt.plot(ztime,zamplitude,'b',ztime, zA_of_t, 'r')
-            #plt.show()
-
-            #Correlating the envelope with a gaussian function of the same size produces
-            # a graph whose peaks are very easy to find. Each index in 'peak_indexes' is
-            # the index corresponding to the instance of a feature in the waveguide.
-            sigma = 1.4
-            peaks, cc, x_axis = self.odf.gausian_convolution(A_of_t,sigma,0, 3000)
-            
-            times_of_flight = ['','','','','']
+        
+        #these are the time locations of the distal end features
+        DE1 = peaks[4] * xincr - xzero #4 for no DL, 3 for DL
+        DE2 = peaks[8] * xincr - xzero #8 for no DL, 7 for DL
+
+        #now I need to find these time locations on the original spectrum
+        buffer = xincr
+        DE1min = DE1 - buffer
+        DE1max = DE1 + buffer
+        DE2min = DE2 - buffer
+        DE2max = DE2 + buffer
+
+        DE1 = np.where(np.logical_and(time <= DE1max, time >= DE1min))
+        DE2 = np.where(np.logical_and(time <= DE2max, time >= DE2min))
+
+        #extract integer from tuple and array
+        while type(DE1) != type(np.int64(4)):
+            DE1 = DE1[0]
+        while type(DE2) != type(np.int64(4)):
+            DE2 = DE2[0]
+
+        #now I have the indecies if the two distal features along the
+        # temporal axis. With these, I am going to zero everything
+        # except a few microseconds in each direction along the temporal
+        # axis.
+        DE1_env = np.copy(amplitude)
+        DE2_env = np.copy(amplitude)  
+
+        half_width =  500#in indecies
+
+        DE1_env[DE1+half_width:] = 0
+        DE1_env[:DE1-half_width] = 0
+        
+        DE2_env[:DE2-half_width] = 0
+        DE2_env[DE2+half_width:] = 0
+        
+        
+        #record the isolated segments for diagnostics
+        self.odf.diagnostics.record("full waveguide segments", [(time, amplitude, 'k'), (time, DE1_env, 'g'), (time, DE2_env, 'r')])
+        
+        
+        #With these zero-padded, isolated segments of the envelope, I can perform
+        # a cross correlation, find the peaks of this cross correlation, and from
+        # that, determine the TOF for a complete round trip.
+        shift, uncertainty = self.odf.cross_correlate_shift(DE1_env, DE2_env)
+        #the shift is found between the samples (see cross_correlate_shift), and it is rounded
+        # where a whole number of samples is needed
+        index_shift = int(round(shift))
+        times_of_flight[4] = shift * xincr
 
+        
+        #this just graphs the shifted waveform features
+        DE2_env = DE2_env[index_shift:]
+        zero_pad = np.zeros(index_shift)
+        DE2_env = np.concatenate((DE2_env,zero_pad))
+        
+        self.odf.diagnostics.record("full waveguide shift", [(time, DE2_env, 'b'), (time, DE1_env, 'r.')])
+        
+        
+
+        j = 0 #start at 0 for no DL and 3 for DL
+        while j <= 3: #3 for no DL and 6 for DL
             
-            #these are the time locations of the distal end features
-            DE1 = peaks[4] * xincr - xzero #4 for no DL, 3 for DL
-            DE2 = peaks[8] * xincr - xzero #8 for no DL, 7 for DL
+            #these are the time locations of the features of interest
+            f1 = peaks[j] * xincr - xzero
+            f2 = peaks[j+1] * xincr - xzero
+
 
             #now I need to find these time locations on the original spectrum
             buffer = xincr
-            DE1min = DE1 - buffer
-            DE1max = DE1 + buffer
-            DE2min = DE2 - buffer
-            DE2max = DE2 + buffer
+            f1min = f1 - buffer
+            f1max = f1 + buffer
+            f2min = f2 - buffer
+            f2max = f2 + buffer
 
-            DE1 = np.where(np.logical_and(time <= DE1max, time >= DE1min))
-            DE2 = np.where(np.logical_and(time <= DE2max, time >= DE2min))
+            f1 = np.where(np.logical_and(time <= f1max, time >= f1min))
+            f2 = np.where(np.logical_and(time <= f2max, time >= f2min))
 
             #extract integer from tuple and array
-            while type(DE1) != type(np.int64(4)):
-                DE1 = DE1[0]
-            while type(DE2) != type(np.int64(4)):
-                DE2 = DE2[0]
+            while type(f1) != type(np.int64(4)):
+                f1 = f1[0]
+            while type(f2) != type(np.int64(4)):
+                f2 = f2[0]
 
-            #now I have the indecies if the two distal features along the
+            #now I have the indecies if the two along the
             # temporal axis. With these, I am going to zero everything
             # except a few microseconds in each direction along the temporal
             # axis.
-            DE1_env = np.copy(amplitude)
-            DE2_env = np.copy(amplitude)  
-
-            half_width =  500#in indecies
-
-            DE1_env[DE1+half_width:] = 0
-            DE1_env[:DE1-half_width] = 0
-            
-            DE2_env[:DE2-half_width] = 0
-            DE2_env[DE2+half_width:] = 0
-            
-            
-            plt.plot(time,amplitude,'k')
-            #plt.plot(time,A_of_t,'b')
-            plt.plot(time,DE1_env,'g')
-            plt.plot(time,DE2_env,'r')
-            plt.show()
-            
-            
-            
-            #With these zero-padded, isolated segments of the envelope, I can perform
-            # a cross correlation, find the peaks of this cross correlation, and from
-            # that, determine the TOF for a complete round trip.
-            peak_indexes = self.odf.cross_correlate(DE1_env, DE2_env)
-            index_shift = (int(len(time)/2) - peak_indexes[0])
-            times_of_flight[4] = index_shift * xincr
-
-            
-            #this just graphs the shifted waveform features
-            DE2_env = DE2_env[index_shift:]
-            zero_pad = np.zeros(index_shift)
-            DE2_env = np.concatenate((DE2_env,zero_pad))
-            
-            
-            plt.plot(time,DE2_env,'b',time,DE1_env,'r.')
-            plt.show()
-            
-            
-
-            j = 0 #start at 0 for no DL and 3 for DL
-            while j <= 3: #3 for no DL and 6 for DL
-                
-                #these are the time locations of the features of interest
-                f1 = peaks[j] * xincr - xzero
-                f2 = peaks[j+1] * xincr - xzero
-
+            half_width =  500 #in indecies
+            if j == 0: #The first segment gets its own special treatment
+                f1 = peaks[j+1] * xincr - xzero
+                f2 = peaks[j+4] * xincr - xzero
 
                 #now I need to find these time locations on the original spectrum
                 buffer = xincr
@@ -963,118 +1156,103 @@ class Processed_waveforms():
                 while type(f2) != type(np.int64(4)):
                     f2 = f2[0]
 
-                #now I have the indecies if the two along the
-                # temporal axis. With these, I am going to zero everything
-                # except a few microseconds in each direction along the temporal
-                # axis.
-                half_width =  500 #in indecies
-                if j == 0: #The first segment gets its own special treatment
-                    f1 = peaks[j+1] * xincr - xzero
-                    f2 = peaks[j+4] * xincr - xzero
-
-                    #now I need to find these time locations on the original spectrum
-                    buffer = xincr
-                    f1min = f1 - buffer
-                    f1max = f1 + buffer
-                    f2min = f2 - buffer
-                    f2max = f2 + buffer
-
-                    f1 = np.where(np.logical_and(time <= f1max, time >= f1min))
-                    f2 = np.where(np.logical_and(time <= f2max, time >= f2min))
-
-                    #extract integer from tuple and array
-                    while type(f1) != type(np.int64(4)):
-                        f1 = f1[0]
-                    while type(f2) != type(np.int64(4)):
-                        f2 = f2[0]
-
-                    f1_env = np.copy(amplitude)
-                    f2_env = np.copy(amplitude)
-
-                else:
-                    f1_env = np.copy(amplitude)
-                    f2_env = np.copy(amplitude)  
-                
-                f1_env[f1+half_width:] = 0 
-                f1_env[:f1-half_width] = 0
+                f1_env = np.copy(amplitude)
+                f2_env = np.copy(amplitude)
 
-                f2_env[:f2-half_width] = 0
-                f2_env[f2+half_width:] = 0 
+            else:
+                f1_env = np.copy(amplitude)
+                f2_env = np.copy(amplitude)  
+            
+            f1_env[f1+half_width:] = 0 
+            f1_env[:f1-half_width] = 0
 
-                
-                plt.plot(time,amplitude,'k')
-                plt.plot(time,f1_env,'g')
-                plt.plot(time,f2_env,'r')
-                plt.show()
-                
-                
+            f2_env[:f2-half_width] = 0
+            f2_env[f2+half_width:] = 0 
 
-                #With these zero-padded, isolated segments of the envelope, I can perform
-                # a cross correlation, find the peaks of this cross correlation, and from
-                # that, determine the TOF for a complete round trip.
-                peak_indexes = self.odf.cross_correlate(f1_env, f2_env)
-                index_shift = (int(len(time)/2) - peak_indexes[0])
+            
+            #record the isolated segments for diagnostics
+            self.odf.diagnostics.record("segment {} segments".format(j), [(time, amplitude, 'k'), (time, f1_env, 'g'), (time, f2_env, 'r')])
+            
+            
 
-                
-                
-                if j == 0: #again, the first segment gets special treatment
-                    times_of_flight[j] = times_of_flight[4] - index_shift * xincr
-                
-                else:
-                    
-                    times_of_flight[j] = index_shift * xincr
+            #With these zero-padded, isolated segments of the envelope, I can perform
+            # a cross correlation, find the peaks of this cross correlation, and from
+            # that, determine the TOF for a complete round trip.
+            shift, uncertainty = self.odf.cross_correlate_shift(f1_env, f2_env)
+            #the shift is found between the samples (see cross_correlate_shift), and it is rounded
+            # where a whole number of samples is needed
+            index_shift = int(round(shift))
 
+            
+            
+            if j == 0: #again, the first segment gets special treatment
+                times_of_flight[j] = times_of_flight[4] - shift * xincr
+            
+            else:
                 
-                #this just graphs the shifted waveform features
-                f2_env = f2_env[index_shift:]
-                zero_pad = np.zeros(index_shift)
-                f2_env = np.concatenate((f2_env,zero_pad))
-                
-                plt.plot(time,f2_env,'b',time,f1_env,'r.')
-                plt.show()
-                
+                times_of_flight[j] = shift * xincr
 
-                j += 1
             
-            #Write these times of flight to a file.
-            for item in times_of_flight:
-                myfile.write('{},'.format(item))
-            myfile.write("\n")
-
-            print("Collected and wrote data set {}.".format(i))
+            #this just graphs the shifted waveform features
+            f2_env = f2_env[index_shift:]
+            zero_pad = np.zeros(index_shift)
+            f2_env = np.concatenate((f2_env,zero_pad))
+            self.odf.diagnostics.record("segment {} shift".format(j), [(time, f2_env, 'b'), (time, f1_env, 'r.')])
             
-            i += 1
 
-        myfile.close()
-        print()
-        print("Waveform(s) collected successfully.")
-        self.myprint("Waveform(s) collected successfully")
-    
+            j += 1
+
+        return times_of_flight
 
 class Calibration_processes():
 
     def __init__(self,rootwindow,strvar):
         self.rootwindow = rootwindow
         self.strvar = strvar
-        self.use_previouse_reference()
         self.osf = oscillo_collection_functions.data_collection(self.rootwindow,self.strvar)
         self.odf = oscillo_data_processing_functions.data_process(self.rootwindow,self.strvar)
+        #the references of every waveguide (see the oscillo_reference_library.py module)
+        self.library = orl.get_library()
+        #the reference peaks in use. They are shared with the other options, and read when they are first needed.
+        self.current = orl.get_current()
         return
 
     def myprint(self,text):
         self.strvar.set(text)
         self.rootwindow.update()
 
-    def use_previouse_reference(self):
+    def find_reference_peaks(self, metal, DL, freq, gain, xincr, xend, c, threshold, mindist):
 
-        ref_file = open("reference.txt","r")
-        ref_line = ref_file.readline()
-        self.ref_values = ref_line.split(',')
+        '''
+        This method returns the peaks of the reference in the reference library that was collected
+        with the same parameters, at the temperature given by the user. The reference is clipped at the
+        same xend, and its peaks are found with the same gaussian convolution parameters, as the collected
+        waveforms. If the library doesn't have that reference, the reference peaks in use are returned
+        (see get_current in the oscillo_reference_library.py module). Either way, a reference_peaks object
+        is returned, and its version is stored with the results.
+
+        The peaks are times from the signal trigger point, so they can only be compared with waveforms
+        that have the same horizontal scale factor (xincr). If the reference was found with different
+        settings, the user is told why, and None is returned.
+        '''
 
-        for index in range(len(self.ref_values)):
-            self.ref_values[index] = int(self.ref_values[index])
-            
-        self.ref_values = np.array(self.ref_values)
+        temperature = oow.get_value(self.rootwindow, "What is the temperature of the reference?",'int').show()
+        try:
+            ref = self.library.find(metal, DL, freq, gain, temperature)
+        except KeyError:
+            self.myprint("There is no reference for these parameters.\n\
+                        The reference peaks in use are used.")
+            ref_peaks = self.current.get()
+        else:
+            ref_peaks = orl.reference_peaks(ref.positions(self.odf, xend, c, threshold, mindist),
+                                            os.path.basename(ref.file_name), ref.settings(xend, c, threshold, mindist))
+        #refuse a reference that the collected waveforms can't be compared with
+        mismatch = ref_peaks.mismatch(orl.peak_settings(xincr, xend, c, threshold, mindist))
+        if mismatch is not None:
+            self.myprint("The reference {} can't be used: {}.\n\
+                        Create a new reference with these settings.".format(ref_peaks.source, mismatch))
+            return None
+        return ref_peaks
 
     def create_new_reference(self):
 
@@ -1082,58 +1260,62 @@ class Calibration_processes():
 
         if answer == 'y':
 
-            #ref_temp = oow.get_value(self.rootwindow, "What is the temperature of the new reference?",'int').show()
-
-            ref_file = open("ref4.csv","w") #change back to reference.txt after development
+            #the reference is kept in the reference library under the parameters of the collection and its temperature
+            metal, DL, freq, gain = oow.get_value(self.rootwindow, "Please fill out the following parameters","parameters").show()
+            ref_temp = oow.get_value(self.rootwindow, "What is the temperature of the new reference?",'int').show()
 
-            #The waveform from the waveguide in the furnace is collected here.
-            scope = self.osf.setup_scope()
-            scope.write("DATA:RESOLUTION REDUCED") #this is to see if I can make the processing on the long wave guides any faster.
-            self.osf.scope_change_zoom(scope,5) #this should be .5 for the 3d prints
+            #The waveform from the waveguide in the furnace is collected here. It is collected the same way as
+            # the waveforms that are compared with it (see Gaussian_calibration and gaussian_sensing): at full
+            # resolution, and only up to the end of the part that is kept by clip_tails.
+            scope = self.osf.setup_scope(xend=5.22e-4)
+            self.osf.scope_change_zoom(scope,0.5)
             time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
             '''
             plt.plot(time, amplitude)
             plt.show()
             '''
-            #clip off the undeeded portions of the waveform
-            #time, amplitude = self.odf.clip_tails(time, amplitude, xzero, xincr, 9e-4)
-            #if you collect a reduced waveform, the this method is not necessary. The oscilloscope clips the tails off for you.
-            '''
-            plt.plot(time, amplitude)
-            plt.show()
-            '''
-            #Compute the envelope of the waveform
-            A_of_t = self.odf.compute_envelope(amplitude)
+            #save the waveform to the reference library. The tails are clipped off when its peaks are found
+            # (see the positions method of the reference class in the oscillo_reference_library.py module).
+            self.library.add(time, amplitude, scope.preamble(), metal, DL, freq, gain, ref_temp)
+            ref = self.library.find(metal, DL, freq, gain, ref_temp)
 
-            #zero the ends of the envelope to prevent convolution artifacts
-            A_of_t = self.odf.clip_envelope(A_of_t)
-            '''
-            plt.plot(time, amplitude)
-            plt.plot(time,A_of_t)
-            plt.show()
-            '''
-            #convolve the envelope with a gaussian of the same size and retrieve the 
-            # index location of the peaks
-            #peaks = self.odf.gausian_convolution(A_of_t, 1.8, 0, 2500) #these are parameters for the 3dprints
-            peaks = self.odf.gausian_convolution(A_of_t, .5, 0, 10) #these are parameters for the longer waveguides
+            #convolve the envelope with a gaussian of the same size and retrieve the times of the peaks,
+            # with the same parameters that are used on the collected waveforms. The envelope and the peaks
+            # are computed once, and kept with the reference.
+            peaks = ref.positions(self.odf, 5.22e-4, 1.8, 0, 2500)
 
-            #write the list of peaks to the reference file for future use
-            mystring = ''
-            for peak in peaks:
-                string_peak = str(peak)
-                mystring = mystring + string_peak + ","
-            mystring = mystring[:len(mystring)-1]
-            ref_file.write("{}".format(mystring))
+            #the new peaks are used from now on, by this option and by every other one, without restarting.
+            # The settings that they were found with are kept with them, so that they are never compared
+            # with waveforms that were collected or processed differently.
+            current = self.current.replace(peaks, os.path.basename(ref.file_name), ref.settings(5.22e-4, 1.8, 0, 2500))
 
             self.myprint("The new reference has been collected and created.\n\
-                        You may need to restart the program before the new\n\
-                        reference can be used.")
+                        It has {} peaks, and it is in use now (version {}).".format(len(peaks), current.version))
+
+    def tune_sigma(self, envelope, sigma, threshold, count, plateau, key=None, step=.001):
+        '''
+        There is an ideal ammount of filtering that produces a consistent number of peaks. This method
+        finds it (see the sigma_tuner class in the oscillo_sigma_tuner.py module): the value of sigma
+        where the gaussian convolution of the envelope has count peaks, well inside a plateau that is
+        plateau steps of step wide. The search starts from sigma, or from the sigma found before for
+        the same key, and the number of convolutions it computes is limited.
+        '''
+        tuned = ost.sigma_tuner(self.odf, threshold, 0).tune(envelope, count, sigma, plateau * step, step, key)
+        if tuned.low is None:
+            self.myprint("The filtering never gave {} peaks.\nsigma = {:.4f} is the closest (confidence 0).".format(count, tuned.sigma))
+        else:
+            self.myprint("The filtering for {} peaks is sigma = {:.4f}\n(plateau {:.4f} to {:.4f}, confidence {:.2f}).".format(
+                count, tuned.sigma, tuned.low, tuned.high, tuned.confidence))
+        return tuned.sigma
 
     def distinguish_peaks(self):
 
 
         #ref_temp = oow.get_value(self.rootwindow, "What is the temperature of the new reference?",'int').show()
 
+        #the waveguide and the transducer are used to find the filtering that was found for them before
+        metal, DL, freq, gain = oow.get_value(self.rootwindow, "Please fill out the following parameters","parameters").show()
+
         ref_file = open("heated_peaks.csv","a+") #change back to reference.txt after development
         
         #The waveform from the waveguide in the furnace is collected here.
@@ -1144,6 +1326,7 @@ class Calibration_processes():
         scope.write("ZOOM:ZOOM1:STATE 1")
         scope.write("ZOOM:ZOOM1:SCALE 2E-5")
         self.osf.scope_change_zoom(scope,2) #this should be .5 for the 3d prints
+        instrument = scope.instrument_id()
         
         #answer = oow.get_value(self.rootwindow, "Are you ready to collect the first waveform?",'yn').show()
         #create time references
@@ -1165,22 +1348,9 @@ class Calibration_processes():
             #retrieve the current time
             now = t.time()
 
-            #create data lists
-            times = []
-            amplitudes = []
-
+            #collect 5 waveforms and average them (see retrieve_average in the oscillo_collection_functions.py module)
             n = 5
-            for i in range(n):
-
-                time, amplitude, xzero, xincr = self.osf.retrieve_waveform(scope)
-
-                times.append(time)
-                amplitudes.append(amplitude)
-
-                self.myprint("Collected waveform #{}".format(i+1))
-
-            #compute average in data processing module
-            time, amplitude = self.odf.compute_average(times,amplitudes)
+            time, amplitude, xzero, xincr = self.osf.retrieve_average(scope, n)
 
             #split the spectrum into two parts for separate analysis
             #first make copies of the time and amplitude arrays
@@ -1222,52 +1392,19 @@ class Calibration_processes():
                 threshold1 = 0
                 threshold2 = 0 #.54
                 threshold3 = 0
-                len1 = []
-                len2 = []
-                len3 = []
                 count1 = 18
                 count2 = 5
                 count3 = 4
                 
-                m = 0
-                while True:
-                    
-                    peaks1, cc1, x_axis1 = self.odf.gausian_convolution(A_of_t1, sigma1, threshold1, 0)
-                    len1.append(len(peaks1))
-                    if len1[m] == count1 and len1[m-1000] == count1:
-                        break
-                    elif len(peaks1) < count1:
-                        print("overshot")
-                        sigma1 -= .01
-                    else:
-                        sigma1 += .001
-                    m += 1
-                
-                m = 0
-                while True:
-                    
-                    peaks2, cc2, x_axis2 = self.odf.gausian_convolution(A_of_t2, sigma2, threshold2, 0)
-                    len2.append(len(peaks2))
-                    if len2[m] == count2 and len2[m-1400] == count2:
-                        break
-                    elif len(peaks2) < count2:
-                        sigma2 -= .01
-                    else:
-                        sigma2 += .001
-                    m += 1
-
-                m = 0
-                while True:
-                    
-                    peaks3, cc3, x_axis3 = self.odf.gausian_convolution(A_of_t3, sigma3, threshold3, 0)
-                    len3.append(len(peaks3))
-                    if len3[m] == count3 and len3[m-3000]:
-                        break
-                    elif len(peaks3) < count3:
-                        sigma3 -= .01
-                    else:
-                        sigma3 += .001
-                    m += 1
+                #find each value of sigma (see tune_sigma). The lengths of the plateaus are the ones that were
+                # used when sigma was stepped .001 at a time. The values found are kept for this waveguide
+                # and transducer, so the next search starts from them.
+                sigma1 = self.tune_sigma(A_of_t1, sigma1, threshold1, count1, 1000, ost.sigma_key(metal, DL, freq, gain, instrument, 1))
+                sigma2 = self.tune_sigma(A_of_t2, sigma2, threshold2, count2, 1400, ost.sigma_key(metal, DL, freq, gain, instrument, 2))
+                sigma3 = self.tune_sigma(A_of_t3, sigma3, threshold3, count3, 3000, ost.sigma_key(metal, DL, freq, gain, instrument, 3))
+                peaks1, cc1, x_axis1 = self.odf.gausian_convolution(A_of_t1, sigma1, threshold1, 0, plot=False)
+                peaks2, cc2, x_axis2 = self.odf.gausian_convolution(A_of_t2, sigma2, threshold2, 0, plot=False)
+                peaks3, cc3, x_axis3 = self.odf.gausian_convolution(A_of_t3, sigma3, threshold3, 0, plot=False)
                 
                 self.myprint("Adjustments finished.")
                 
@@ -1391,12 +1528,23 @@ class Calibration_processes():
         metal, DL, freq, gain = oow.get_value(self.rootwindow, "Please fill out the following parameters","parameters").show()
         path_name = self.osf.make_directory(metal, DL, freq, gain)
         mytime = self.osf.get_time_stamp()
-        file_name_csv = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + ".csv"
-        myfile = open(file_name_csv,'w')
 
+        #retrieve the oscilloscope object handle. The same handle is used for every waveform.
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=5.22e-4)
+        #the vertical scale is the one that the reference is collected with (see create_new_reference)
+        self.osf.scope_change_zoom(scope,0.5)
+        #create the array that each waveform is stored in. The same array is reused for every waveform.
+        buffer = self.osf.allocate_buffer()
 
-        #Write the column headers to the file.
-        myfile.write('temp,dt1,dt2,dt3,dt4,dt5')
+        #find the peaks of the reference for this waveguide. They must have been found with the same settings.
+        ref_peaks = self.find_reference_peaks(metal, DL, freq, gain, scope.preamble().xincr, 5.22e-4, 1.8, 0, 2500)
+        if ref_peaks is None:
+            return
+        file_name_csv = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + ".csv"
+        #the results are kept in the result store (see the oscillo_result_store.py module)
+        results = ors.result_sink(metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime, 'Gaussian_calibration', metal, DL, freq, gain,
+                                  reference=ref_peaks.version)
         
         answer = oow.get_value(self.rootwindow, "Are you ready to collect the first waveform?",'yn').show()
         
@@ -1414,8 +1562,7 @@ class Calibration_processes():
             #temps = temps.split(',')
 
             #The waveform from the waveguide in the furnace is collected here.
-            scope = self.osf.setup_scope()
-            time, volts, xzero, xincr = self.osf.retrieve_waveform(scope)
+            time, volts, xzero, xincr = self.osf.retrieve_waveform(scope, out=buffer, lazy_time=True)
 
             #clip off the undeeded portions of the waveform
             time, amplitude = self.odf.clip_tails(time, volts, xzero, xincr, 5.22e-4)
@@ -1428,51 +1575,80 @@ class Calibration_processes():
 
             #convolve the envelope with a gaussian of the same size and retrieve the 
             # index location of the peaks
-            peaks = self.odf.gausian_convolution(A_of_t, 1.8, 0, 2500)
+            peaks, cc, x_axis = self.odf.gausian_convolution(A_of_t, 1.8, 0, 2500)
+            #the peaks are refined between the samples and turned into times from the trigger point, the
+            # same way as the reference peaks (see the positions method of the reference class)
+            peaks, errors = self.odf.refine_convolution_peaks(A_of_t, 1.8, cc, peaks)
+            peaks = self.odf.peak_times(time, peaks, xzero, xincr)
 
             #Find the dt between the peaks of the refrence waveform and the 
             # collected waveform
             dts = []
             for j in range(len(peaks)):
                 #this is the time shift in seconds due to the temperature change.
-                dt = (peaks[j] - self.ref_values[j])
+                dt = (peaks[j] - ref_peaks[j])
                 dts.append(dt)
 
-            #Write these time shifts (dts) to file--correlating them with the
+            #Add these time shifts (dts) to the results--correlating them with the
             # temperature measured by the thermocouples.
-            myfile.write("{},".format(temp))
-            for j in range(len(dts)):
-                myfile.write("{},".format(dts[j]))
-            myfile.write("\n")
+            results.add(dts=dts, temperature=temp)
 
             #wait for the user to be ready to collect the next waveform
             '''I need to automate this eventually'''
             answer = oow.get_value(self.rootwindow, "Do you need to collect another waveform?",'yn').show()
 
+        #write the results to the database and the data file
+        results.close(file_name_csv)
+
 class Temperautre_sensing():
 
     def __init__(self,rootwindow,strvar):
         self.rootwindow = rootwindow
         self.strvar = strvar
-        self.use_previouse_reference()
         self.osf = oscillo_collection_functions.data_collection(self.rootwindow,self.strvar)
         self.odf = oscillo_data_processing_functions.data_process(self.rootwindow,self.strvar)
+        #the references of every waveguide (see the oscillo_reference_library.py module)
+        self.library = orl.get_library()
+        #the reference peaks in use. They are shared with the other options, and read when they are first needed.
+        self.current = orl.get_current()
         return
 
     def myprint(self,text):
         self.strvar.set(text)
         self.rootwindow.update()
 
-    def use_previouse_reference(self):
+    def find_reference_peaks(self, metal, DL, freq, gain, xincr, xend, c, threshold, mindist):
 
-        ref_file = open("reference.txt","r")
-        ref_line = ref_file.readline()
-        self.ref_values = ref_line.split(',')
+        '''
+        This method returns the peaks of the reference in the reference library that was collected
+        with the same parameters, at the temperature given by the user. The reference is clipped at the
+        same xend, and its peaks are found with the same gaussian convolution parameters, as the collected
+        waveforms. If the library doesn't have that reference, the reference peaks in use are returned
+        (see get_current in the oscillo_reference_library.py module). Either way, a reference_peaks object
+        is returned, and its version is stored with the results.
+
+        The peaks are times from the signal trigger point, so they can only be compared with waveforms
+        that have the same horizontal scale factor (xincr). If the reference was found with different
+        settings, the user is told why, and None is returned.
+        '''
 
-        for index in range(len(self.ref_values)):
-            self.ref_values[index] = int(self.ref_values[index])
-            
-        self.ref_values = np.array(self.ref_values)
+        temperature = oow.get_value(self.rootwindow, "What is the temperature of the reference?",'int').show()
+        try:
+            ref = self.library.find(metal, DL, freq, gain, temperature)
+        except KeyError:
+            self.myprint("There is no reference for these parameters.\n\
+                        The reference peaks in use are used.")
+            ref_peaks = self.current.get()
+        else:
+            ref_peaks = orl.reference_peaks(ref.positions(self.odf, xend, c, threshold, mindist),
+                                            os.path.basename(ref.file_name), ref.settings(xend, c, threshold, mindist))
+        #refuse a reference that the collected waveforms can't be compared with
+        mismatch = ref_peaks.mismatch(orl.peak_settings(xincr, xend, c, threshold, mindist))
+        if mismatch is not None:
+            self.myprint("The reference {} can't be used: {}.\n\
+                        Create a new reference with these settings.".format(ref_peaks.source, mismatch))
+            return None
+        return ref_peaks
         
     def gaussian_sensing(self):
 
@@ -1486,7 +1662,10 @@ class Temperautre_sensing():
         '''
         
         #setup instrument
-        scope = self.osf.setup_scope()    
+        # The oscilloscope only sends the part of the waveform that is kept by clip_tails below.
+        scope = self.osf.setup_scope(xend=5.22e-4)
+        #create the array that each waveform is stored in. The same array is reused for every waveform.
+        buffer = self.osf.allocate_buffer()
 
         #input data-collection parameters
         duration = oow.get_value(self.rootwindow, "For how many minutes would you like to collect?",'int').show()
@@ -1494,12 +1673,20 @@ class Temperautre_sensing():
         metal, DL, freq, gain = oow.get_value(self.rootwindow, "Please fill out the following parameters.",'parameters').show()
         mytime = self.osf.get_time_stamp()
         path_name = self.osf.make_directory(metal, DL, freq, gain)
+        #find the peaks of the reference for this waveguide. They must have been found with the same settings.
+        ref_peaks = self.find_reference_peaks(metal, DL, freq, gain, scope.preamble().xincr, 5.22e-4, 1.8, 0, 2500)
+        if ref_peaks is None:
+            return
         file_name_csv = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + ".csv"
-        myfile = open(file_name_csv,'w')
+        #the results are kept in the result store (see the oscillo_result_store.py module)
+        results = ors.result_sink(metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime, 'gaussian_sensing', metal, DL, freq, gain,
+                                  reference=ref_peaks.version)
         self.osf.scope_change_zoom(scope,0.5)
 
-        #Write the column headers to the file.
-        myfile.write('temp')
+        #in archive mode, the raw waveforms are also kept, in an archive file (see the open_run method)
+        archive = None
+        if oscillo_collection_functions.RUN_FORMAT == 'archive':
+            archive = self.osf.open_run(path_name, metal, DL, freq, gain, 'archive')
 
         #create time references
         then = t.time()
@@ -1511,48 +1698,244 @@ class Temperautre_sensing():
         #scale the interval between measurements. 60s is one minute.
         interval = 60 / rate
 
+        #a replay isn't paced (see the oscillo_replay.py module). Its waveforms are processed as fast as
+        # possible, and the collection stops when they run out.
+        paced = getattr(scope, 'paced', True)
+
         i = 1
-        while (now - then) < duration:
+        #the results and the archive are closed even if the collection stops early
+        try:
+            while (now - then) < duration or not paced:
 
-            now = t.time()
+                now = t.time()
+
+                if (now - then) % interval < 0.9 or not paced:
+
+                    #temps = temps.split(',')
 
-            if (now - then) % interval < 0.9:
+                    #The waveform from the waveguide in the furnace is collected here.
+                    time, volts, xzero, xincr = self.osf.retrieve_waveform(scope, out=buffer, lazy_time=True)
 
-                #temps = temps.split(',')
+                    #clip off the undeeded portions of the waveform
+                    time, amplitude = self.odf.clip_tails(time, volts, xzero, xincr, 5.22e-4)
 
-                #The waveform from the waveguide in the furnace is collected here.
-                time, volts, xzero, xincr = self.osf.retrieve_waveform(scope)
+                    #archive the raw waveform. This isn't done in the background, because the buffer is reused.
+                    if archive is not None:
+                        self.osf.save_frame(archive, time, amplitude, scope.preamble())
 
-                #clip off the undeeded portions of the waveform
-                time, amplitude = self.odf.clip_tails(time, volts, xzero, xincr, 5.22e-4)
+                    #Compute the envelope of the waveform
+                    A_of_t = self.odf.compute_envelope(amplitude)
 
-                #Compute the envelope of the waveform
-                A_of_t = self.odf.compute_envelope(amplitude)
+                    #zero the ends of the envelope to prevent convolution artifacts
+                    A_of_t = self.odf.clip_envelope(A_of_t)
 
-                #zero the ends of the envelope to prevent convolution artifacts
-                A_of_t = self.odf.clip_envelope(A_of_t)
+                    #convolve the envelope with a gaussian of the same size and retrieve the 
+                    # index location of the peaks
+                    peaks, cc, x_axis = self.odf.gausian_convolution(A_of_t, 1.8, 0, 2500)
+                    #the peaks are refined between the samples and turned into times from the trigger point,
+                    # the same way as the reference peaks (see the positions method of the reference class)
+                    peaks, errors = self.odf.refine_convolution_peaks(A_of_t, 1.8, cc, peaks)
+                    peaks = self.odf.peak_times(time, peaks, xzero, xincr)
 
-                #convolve the envelope with a gaussian of the same size and retrieve the 
-                # index location of the peaks
-                peaks = self.odf.gausian_convolution(A_of_t, 1.8, 0, 2500)
+                    #Find the dt between the peaks of the refrence waveform and the 
+                    # collected waveform
+                    dts = []
+                    for j in range(len(peaks)):
+                        #this is the time shift in seconds due to the temperature change.
+                        dt = (peaks[j] - ref_peaks[j])
+                        dts.append(dt)
+
+                    #the calibration was fitted to shifts counted in samples, so the shift is counted in
+                    # samples of the collected waveform
+                    T = 0.3699*dts[4]/xincr + 24.681
+
+                    self.myprint("{} 'C".format(T))
+                    results.add(dts=dts, temperature=T, waveform=i)
+                    
+                    i += 1
+                    if paced:
+                        t.sleep(1)
+
+        finally:
+            #write the results to the database and the data file
+            results.close(file_name_csv)
+            if archive is not None:
+                archive.close()
+        self.myprint("Temperature collection complete.")
+
+    def gaussian_sensing_acquire(self, scope, buffer, schedule):
+
+        '''
+        This method collects one waveform for gaussian_sensing_instruments. It is called by the acquisition
+        pipeline, in the collecting thread of the oscilloscope. schedule holds the time that the next
+        waveform is due and the interval between waveforms, and the method waits until the waveform is
+        due, so that every oscilloscope is collected from at the rate that the user asked for. A replay
+        isn't paced, and its schedule is None. The clipped data is copied out of the buffer, and the time
+        stamp is taken when the waveform is collected.
+        '''
+
+        #wait until the next waveform is due
+        if schedule is not None:
+            wait = schedule['next'] - t.time()
+            if wait > 0:
+                t.sleep(wait)
+            schedule['next'] = schedule['next'] + schedule['interval']
+
+        #The waveform from the waveguide in the furnace is collected here.
+        time, volts, xzero, xincr = self.osf.retrieve_waveform(scope, out=buffer, lazy_time=True)
+        time_stamp = t.time()
 
-                #Find the dt between the peaks of the refrence waveform and the 
+        #clip off the undeeded portions of the waveform
+        time, amplitude = self.odf.clip_tails(time, volts, xzero, xincr, 5.22e-4)
+
+        return time, np.copy(amplitude), xzero, xincr, scope.preamble(), time_stamp
+
+    def gaussian_sensing_process(self, frame):
+
+        '''
+        This method finds the times of the peaks of one waveform collected by gaussian_sensing_acquire, the
+        same way as gaussian_sensing. It returns the waveform with them, because the reference peaks that
+        they are compared with depend on the oscilloscope it came from (see gaussian_sensing_instruments).
+        '''
+
+        time, amplitude, xzero, xincr, preamble, time_stamp = frame
+
+        #Compute the envelope of the waveform
+        A_of_t = self.odf.compute_envelope(amplitude)
+
+        #zero the ends of the envelope to prevent convolution artifacts
+        A_of_t = self.odf.clip_envelope(A_of_t)
+
+        #convolve the envelope with a gaussian of the same size and retrieve the 
+        # index location of the peaks
+        peaks, cc, x_axis = self.odf.gausian_convolution(A_of_t, 1.8, 0, 2500)
+        #the peaks are refined between the samples and turned into times from the trigger point,
+        # the same way as the reference peaks (see the positions method of the reference class)
+        peaks, errors = self.odf.refine_convolution_peaks(A_of_t, 1.8, cc, peaks)
+        peaks = self.odf.peak_times(time, peaks, xzero, xincr)
+
+        return frame, peaks
+
+    def gaussian_sensing_instruments(self):
+
+        '''
+        This method does the same thing as gaussian_sensing, but for every connected oscilloscope at
+        once. Each oscilloscope measures a different waveguide, so the parameters of each waveguide are
+        asked for, and the reference peaks of each one are found. An oscilloscope whose reference can't
+        be used is skipped. Each oscilloscope is collected from in its own thread (see the
+        oscillo_acquisition_pipeline.py module), and the results of each waveguide are kept in a data
+        file of its own, with the serial number of the oscilloscope on every row.
+        '''
+
+        #input data-collection parameters
+        duration = oow.get_value(self.rootwindow, "For how many minutes would you like to collect?",'int').show()
+        rate = oow.get_value(self.rootwindow, "How many waveforms per minute would you like to collect?",'int').show()
+
+        #set up each of the oscilloscopes, and find the reference peaks of its waveguide
+        waveguides = {}
+        for resource_name in oscillo_scope_session.list_instruments():
+            # The oscilloscope only sends the part of the waveform that is kept by clip_tails.
+            scope = self.osf.setup_scope(xend=5.22e-4, resource_name=resource_name)
+            if scope == "instrument error":
+                print("The instrument {} was not found, so it will be skipped.".format(resource_name))
+                continue
+            instrument = scope.instrument_id()
+            #the vertical scale is the one that the reference is collected with (see create_new_reference)
+            self.osf.scope_change_zoom(scope,0.5)
+
+            #every oscilloscope is connected to a different waveguide
+            metal, DL, freq, gain = oow.get_value(self.rootwindow, "Please fill out the parameters of the waveguide on {}.".format(instrument),'parameters').show()
+            ref_peaks = self.find_reference_peaks(metal, DL, freq, gain, scope.preamble().xincr, 5.22e-4, 1.8, 0, 2500)
+            if ref_peaks is None:
+                print("The reference of {} can't be used, so it will be skipped.".format(instrument))
+                continue
+
+            mytime = self.osf.get_time_stamp()
+            path_name = self.osf.make_directory(metal, DL, freq, gain)
+            file_name_csv = path_name + "\\" + metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime + ".csv"
+            #the results are kept in the result store (see the oscillo_result_store.py module)
+            results = ors.result_sink(metal  + "_" + DL + "_" + freq + "_" + gain + "_" + mytime, 'gaussian_sensing_instruments', metal, DL, freq, gain,
+                                      reference=ref_peaks.version)
+            #in archive mode, the raw waveforms are also kept, in an archive file for each oscilloscope
+            archive = None
+            if oscillo_collection_functions.RUN_FORMAT == 'archive':
+                archive = self.osf.open_run(path_name, metal, DL, freq, gain, 'archive')
+            waveguides[instrument] = (scope, ref_peaks, results, file_name_csv, archive)
+
+        #stop if none of the oscilloscopes can be used
+        if len(waveguides) == 0:
+            self.myprint("None of the instruments could be used.")
+            return
+
+        #a replay isn't paced (see the oscillo_replay.py module). Its waveforms are processed as fast as
+        # possible, and the collection stops when they run out.
+        paced = all(getattr(waveguides[instrument][0], 'paced', True) for instrument in waveguides)
+        if paced:
+            #scale the duration to seconds, and the interval between measurements. 60s is one minute.
+            n = int(duration * rate)
+            interval = 60 / rate
+        else:
+            n = None
+
+        #give each oscilloscope its own buffer, schedule and collecting function
+        acquires = {}
+        then = t.time()
+        for instrument in waveguides:
+            scope = waveguides[instrument][0]
+            buffer = self.osf.allocate_buffer()
+            schedule = None
+            if paced:
+                schedule = {'next': then, 'interval': interval}
+            #the default arguments keep this scope, buffer and schedule with this function
+            acquires[instrument] = lambda scope=scope, buffer=buffer, schedule=schedule: self.gaussian_sensing_acquire(scope, buffer, schedule)
+
+        self.myprint("Collecting from {} instrument(s)".format(len(acquires)))
+
+        #collect from every oscilloscope at once, and process the merged waveforms here.
+        # Each oscilloscope stops after n waveforms.
+        pipeline = oap.acquisition_pipeline(acquires, self.gaussian_sensing_process, depth=4*len(acquires), limit=n)
+        if paced:
+            total = n * len(acquires)
+        else:
+            total = float('inf')
+
+        #the results and the archives are closed even if the collection stops early
+        try:
+            for (instrument, i), (frame, peaks) in pipeline.run(total):
+
+                scope, ref_peaks, results, file_name_csv, archive = waveguides[instrument]
+                time, amplitude, xzero, xincr, preamble, time_stamp = frame
+
+                #archive the raw waveform in the background. It was copied out of the buffer when it was collected.
+                if archive is not None:
+                    self.osf.save_frame_later(archive, time, amplitude, preamble, time_stamp)
+
+                #Find the dt between the peaks of the refrence waveform of this waveguide and the 
                 # collected waveform
                 dts = []
                 for j in range(len(peaks)):
                     #this is the time shift in seconds due to the temperature change.
-                    dt = (peaks[j] - self.ref_values[j])
+                    dt = (peaks[j] - ref_peaks[j])
                     dts.append(dt)
 
-                T = 0.3699*dts[4] + 24.681
+                #the calibration was fitted to shifts counted in samples, so the shift is counted in
+                # samples of the collected waveform
+                T = 0.3699*dts[4]/xincr + 24.681
 
-                self.myprint("{} 'C".format(T))
-                myfile.write('{}\n'.format(T))
-                    
-                i += 1
-                t.sleep(1)
+                self.myprint("{}: {} 'C".format(instrument, T))
+                results.add(dts=dts, temperature=T, instrument=instrument, waveform=i)
+
+        finally:
+            #write the results of each waveguide to the database and its data file
+            for instrument in waveguides:
+                scope, ref_peaks, results, file_name_csv, archive = waveguides[instrument]
+                results.close(file_name_csv)
+                if archive is not None:
+                    self.osf.close_run_later(archive)
+            #wait for the waveforms that are still being saved
+            self.osf.finish_saving()
 
-        myfile.close()
+        print(pipeline.report())
         self.myprint("Temperature collection complete.")
 
 
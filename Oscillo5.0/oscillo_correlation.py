@@ -0,0 +1,224 @@
+'''
+@author Manish Roy
+
+This module computes the correlations used in processing the data (see gausian_convolution,
+sinusoidal_convolution, cross_correlate and auto_correlate in the oscillo_data_processing_functions.py
+module). np.correlate computes every point of a correlation directly, which takes a time proportional
+to the product of the lengths of the two arrays. The gaussian is as long as the envelope, so for a
+waveform of a few hundred thousand points this grows with the square of its length, and was the
+slowest part of processing a waveform.
+
+The correlate function below gives the same results as np.correlate (in the "valid", "same" and "full"
+modes), but it chooses how to compute them from the lengths of the arrays:
+
+direct:  np.correlate itself, for short arrays, where it is the fastest.
+fft:     the correlation is computed from the Fourier transforms of the two arrays, padded to a length
+         that the FFT is fast for. This is for arrays of similar length.
+overlap: the longer array is cut into blocks, each block is correlated with the shorter array through
+         the FFT, and the results are added together (overlap-add). This is for a short kernel and a
+         long array.
+
+The Fourier transform of a kernel that is used again and again (like the gaussian of a set of
+parameters) can be kept in memory by giving it a key, so it is only computed once for each length.
+
+correlate_bank correlates one array with many kernels of the same length (a filter bank, like the
+gaussians of many values of sigma). The array is transformed once, and the correlations with all of
+the kernels are computed together from its spectrum.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import next_fast_len. It finds a length that the FFT is fast for (a product of small primes).
+from scipy.fftpack import next_fast_len
+#Import collections. The spectra of the kernels are kept in an ordered dictionary.
+import collections
+#Import the threading library. The correlations are computed from the processing threads.
+import threading
+#Import the operating system. This is used to read the settings of the correlations from the environment.
+import os
+
+#This is how the correlations are computed: 'auto' chooses from the lengths of the arrays, and 'direct',
+# 'fft' or 'overlap' always use that method (for example to compare them).
+CORRELATION_METHOD = os.environ.get('OSCILLO_CORRELATION', 'auto')
+
+#A correlation is computed directly if the product of the lengths of the arrays is smaller than this...
+DIRECT_LIMIT = int(os.environ.get('OSCILLO_CORRELATION_DIRECT', '100000'))
+#...and with overlap-add if the longer array is more than this many times longer than the shorter one.
+OVERLAP_RATIO = float(os.environ.get('OSCILLO_CORRELATION_OVERLAP', '8'))
+
+#This is the memory (in megabytes) that the kernel spectra kept in memory can use.
+SPECTRUM_CACHE_MEGABYTES = float(os.environ.get('OSCILLO_SPECTRUM_CACHE', '256'))
+
+#A point of a correlation computed through the FFT is set to zero if it is smaller than this fraction of
+# the largest that it could be (the product of the norms of the two arrays). See remove_roundoff.
+ROUNDOFF = 1e-11
+
+#This is the number of kernels of a filter bank that are correlated at once. Each one needs an array as
+# long as the correlation, so this limits the memory that a filter bank uses.
+BANK_ROWS = int(os.environ.get('OSCILLO_BANK_ROWS', '64'))
+
+#These are the kernel spectra, with the one used most recently at the end (see kernel_spectrum).
+spectrum_cache = collections.OrderedDict()
+#This is the memory that they use, in bytes.
+spectrum_bytes = 0
+#This lock protects the spectrum cache.
+spectrum_lock = threading.Lock()
+
+
+def kernel_spectrum(kernel, n, key=None):
+    '''
+    This function returns the Fourier transform of a kernel, padded with zeros to n points. If a key is
+    given, the transform is kept in memory, and the one kept for the same key and length is returned
+    instead of computing it again. The key must change whenever the kernel does.
+    '''
+    global spectrum_bytes
+    if key is None:
+        return np.fft.rfft(kernel, n)
+    with spectrum_lock:
+        spectrum = spectrum_cache.get((key, n))
+        if spectrum is not None:
+            spectrum_cache.move_to_end((key, n))
+            return spectrum
+    spectrum = np.fft.rfft(kernel, n)
+    with spectrum_lock:
+        if (key, n) not in spectrum_cache:
+            spectrum_cache[(key, n)] = spectrum
+            spectrum_bytes += spectrum.nbytes
+        #forget the spectra used least recently, but always keep the newest one
+        while spectrum_bytes > SPECTRUM_CACHE_MEGABYTES * 1e6 and len(spectrum_cache) > 1:
+            spectrum_bytes -= spectrum_cache.popitem(last=False)[1].nbytes
+    return spectrum
+
+
+def choose_method(n, m):
+    '''
+    This function chooses how a correlation of arrays of lengths n and m is computed (see the
+    description of this module).
+    '''
+    if CORRELATION_METHOD != 'auto':
+        return CORRELATION_METHOD
+    if n * m < DIRECT_LIMIT or min(n, m) < 2:
+        return 'direct'
+    if max(n, m) > OVERLAP_RATIO * min(n, m):
+        return 'overlap'
+    return 'fft'
+
+
+def fft_full(a, v, key=None):
+    '''
+    This function returns the full correlation of a with v, computed from their Fourier transforms.
+    The correlation at lag k is the k-th point of the inverse transform (wrapped around for the
+    negative lags), as long as the transforms are long enough that the ends don't overlap.
+    '''
+    n = len(a)
+    m = len(v)
+    length = next_fast_len(n + m - 1)
+    circular = np.fft.irfft(np.fft.rfft(a, length) * np.conj(kernel_spectrum(v, length, key)), length)
+    #the negative lags are at the end, and the positive lags at the start
+    return np.concatenate((circular[length - (m - 1):], circular[:n]))
+
+
+def overlap_full(a, v, key=None):
+    '''
+    This function returns the full correlation of a long array a with a short kernel v, with the
+    overlap-add method. a is cut into blocks, the full correlation of each block with v is computed
+    through the FFT, and it is added to the result at the position of the block. Every block uses the
+    same spectrum of v.
+    '''
+    n = len(a)
+    m = len(v)
+    #blocks a few times longer than the kernel keep the wasted part of each FFT small
+    length = next_fast_len(4 * m)
+    block = length - m + 1
+    spectrum = np.conj(kernel_spectrum(v, length, key))
+    full = np.zeros(n + m - 1)
+    for start in range(0, n, block):
+        piece = a[start:start + block]
+        circular = np.fft.irfft(np.fft.rfft(piece, length) * spectrum, length)
+        #the full correlation of the block, with the negative lags moved to the front
+        size = len(piece) + m - 1
+        full[start:start + size] += np.concatenate((circular[length - (m - 1):], circular[:len(piece)]))
+    return full
+
+
+def correlate(a, v, mode='valid', key=None):
+    '''
+    This function returns the correlation of a with v, like np.correlate(a, v, mode). key names the
+    kernel v, so that its spectrum can be kept in memory (see kernel_spectrum). Complex arrays are
+    always correlated directly.
+    '''
+    a = np.asarray(a)
+    v = np.asarray(v)
+    n = len(a)
+    m = len(v)
+    method = choose_method(n, m)
+    if method == 'direct' or np.iscomplexobj(a) or np.iscomplexobj(v) or n == 0 or m == 0:
+        return np.correlate(a, v, mode)
+
+    a = a.astype(np.float64)
+    v = v.astype(np.float64)
+    if method == 'overlap' and n >= m:
+        full = overlap_full(a, v, key)
+    elif method == 'overlap':
+        #the kernel is the longer array. The correlation of v with a is the same one backwards.
+        full = overlap_full(v, a)[::-1]
+    else:
+        full = fft_full(a, v, key)
+
+    return cut(remove_roundoff(full, np.linalg.norm(a) * np.linalg.norm(v)), n, m, mode)
+
+
+def remove_roundoff(full, bound):
+    '''
+    This function sets the points of a correlation computed through the FFT that are only round-off to
+    zero. bound is the largest that a point can be (the product of the norms of the arrays, for each row).
+    The direct correlation of arrays that were zeroed outside of a window (like the isolated echoes that
+    cross_correlate is given) is exactly zero where the windows don't overlap, but the FFT leaves a tiny
+    ripple there, and peakutils (with thres = 0) would find peaks in it.
+    '''
+    full[np.abs(full) < ROUNDOFF * np.asarray(bound)[..., None]] = 0
+    return full
+
+
+def cut(full, n, m, mode):
+    '''
+    This function cuts a full correlation of arrays of lengths n and m (along its last axis) down to
+    the points that np.correlate returns in the given mode.
+    '''
+    if mode == 'full':
+        return full
+    if mode == 'same':
+        if n >= m:
+            start = (m - 1) // 2
+        else:
+            start = n // 2
+        return full[..., start:start + max(n, m)]
+    if mode == 'valid':
+        return full[..., min(n, m) - 1:max(n, m)]
+    raise ValueError("mode must be 'valid', 'same' or 'full', not {!r}".format(mode))
+
+
+def correlate_bank(a, kernels, mode='valid', keys=None):
+    '''
+    This function returns the correlations of a with each of the kernels (which all have the same
+    length), as the rows of a 2D array. Row i is the same as correlate(a, kernels[i], mode). keys name
+    the kernels, so that their spectra can be kept in memory (see kernel_spectrum).
+    '''
+    a = np.asarray(a, dtype=np.float64)
+    n = len(a)
+    m = len(kernels[0])
+    if keys is None:
+        keys = [None] * len(kernels)
+    #the spectrum of a is computed once for all of the kernels
+    length = next_fast_len(n + m - 1)
+    spectrum = np.fft.rfft(a, length)
+    kernel_spectra = np.array([kernel_spectrum(np.asarray(kernel, dtype=np.float64), length, key)
+                               for kernel, key in zip(kernels, keys)])
+    circular = np.fft.irfft(spectrum * np.conj(kernel_spectra), length, axis=-1)
+    full = np.concatenate((circular[:, length - (m - 1):], circular[:, :n]), axis=-1)
+    bounds = np.linalg.norm(a) * np.linalg.norm(np.asarray(kernels, dtype=np.float64), axis=-1)
+    return cut(remove_roundoff(full, bounds), n, m, mode)
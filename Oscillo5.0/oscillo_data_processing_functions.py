@@ -24,6 +24,21 @@ import _thread as th
 import peakutils as pu
 #Import time. This is a module that allows python to execute certain commands in real time.
 import time as t
+#Import the threading library. This is used to check which thread a message is being printed from.
+import threading
+#Import the binary waveform files. (See the oscillo_waveform_files.py module.)
+import oscillo_waveform_files as owf
+#Import the run files. (See the oscillo_run_files.py module.)
+import oscillo_run_files as orf
+#Import the correlations. They give the same results as np.correlate, much faster for long arrays.
+# (See the oscillo_correlation.py module.)
+import oscillo_correlation as oc
+#Import the diagnostics sink. The processing methods hand it the arrays they used to plot, instead of
+# plotting them. (See the oscillo_diagnostics.py module.)
+import oscillo_diagnostics as odg
+#Import the peak interpolation. It finds the positions of the peaks between the samples.
+# (See the oscillo_peak_interpolation.py module.)
+import oscillo_peak_interpolation as opi
 
 class data_process():
 
@@ -34,13 +49,21 @@ class data_process():
         '''
         self.rootwindow = rootwindow
         self.strvar = strvar
+        #the arrays that the processing methods used to plot are recorded here instead
+        self.diagnostics = odg.get_sink()
         return
 
     def myprint(self,text):
         '''
         This method is alot like the built-in print() method in python. But instead of 
         "printing" the text to the terminal, it displays it in the GUI message center.
+        The GUI can only be updated from the main thread, so when this method is called from
+        a background thread (like the acquisition pipeline), the text is printed instead.
         '''
+        #check if this is a background thread
+        if threading.current_thread() is not threading.main_thread():
+            print(text)
+            return
         #Set the inherited string variable to the new text.
         self.strvar.set(text)
         #update the GUI window so that the text immediately appears.
@@ -62,26 +85,33 @@ class data_process():
         zeromin = xzero - zero_buffer
         zeromax = xzero + zero_buffer
 
-        #this method returns the index of the time array where the trigger point was found.
-        start_index = np.where(np.logical_and(time <= zeromax, time >= zeromin))
-
-        #extract integer from tuple and array
-        while type(start_index) != type(np.int64(4)):
-
-            start_index = start_index[0]
-
         #the same process is repeated with the ending index, except in this case, the ending index is
         # arbitrary. The developer can select it based on how much of the waveform they want to work with.
         end_buffer = xincr
         endmin = xend - end_buffer
         endmax = xend + end_buffer
 
-        end_index = np.where(np.logical_and(time <= endmax, time >= endmin))
-        
-        #extract integer from tuple and array
-        while type(end_index) != type(np.int64(4)):
+        #A lazy time axis (see the time_axis class in the oscillo_collection_functions.py module) can
+        # calculate the indecies directly, without comparing a million time values.
+        if not isinstance(time, np.ndarray):
+            start_index = time.search(zeromin)
+            end_index = time.search(endmin)
+
+        else:
+            #this method returns the index of the time array where the trigger point was found.
+            start_index = np.where(np.logical_and(time <= zeromax, time >= zeromin))
+
+            #extract integer from tuple and array
+            while type(start_index) != type(np.int64(4)):
+
+                start_index = start_index[0]
+
+            end_index = np.where(np.logical_and(time <= endmax, time >= endmin))
+            
+            #extract integer from tuple and array
+            while type(end_index) != type(np.int64(4)):
 
-            end_index = end_index[0]
+                end_index = end_index[0]
 
 
 
@@ -119,14 +149,21 @@ class data_process():
 
         #specify the path of the data file
         path = "nothing yet" #come finish this function later
-        #extract the data from the file
-        mydata = np.genfromtxt(path, delimiter = ',')
-        #transpose the data into horizontal arrays
-        mydata = np.transpose(mydata)
-
-        #extract the two arrays from the array of arrays
-        time = mydata[0]
-        amplitude = mydata[1]
+        #binary waveform files are read with the oscillo_waveform_files.py module
+        if path.endswith(owf.EXTENSION):
+            time, amplitude, header = owf.load_waveform(path)
+        #run files hold many waveforms, so the first one is plotted
+        elif path.endswith(orf.EXTENSION):
+            time, amplitude, header = orf.run_reader(path).read_frame(0)
+        else:
+            #extract the data from the file
+            mydata = np.genfromtxt(path, delimiter = ',')
+            #transpose the data into horizontal arrays
+            mydata = np.transpose(mydata)
+
+            #extract the two arrays from the array of arrays
+            time = mydata[0]
+            amplitude = mydata[1]
 
         #plot the data in the arrays.
         plt.plot(time,amplitude)
@@ -158,6 +195,21 @@ class data_process():
         #return the averaged arrays
         return time, amplitude
 
+    def estimate_noise(self, amplitude):
+        '''
+        This method estimates the standard deviation of the noise in a waveform. The echoes change
+        very little from one point to the next, so the differences between neighbouring points are
+        mostly noise. The median absolute deviation is used so that the echoes themselves don't
+        inflate the estimate. Dividing by 0.6745 converts it to a standard deviation, and dividing
+        by the square root of 2 accounts for the difference of two noisy points.
+        '''
+        #compute the point-to-point differences
+        differences = np.diff(amplitude)
+        #compute the median absolute deviation of the differences
+        mad = np.median(np.abs(differences - np.median(differences)))
+        #convert it to the standard deviation of the noise on a single point
+        return mad / 0.6745 / np.sqrt(2)
+
     def compute_envelope(self, amplitude):
         '''
         This method computes the envelope of the waveform. The method used here is described
@@ -270,7 +322,7 @@ class data_process():
 
     def auto_correlate(self, myarray):
 
-        cc = np.correlate(myarray, myarray, mode = "full")
+        cc = oc.correlate(myarray, myarray, mode = "full")
         x_axis = np.arange(0,len(cc))
         
         #find the peaks of the auto-cross-correlation graph
@@ -288,29 +340,32 @@ class data_process():
         return(peak_indexes)
         '''
 
-    def gausian_convolution(self, myarray,c,threshold,mindist):
-
+    def gausian_convolution(self, myarray,c,threshold,mindist,plot=True):
 
-        #create an array of integers that represent the domain of the 
-        # gaussian. These will be used as an axis to compute the 
-        # y values of the gaussian function
-        myx = np.linspace(-100,100,len(myarray))
+        '''
+        The convolution and its peaks used to be plotted here, which stopped the processing until the
+        plot was closed. Now they are only recorded in the diagnostics sink (see the oscillo_diagnostics.py
+        module), which does nothing with them unless diagnostics were asked for. If plot is False, they
+        aren't recorded either. This is used when the peaks of a reference are computed (see the
+        oscillo_reference_library.py module), and when sigma is tuned.
+        '''
 
         '''
         *************useful values for c**************
         For 3D-printed aluminum waveguide, c=1.8
         '''
         
-        #compute the y values of the gaussian function.
-        gaus = np.exp(-(myx**2) / (2 * c**2))
+        #compute the y values of the gaussian function (see gaussian_kernel).
+        gaus = self.gaussian_kernel(len(myarray), c)
         
         #plot the gaussian curve with the envelope
         #plt.plot(myx, myarray, 'r', myx, gaus, 'b')
         #plt.show()
 
         
-        #convolve the gaussian function with the envelope
-        cc = np.correlate(myarray, gaus, mode = "same")
+        #convolve the gaussian function with the envelope. The gaussian only depends on c and the length
+        # of the envelope, so its spectrum is kept for the next waveform.
+        cc = oc.correlate(myarray, gaus, mode = "same", key = ('gaussian', c, len(myarray)))
         x_axis = np.arange(0,len(cc))
 
         
@@ -320,20 +375,65 @@ class data_process():
         peak_indexes = pu.indexes(cc, thres = threshold, min_dist = mindist)
         
         
-        #plotting stuff for development
-        for index in peak_indexes:
-            plt.plot(x_axis[index], cc[index],'r.') 
-
-        plt.plot(x_axis,cc)
-        plt.show()
-        
-        #plt.savefig("{}.png".format(c))
-        plt.close()
-        
-        
+        #record the convolution and its peaks for diagnostics
+        if plot:
+            self.diagnostics.record("gaussian convolution", [(x_axis, cc, 'b')], (x_axis[peak_indexes], cc[peak_indexes]))
 
         return(peak_indexes,cc, x_axis)
 
+    def gaussian_kernel(self, length, c):
+        '''
+        This method returns the gaussian that an envelope of the given length is convolved with in
+        gausian_convolution. c is its width (sigma).
+        '''
+        #create an array of integers that represent the domain of the 
+        # gaussian. These will be used as an axis to compute the 
+        # y values of the gaussian function
+        myx = np.linspace(-100,100,length)
+
+        #compute the y values of the gaussian function.
+        return np.exp(-(myx**2) / (2 * c**2))
+
+    def gaussian_filter_bank(self, myarray, sigmas, threshold, mindist):
+        '''
+        This method returns the number of peaks that gausian_convolution finds in the envelope for each
+        of the values of c (sigma) that are given, without plotting them. The envelope is transformed
+        once, and the convolutions with all of the gaussians are computed together (see correlate_bank
+        in the oscillo_correlation.py module). The spectrum of each gaussian is kept in memory, so a
+        value of sigma that was tried before isn't transformed again.
+        '''
+        counts = []
+        #the gaussians are convolved a number of them at a time, which limits the memory used
+        for start in range(0, len(sigmas), oc.BANK_ROWS):
+            chunk = sigmas[start:start + oc.BANK_ROWS]
+            kernels = [self.gaussian_kernel(len(myarray), c) for c in chunk]
+            keys = [('gaussian', c, len(myarray)) for c in chunk]
+            for cc in oc.correlate_bank(myarray, kernels, mode = "same", keys = keys):
+                #find the peaks of each convolution, like gausian_convolution does
+                counts.append(len(pu.indexes(cc, thres = threshold, min_dist = mindist)))
+        return np.array(counts)
+
+    def refine_convolution_peaks(self, myarray, c, cc, peak_indexes, method=opi.PEAK_INTERPOLATION):
+        '''
+        This method returns the positions of the peaks of a gaussian convolution between the samples,
+        and their uncertainties (both in samples). myarray is the envelope, and cc and peak_indexes are
+        the convolution and the peaks that gausian_convolution returned for it with the width c, and
+        method is the interpolation method. The uncertainties come from the noise of the envelope (see
+        the oscillo_peak_interpolation.py module). The positions can be turned into times with peak_times.
+        '''
+        kernel = self.gaussian_kernel(len(myarray), c)
+        noise = self.estimate_noise(myarray)
+        return opi.refine_peaks(cc, peak_indexes, method, noise, kernel)
+
+    def peak_times(self, time, positions, xzero, xincr):
+        '''
+        This method turns the positions of peaks (in samples, counted from the start of a waveform that
+        was clipped by clip_tails) into times in seconds, measured from the signal trigger point. time is
+        the time axis of the clipped waveform, so peaks found in waveforms that start at different points
+        of the record can be compared.
+        '''
+        return time[0] + np.asarray(positions, dtype=np.float64) * xincr - abs(xzero)
+
     def sinusoidal_convolution(self, myarray,c,threshold,mindist):
 
 
@@ -351,13 +451,12 @@ class data_process():
         
         gaus = 10 * np.exp(-(myx**2) / (2 * c)) * np.sin(myx)
         
-        #plot the sinusoidal curve with the envelope
-        plt.plot(myx, myarray, 'r', myx, gaus, 'b')
-        plt.show()
+        #record the sinusoidal curve with the envelope for diagnostics
+        self.diagnostics.record("sinusoidal kernel", [(myx, myarray, 'r'), (myx, gaus, 'b')])
 
         
         #convolve the sinusoidal function with the envelope
-        cc = np.correlate(myarray, gaus, mode = "same")
+        cc = oc.correlate(myarray, gaus, mode = "same", key = ('sinusoidal', c, len(myarray)))
         x_axis = np.arange(0,len(cc))
 
         
@@ -367,20 +466,14 @@ class data_process():
         peak_indexes = pu.indexes(cc, thres = threshold, min_dist = mindist)
 
         
-        #plotting stuff for development
-        for index in peak_indexes:
-            plt.plot(x_axis[index], cc[index],'r.') 
-
-        plt.plot(x_axis,cc)
-        plt.show()
-        
-        
+        #record the convolution and its peaks for diagnostics
+        self.diagnostics.record("sinusoidal convolution", [(x_axis, cc, 'b')], (x_axis[peak_indexes], cc[peak_indexes]))
 
         return(peak_indexes)
 
     def cross_correlate(self, array1, array2):
 
-        cc = np.correlate(array1, array2, mode = "same")
+        cc = oc.correlate(array1, array2, mode = "same")
         x_axis = np.arange(0,len(cc))
         
         #find the peaks of the auto-cross-correlation graph
@@ -396,4 +489,23 @@ class data_process():
         plt.show()
         '''
         
-        return(peak_indexes)
\ No newline at end of file
+        return(peak_indexes)
+
+    def cross_correlate_shift(self, array1, array2):
+        '''
+        This method returns the shift (in samples, between the samples) of array2 from array1, and its
+        uncertainty. It is the shift that the first peak of their cross correlation (see cross_correlate)
+        gives, with the peak refined between the samples. The noise of each array is carried through the
+        other one, which is the kernel that it is correlated with.
+        '''
+        cc = oc.correlate(array1, array2, mode = "same")
+        peak_indexes = pu.indexes(cc, thres = 0, min_dist = 3000)
+        if len(peak_indexes) == 0:
+            return 0., opi.WHOLE_SAMPLE
+        #the noise of each array is estimated where it isn't zero (the ends of the envelopes are zeroed)
+        noise1 = self.estimate_noise(array1[array1 != 0])
+        noise2 = self.estimate_noise(array2[array2 != 0])
+        position, error1 = opi.refine_peaks(cc, peak_indexes[:1], kernel = array2, noise = noise1)
+        position, error2 = opi.refine_peaks(cc, peak_indexes[:1], kernel = array1, noise = noise2)
+        shift = int(len(array1)/2) - position[0]
+        return shift, float(np.sqrt(error1[0] ** 2 + error2[0] ** 2))
\ No newline at end of file
@@ -0,0 +1,250 @@
+'''
+@author Manish Roy
+
+This module contains the diagnostics sink. The processing methods (like gausian_convolution in the
+oscillo_data_processing_functions.py module, and the processing of the timing options) used to plot
+what they computed and call plt.show(), which stops everything until the plot window is closed. A
+collection left to run on its own stalled at the first plot, and plotting from the processing threads
+isn't safe at all.
+
+Now the processing methods only compute their results, and hand the arrays they would have plotted to
+the diagnostics sink. What the sink does with them depends on OSCILLO_DIAGNOSTICS:
+
+off:    nothing. This is the default, and recording costs almost nothing.
+record: the latest DIAGNOSTICS_BUFFER records are kept in memory (a ring buffer), where they can be
+        looked at (see recent) or saved as plots when they are wanted (see save).
+save:   the records are also saved as plots (PNG files in DIAGNOSTICS_DIRECTORY) by a thread of their
+        own, one record in every DIAGNOSTICS_EVERY.
+
+The arrays are decimated before they are kept (see decimate), so a record is small no matter how long
+the waveform is. The plots are drawn without the GUI (with the Agg backend of matplotlib), so they can
+be drawn from any thread, and a plot that can't be drawn in time is dropped instead of slowing down
+the collection.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import the threading library. The plots are drawn in a thread of their own.
+import threading
+#Import queue. The records waiting to be drawn are held in a queue.
+import queue
+#Import collections. The latest records are kept in a ring buffer (a deque with a maximum length).
+import collections
+#Import atexit. This is used to draw the plots that are still waiting before the program exits.
+import atexit
+#Import the operating system. This is used to read the settings of the sink from the environment.
+import os
+#Import time. Each record is given the time that it was made.
+import time as t
+
+#This is what the sink does with the records: 'off', 'record' or 'save' (see the description of this module).
+DIAGNOSTICS = os.environ.get('OSCILLO_DIAGNOSTICS', 'off')
+
+#This is the folder that the plots are saved in.
+DIAGNOSTICS_DIRECTORY = os.environ.get('OSCILLO_DIAGNOSTICS_DIRECTORY', "C:\\Oscillo\\Diagnostics")
+
+#This is the number of records that are kept in memory.
+DIAGNOSTICS_BUFFER = int(os.environ.get('OSCILLO_DIAGNOSTICS_BUFFER', '64'))
+
+#This is the largest number of points kept for each array of a record.
+DIAGNOSTICS_POINTS = int(os.environ.get('OSCILLO_DIAGNOSTICS_POINTS', '4000'))
+
+#In 'save' mode, one record in this many (of each name) is saved as a plot.
+DIAGNOSTICS_EVERY = int(os.environ.get('OSCILLO_DIAGNOSTICS_EVERY', '1'))
+
+#This is the number of plots that can wait to be drawn. When there are more, the newest are dropped.
+DIAGNOSTICS_QUEUE = 16
+
+#These are the modes of the sink.
+DIAGNOSTICS_MODES = ('off', 'record', 'save')
+
+#This is the sink that is shared by all of the processing methods (see get_sink).
+shared_sink = None
+#This lock protects the shared sink while it is created.
+sink_lock = threading.Lock()
+
+
+def get_sink():
+    '''
+    This function returns the shared diagnostics sink. The sink is created the first time it is
+    requested, and the plots that are still waiting are drawn when the program exits.
+    '''
+    global shared_sink
+    with sink_lock:
+        if shared_sink is None:
+            shared_sink = diagnostics_sink()
+            atexit.register(shared_sink.close)
+        return shared_sink
+
+
+def decimate(x, y, points=DIAGNOSTICS_POINTS):
+    '''
+    This function shortens an array (y, against x) to about the given number of points for plotting.
+    The array is cut into buckets, and the smallest and largest value of each bucket are kept, so the
+    peaks (which are what the plots are for) don't disappear.
+    '''
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= points:
+        return np.array(x, dtype=np.float64), np.array(y, dtype=np.float64)
+    size = int(np.ceil(len(y) / (points // 2)))
+    buckets = len(y) // size
+    shaped = y[:buckets * size].reshape(buckets, size)
+    starts = np.arange(buckets) * size
+    lows = starts + np.argmin(shaped, axis=1)
+    highs = starts + np.argmax(shaped, axis=1)
+    #keep the two points of each bucket in the order they were in
+    indexes = np.sort(np.concatenate((lows, highs, np.arange(buckets * size, len(y)))))
+    return x[indexes].astype(np.float64), y[indexes].astype(np.float64)
+
+
+class diagnostics_sink():
+
+    def __init__(self, mode=DIAGNOSTICS, directory=DIAGNOSTICS_DIRECTORY, size=DIAGNOSTICS_BUFFER,
+                 points=DIAGNOSTICS_POINTS, every=DIAGNOSTICS_EVERY):
+        '''
+        mode is what the sink does with the records (one of DIAGNOSTICS_MODES), and directory is where
+        the plots are saved. size is the number of records kept in memory, points is the largest number
+        of points kept for each array, and in 'save' mode one record in every is saved as a plot.
+        '''
+        if mode not in DIAGNOSTICS_MODES:
+            raise ValueError("The diagnostics mode must be one of {}, not {!r}.".format(DIAGNOSTICS_MODES, mode))
+        self.mode = mode
+        self.directory = directory
+        self.points = points
+        self.every = max(1, every)
+        self.lock = threading.Lock()
+        #the latest records, with the newest at the end
+        self.records = collections.deque(maxlen=size)
+        #the number of records made under each name
+        self.counts = collections.Counter()
+        #the plots waiting to be drawn, and the thread that draws them (it is started by the first plot)
+        self.pending = queue.Queue(DIAGNOSTICS_QUEUE)
+        self.thread = None
+        self.dropped = 0
+        self.saved = 0
+
+    def enabled(self):
+        '''
+        This method returns True if the records are kept. A method can check it to skip preparing
+        arrays that are only needed for a record.
+        '''
+        return self.mode != 'off'
+
+    def record(self, name, traces, markers=None, labels=None):
+        '''
+        This method records the arrays that a processing method would have plotted. name names the
+        plot, traces is a list of (x, y, style) tuples (style is a matplotlib format, like 'b' or 'r.'),
+        markers is an optional (x, y) pair of points to mark (like the peaks that were found), and
+        labels is an optional (x label, y label) pair.
+        '''
+        if self.mode == 'off':
+            return
+        entry = {'name': name, 'time': t.time(), 'labels': labels,
+                 'traces': [decimate(x, y, self.points) + (style,) for x, y, style in traces],
+                 'markers': None if markers is None else (np.array(markers[0], dtype=np.float64),
+                                                          np.array(markers[1], dtype=np.float64))}
+        with self.lock:
+            self.counts[name] += 1
+            entry['number'] = self.counts[name]
+            self.records.append(entry)
+        if self.mode == 'save' and (entry['number'] - 1) % self.every == 0:
+            self.queue(entry)
+
+    def recent(self, name=None):
+        '''
+        This method returns the records in memory (the newest last), or only those with the given name.
+        '''
+        with self.lock:
+            return [entry for entry in self.records if name is None or entry['name'] == name]
+
+    def save(self, name=None, file_name=None):
+        '''
+        This method saves the newest record in memory (or the newest with the given name) as a plot,
+        in the background. The plot is saved in the diagnostics folder unless a file name is given.
+        It returns False if there is no such record.
+        '''
+        entries = self.recent(name)
+        if len(entries) == 0:
+            return False
+        self.queue(entries[-1], file_name)
+        return True
+
+    def queue(self, entry, file_name=None):
+        '''
+        This method hands a record to the drawing thread. If too many plots are waiting already, the
+        record isn't drawn, so that the processing never waits for a plot.
+        '''
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.draw_loop, daemon=True)
+                self.thread.start()
+        try:
+            self.pending.put_nowait((entry, file_name))
+        except queue.Full:
+            self.dropped += 1
+
+    def draw_loop(self):
+        '''
+        This method runs in the drawing thread. It draws the plots as they arrive, until it is given None.
+        '''
+        while True:
+            item = self.pending.get()
+            try:
+                if item is None:
+                    return
+                self.draw(*item)
+                self.saved += 1
+            except Exception as error:
+                print("The diagnostics plot could not be saved: {!r}".format(error))
+            finally:
+                self.pending.task_done()
+
+    def draw(self, entry, file_name=None):
+        '''
+        This method draws a record and saves it as a PNG file. The figure is drawn with the Agg backend
+        directly (without pyplot), so it doesn't touch the GUI and can be drawn from this thread.
+        '''
+        #these are only needed when plots are drawn, so they are imported here
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        if file_name is None:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = t.strftime('%d_%m_%Y_%H_%M_%S', t.localtime(entry['time']))
+            file_name = os.path.join(self.directory, "{}_{}_{:06d}.png".format(
+                entry['name'].replace(' ', '_'), stamp, entry['number']))
+
+        figure = Figure(figsize=(10, 5))
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot(1, 1, 1)
+        for x, y, style in entry['traces']:
+            axes.plot(x, y, style, linewidth=.8)
+        if entry['markers'] is not None:
+            axes.plot(entry['markers'][0], entry['markers'][1], 'r.')
+        if entry['labels'] is not None:
+            axes.set_xlabel(entry['labels'][0])
+            axes.set_ylabel(entry['labels'][1])
+        axes.set_title("{} #{}".format(entry['name'], entry['number']))
+        figure.savefig(file_name, dpi=100)
+
+    def flush(self):
+        '''
+        This method waits until every plot that was handed to the drawing thread has been drawn.
+        '''
+        if self.thread is not None:
+            self.pending.join()
+
+    def close(self):
+        '''
+        This method draws the plots that are still waiting, and stops the drawing thread.
+        '''
+        if self.thread is not None:
+            self.flush()
+            self.pending.put(None)
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,295 @@
+'''
+@author Manish Roy
+
+This module converts the waveforms that were saved as CSV files (by save_me, with a "# Time,Amplitude"
+header) into binary .osc files (see the oscillo_waveform_files.py module). Reading the CSV files is the
+slowest part of every reanalysis of old data, and they take several times the space of an .osc file.
+
+Every CSV file is read a piece at a time (CHUNK_LINES lines at once), so the memory used doesn't grow
+with the size of the file. The first pass finds the length of the waveform, its time axis, and the
+steps of the analog-to-digital converter in the volts. The second pass writes the codes to a temporary
+.osc file, and the third pass reads the .osc file back and checks every point against the CSV file. The
+.osc file is only put in place if they match. The parameters of the collection (the metal, the delay
+line, the frequency and the gain) are recovered from the names of the folder and of the file.
+
+The files are converted in a pool of processes. Every file that is finished is written to a log in the
+folder that was converted, so a conversion that was interrupted carries on where it stopped:
+
+>python oscillo_migration.py C:\\Oscillo\\DataFiles --workers 8
+
+The CSV files are kept unless --remove is given, in which case each one is deleted once its .osc file
+has been checked.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import the operating system. This is used to find the CSV files.
+import os
+#Import itertools. The CSV files are read a number of lines at a time.
+import itertools
+#Import json. Each line of the log is a JSON dictionary.
+import json
+#Import time. This is used to measure how long the conversion takes.
+import time as t
+#Import multiprocessing. The files are converted in a pool of processes.
+import multiprocessing
+#Import argparse. This is used to read the command line.
+import argparse
+#Import the binary waveform files. (See the oscillo_waveform_files.py module.)
+import oscillo_waveform_files as owf
+#Import the replay. It reads the parameters and the time stamps from the names of the files, and knows
+# which CSV files hold waveforms. (See the oscillo_replay.py module.)
+import oscillo_replay as orp
+
+#This is the number of processes that convert the files. It is the number of processors, unless another is given.
+MIGRATION_WORKERS = int(os.environ.get('OSCILLO_MIGRATION_WORKERS', str(os.cpu_count() or 1)))
+
+#This is the number of lines of a CSV file that are read at once.
+CHUNK_LINES = int(os.environ.get('OSCILLO_MIGRATION_CHUNK', '65536'))
+
+#This is the name of the log that is kept in the folder being converted.
+LOG_NAME = 'migration.log'
+
+#A waveform with more different values than this isn't treated as codes of the analog-to-digital
+# converter. It is stored as 32-bit floats instead, like an averaged waveform.
+MAX_LEVELS = 65536
+
+
+def read_chunks(file_name, chunk_lines=CHUNK_LINES):
+    '''
+    This function yields the time and volts arrays of a CSV file, chunk_lines points at a time.
+    '''
+    with open(file_name) as csv_file:
+        first_line = csv_file.readline()
+        #skip the header
+        if first_line.startswith('#') or any(character.isalpha() for character in first_line.replace('e', '').replace('E', '')):
+            first_line = ''
+        lines = itertools.chain([first_line], csv_file)
+        while True:
+            chunk = ''.join(itertools.islice(lines, chunk_lines))
+            if chunk == '':
+                return
+            values = np.fromstring(chunk.replace(',', ' '), dtype=np.float64, sep=' ')
+            if len(values) == 0:
+                continue
+            values = values.reshape(-1, 2)
+            yield values[:, 0], values[:, 1]
+
+
+def survey(file_name):
+    '''
+    This function reads a CSV file once, and returns the number of points, the first and last times,
+    and the different values of the volts (or None if there are more than MAX_LEVELS of them).
+    '''
+    count = 0
+    first_time = None
+    last_time = None
+    levels = np.zeros(0)
+    for time, volts in read_chunks(file_name):
+        if first_time is None:
+            first_time = float(time[0])
+        last_time = float(time[-1])
+        count += len(time)
+        if levels is not None:
+            levels = np.union1d(levels, volts)
+            if len(levels) > MAX_LEVELS:
+                levels = None
+    return count, first_time, last_time, levels
+
+
+def choose_scale(levels):
+    '''
+    This function chooses how the volts are stored. The volts of a waveform that came straight from
+    the oscilloscope are evenly spaced steps, so they are stored as the codes of those steps, in one or
+    two bytes. It returns the dtype of the codes, and the ymult, yzero and yoff that turn them into volts.
+    '''
+    if levels is None or len(levels) == 0:
+        return '<f4', 1.0, 0.0, 0.0
+    if len(levels) == 1:
+        return 'u1', 1.0, float(levels[0]), 0.0
+    step = float(np.min(np.diff(levels)))
+    steps = (levels - levels[0]) / step
+    if np.max(np.abs(steps - np.round(steps))) > 1e-3 or steps[-1] >= MAX_LEVELS:
+        return '<f4', 1.0, 0.0, 0.0
+    dtype = 'u1' if steps[-1] < 256 else '<u2'
+    #the lowest value is code 0
+    return dtype, step, 0.0, -float(levels[0]) / step
+
+
+def osc_name(file_name):
+    '''
+    This function returns the name of the .osc file that a CSV file is converted to.
+    '''
+    return os.path.splitext(file_name)[0] + owf.EXTENSION
+
+
+def migrate_file(file_name, remove=False):
+    '''
+    This function converts one CSV file to an .osc file next to it, and checks the result. It returns
+    the CSV file, what happened to it, and the largest difference between the two files (in volts).
+    '''
+    count, first_time, last_time, levels = survey(file_name)
+    if count == 0:
+        return file_name, 'skipped: no data', 0.0
+
+    #the time axis. The points of a saved waveform are evenly spaced from the start of the record.
+    if count > 1:
+        xincr = (last_time - first_time) / (count - 1)
+    else:
+        xincr = 1e-9
+    first_point = int(round(first_time / xincr))
+    #the trigger point isn't in the CSV file (see CSV_XZERO in the oscillo_replay.py module)
+    if orp.CSV_XZERO is not None:
+        xzero = float(orp.CSV_XZERO)
+    else:
+        xzero = -first_time
+
+    dtype, ymult, yzero, yoff = choose_scale(levels)
+    #the parameters of the collection come from the name of the folder, and then the name of the file
+    parameters = orp.name_parameters(os.path.dirname(os.path.abspath(file_name)))
+    parameters.update(orp.name_parameters(file_name))
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    match = orp.TIME_STAMP.search(stem)
+    if match is not None:
+        parameters['time_stamp'] = match.group(1)
+    parameters['migrated_from'] = os.path.basename(file_name)
+
+    #write the codes to a temporary file, a chunk at a time
+    target = osc_name(file_name)
+    temporary = target + '.tmp'
+    with open(temporary, 'wb') as osc_file:
+        owf.write_header(osc_file, dtype, count, ymult, yzero, yoff, xincr, xzero, first_point, parameters)
+        for time, volts in read_chunks(file_name):
+            codes = (volts - yzero) / ymult + yoff
+            if dtype != '<f4':
+                codes = np.round(codes)
+            osc_file.write(codes.astype(dtype).tobytes())
+
+    #read the file back, and compare every point with the CSV file
+    header, codes = owf.open_waveform(temporary)
+    error = 0.0
+    time_error = 0.0
+    largest = 0.0
+    position = 0
+    for time, volts in read_chunks(file_name):
+        piece = dict(header, first_point=header['first_point'] + position, count=len(time))
+        error = max(error, float(np.max(np.abs(owf.codes_to_volts(codes[position:position + len(time)], piece) - volts))))
+        time_error = max(time_error, float(np.max(np.abs(owf.waveform_time(piece) - time))))
+        largest = max(largest, float(np.max(np.abs(volts))))
+        position += len(time)
+    del codes
+
+    #32-bit floats keep about 7 digits, so their tolerance is relative to the largest value
+    if dtype == '<f4':
+        tolerance = 1e-6 * max(largest, 1e-30)
+    else:
+        tolerance = 1e-6 * ymult
+    if error > tolerance or time_error > 1e-3 * xincr:
+        os.remove(temporary)
+        return file_name, 'failed: the .osc file differs by {:.3g} V and {:.3g} s'.format(error, time_error), error
+
+    os.replace(temporary, target)
+    if remove:
+        os.remove(file_name)
+    return file_name, 'done', error
+
+
+def migrate_task(task):
+    '''
+    This function unpacks a task for the process pool (see migrate). A file that can't be converted
+    doesn't stop the others.
+    '''
+    file_name, remove = task
+    try:
+        return migrate_file(file_name, remove)
+    except Exception as error:
+        #don't leave a half written file behind
+        temporary = osc_name(file_name) + '.tmp'
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        return file_name, 'failed: {!r}'.format(error), 0.0
+
+
+def read_log(log_name):
+    '''
+    This function returns the files that the log says were converted.
+    '''
+    finished = set()
+    if os.path.exists(log_name):
+        with open(log_name) as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    #the last line may have been cut off when the conversion was interrupted
+                    continue
+                if entry.get('status') == 'done':
+                    finished.add(entry['file'])
+    return finished
+
+
+def find_csv_files(path, finished):
+    '''
+    This function returns the CSV files under path that hold waveforms and haven't been converted yet.
+    '''
+    if os.path.isfile(path):
+        candidates = [path]
+    else:
+        candidates = []
+        for folder, folders, files in os.walk(path):
+            folders.sort()
+            candidates.extend(os.path.join(folder, name) for name in sorted(files) if name.endswith('.csv'))
+    pending = []
+    for file_name in candidates:
+        relative = os.path.relpath(file_name, path) if os.path.isdir(path) else os.path.basename(file_name)
+        if relative in finished and os.path.exists(osc_name(file_name)):
+            continue
+        if orp.is_waveform_csv(file_name):
+            pending.append(file_name)
+    return pending
+
+
+def migrate(paths, workers=MIGRATION_WORKERS, remove=False):
+    '''
+    This function converts every CSV waveform under each of the paths, in a pool of workers processes.
+    Each path has its own log, so the files that were finished before aren't converted again. It
+    returns the number of files that were converted and the number that failed.
+    '''
+    converted = 0
+    failed = 0
+    for path in paths:
+        folder = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+        log_name = os.path.join(folder, LOG_NAME)
+        pending = find_csv_files(path, read_log(log_name))
+        print("Converting {} CSV files in {} with {} processes.".format(len(pending), path, workers))
+
+        then = t.time()
+        with open(log_name, 'a') as log_file, multiprocessing.Pool(workers) as pool:
+            for i, (file_name, status, error) in enumerate(pool.imap_unordered(migrate_task, [(name, remove) for name in pending])):
+                entry = {'file': os.path.relpath(file_name, folder), 'status': status, 'error': error, 'time': t.time()}
+                #write each line as soon as it is known, so that it isn't lost if the conversion is interrupted
+                log_file.write(json.dumps(entry) + '\n')
+                log_file.flush()
+                if status == 'done':
+                    converted += 1
+                elif status.startswith('failed'):
+                    failed += 1
+                    print("{}: {}".format(file_name, status))
+                if (i + 1) % 100 == 0 or i + 1 == len(pending):
+                    elapsed = t.time() - then
+                    print("{} of {} files ({:.1f} files per second).".format(i + 1, len(pending), (i + 1) / max(elapsed, 1e-9)))
+    print("{} files were converted, and {} failed.".format(converted, failed))
+    return converted, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert saved CSV waveforms to .osc files.")
+    parser.add_argument('paths', nargs='+', help='folders (or single CSV files) to convert')
+    parser.add_argument('--workers', type=int, default=MIGRATION_WORKERS, help='the number of processes')
+    parser.add_argument('--remove', action='store_true', help='delete each CSV file once its .osc file has been checked')
+    arguments = parser.parse_args()
+    migrate(arguments.paths, arguments.workers, arguments.remove)
@@ -19,6 +19,13 @@ box that appears in the gui is created by the same function. The variety of wind
 produced is a result of the if, elif, else statements seen in the __init__function.
 '''
 class get_value(tk.Toplevel):
+    def __new__(cls, parent, prompt, kind):
+        #When Oscillo(TM) runs without a GUI (see the oscillo_replay.py module), the object that stands
+        # in for the GUI window answers the prompt, and no dialog box is made.
+        if hasattr(parent, 'answer'):
+            return console_value(parent, prompt, kind)
+        return tk.Toplevel.__new__(cls)
+
     def __init__(self, parent, prompt,kind):
         tk.Toplevel.__init__(self, parent)
 
@@ -76,6 +83,15 @@ class get_value(tk.Toplevel):
             self.integer_label.grid(row=1,column=0)
             self.ok_button.grid(row=5,column=1)
 
+        elif kind == 'str':
+            self.text = tk.StringVar()
+            self.text_entry = tk.Entry(self, textvariable=self.text)
+            self.text_label = tk.Label(self,text="Name: ")
+            self.ok_button = tk.Button(self, text="OK", command=self.on_ok_text)
+            self.text_entry.grid(row=1,column=1)
+            self.text_label.grid(row=1,column=0)
+            self.ok_button.grid(row=5,column=1)
+
         elif kind == 'message':
             self.ok_button = tk.Button(self, text="OK", command=self.on_ok_message)
             self.ok_button.grid(row=5,column=1)
@@ -107,6 +123,10 @@ class get_value(tk.Toplevel):
         self.vars = self.integer.get()
         self.destroy()
 
+    def on_ok_text(self, event=None):
+        self.vars = self.text.get()
+        self.destroy()
+
     def on_ok_message(self, event=None):
         self.vars = None
         self.destroy()
@@ -125,3 +145,13 @@ class get_value(tk.Toplevel):
         self.vars = 'n'
 
 
+class console_value():
+    '''
+    This class stands in for a dialog box when Oscillo(TM) runs without a GUI. The answer comes
+    from the answer method of the window that stands in for the GUI.
+    '''
+    def __init__(self, parent, prompt, kind):
+        self.vars = parent.answer(prompt, kind)
+
+    def show(self):
+        return self.vars
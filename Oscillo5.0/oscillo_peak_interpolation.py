@@ -0,0 +1,156 @@
+'''
+@author Manish Roy
+
+This module finds the positions of peaks between the samples. The peaks found by peakutils (in
+gausian_convolution and cross_correlate, in the oscillo_data_processing_functions.py module) are the
+indexes of samples, so a time of flight measured from them can only be a whole number of sample
+intervals, and its precision is set by the sample rate. That is why the waveforms were collected at
+full resolution (a million points), even though most of those points were only needed to place the
+peaks.
+
+Each peak is refined by fitting the samples around it, with one of these methods:
+
+parabolic: a parabola through the peak sample and its two neighbours.
+gaussian:  a parabola through the logarithms of the three samples, which is exact for a gaussian peak
+           (like the peaks of a gaussian convolution). Peaks that aren't positive use the parabola.
+sinc:      the curve between the samples is its band-limited (sinc) interpolation, which is exact for a
+           signal sampled fast enough. It is the Fourier series of the whole curve, so its slope and
+           curvature can be computed at any point from the phases of the spectrum, and the top of the
+           peak is where the slope is zero (see spectral_offsets).
+
+Each position comes with an uncertainty (a standard deviation, in samples). When the curve is the
+correlation of a noisy array with a kernel (like the gaussian of gausian_convolution), the noise of the
+array is carried through the slope of the correlation at the peak, which is what moves the peak.
+Otherwise the noise of the curve itself is carried through the fit of the three samples around the peak.
+Peaks at the ends of the curve can't be refined, and their uncertainty is that of a whole sample.
+
+The gaussian method is exact for the peaks of the gaussian convolution. The sinc method is exact for any
+peak that is smooth enough to be sampled without aliasing, including sharp peaks only a few samples wide,
+where the three-point fits are biased, but it takes a Fourier transform of the whole curve.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import the operating system. This is used to read the settings of the interpolation from the environment.
+import os
+
+#This is the method used to refine the peaks: 'parabolic', 'gaussian', 'sinc' or 'none'.
+PEAK_INTERPOLATION = os.environ.get('OSCILLO_PEAK_INTERPOLATION', 'gaussian')
+
+#This is the number of Newton steps that the sinc method takes towards the top of each peak.
+SINC_ITERATIONS = 4
+
+#These are the methods that can be used.
+INTERPOLATION_METHODS = ('parabolic', 'gaussian', 'sinc', 'none')
+
+#This is the uncertainty of a peak that isn't refined: that of a position rounded to a whole sample.
+WHOLE_SAMPLE = 1 / np.sqrt(12)
+
+
+def three_point(a, b, c, noise_a, noise_b, noise_c):
+    '''
+    This function returns the offset (from the middle sample) of the top of the parabola through
+    three samples a, b and c, and its uncertainty, from the noise of each sample. The offset is zero
+    if the middle sample isn't above the parabola through its neighbours.
+    '''
+    curvature = a - 2 * b + c
+    slope = a - c
+    if curvature >= 0:
+        return 0., WHOLE_SAMPLE
+    offset = .5 * slope / curvature
+    #carry the noise of each sample through the offset. (This is the spread of the offset caused by the
+    # noise. It can be more than a sample when the peak is flat and the noise is large.)
+    error = np.sqrt((noise_a * (curvature - slope) / (2 * curvature ** 2)) ** 2 +
+                    (noise_b * slope / curvature ** 2) ** 2 +
+                    (noise_c * (curvature + slope) / (2 * curvature ** 2)) ** 2)
+    #the offset can't be further than half a sample from the peak sample
+    return float(np.clip(offset, -.5, .5)), float(error)
+
+
+def spectral_offsets(curve, indexes, noise):
+    '''
+    This function returns the offsets (from indexes) of the tops of the peaks of the band-limited
+    interpolation of a curve, and their uncertainties. The slope and the curvature of the interpolation
+    at a point x are sums over the spectrum of the curve, of each frequency times the phase that it has
+    at x, so the top of each peak is found with Newton steps from its peak sample. noise is the noise of
+    the curve, which moves the top by the slope that it adds (for white noise, noise * pi / sqrt(3))
+    divided by the curvature.
+    '''
+    n = len(curve)
+    spectrum = np.fft.rfft(curve)
+    frequencies = 2 * np.pi * np.fft.rfftfreq(n)
+    #every frequency but zero (and the Nyquist frequency of an even length, which has no slope) is
+    # counted twice, for its negative frequency
+    weights = np.full(len(spectrum), 2. / n)
+    weights[0] = 0
+    if n % 2 == 0:
+        weights[-1] = 0
+
+    offsets = np.zeros(len(indexes))
+    errors = np.full(len(indexes), WHOLE_SAMPLE)
+    for k, index in enumerate(indexes):
+        x = float(index)
+        for step in range(SINC_ITERATIONS):
+            phases = spectrum * np.exp(1j * frequencies * x) * weights
+            slope = -np.sum(frequencies * phases.imag)
+            curvature = -np.sum(frequencies ** 2 * phases.real)
+            if curvature >= 0:
+                #this isn't the top of a peak, so the peak sample is kept
+                x = float(index)
+                break
+            #the top can't be further than half a sample from the peak sample
+            x = float(np.clip(x - slope / curvature, index - .5, index + .5))
+        else:
+            errors[k] = noise * np.pi / np.sqrt(3) / abs(curvature)
+        offsets[k] = x - index
+    return offsets, errors
+
+
+def refine_peaks(curve, indexes, method=PEAK_INTERPOLATION, noise=None, kernel=None):
+    '''
+    This function returns the positions of the peaks of a curve between its samples, and their
+    uncertainties (both in samples, as float arrays). indexes are the indexes of the peak samples
+    (for example from peakutils.indexes), and method is one of INTERPOLATION_METHODS.
+
+    If the curve is the correlation of an array with a kernel, the kernel should be given, and noise is
+    the standard deviation of the noise of the array. Otherwise noise is the noise of the curve itself.
+    Either way it is estimated by estimate_noise in the oscillo_data_processing_functions.py module.
+    '''
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError("The interpolation method must be one of {}, not {!r}.".format(INTERPOLATION_METHODS, method))
+    curve = np.asarray(curve, dtype=np.float64)
+    indexes = np.asarray(indexes, dtype=np.int64)
+    positions = indexes.astype(np.float64)
+    errors = np.full(len(indexes), WHOLE_SAMPLE)
+    if method == 'none' or len(indexes) == 0:
+        return positions, errors
+    if noise is None:
+        raise ValueError("The noise must be given (see estimate_noise in the oscillo_data_processing_functions.py module).")
+    if kernel is not None:
+        #the noise that the correlation adds to its slope, for each unit of noise of the array
+        slope_noise = float(np.sqrt(np.sum(np.diff(np.asarray(kernel, dtype=np.float64)) ** 2)))
+
+    if method == 'sinc':
+        offsets, sinc_errors = spectral_offsets(curve, indexes, noise)
+
+    for k, index in enumerate(indexes):
+        if index <= 0 or index >= len(curve) - 1:
+            continue
+        a, b, c = curve[index - 1], curve[index], curve[index + 1]
+        if method == 'sinc':
+            offset, error = offsets[k], sinc_errors[k]
+        elif method == 'gaussian' and a > 0 and b > 0 and c > 0:
+            #the noise of the logarithm of a sample is the noise divided by the sample
+            offset, error = three_point(np.log(a), np.log(b), np.log(c), noise / a, noise / b, noise / c)
+        else:
+            offset, error = three_point(a, b, c, noise, noise, noise)
+        if kernel is not None and a - 2 * b + c < 0:
+            #the peak moves by the noise of the slope divided by the curvature
+            error = noise * slope_noise / abs(a - 2 * b + c)
+        positions[k] = index + offset
+        errors[k] = error
+    return positions, errors
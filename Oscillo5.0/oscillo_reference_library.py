@@ -0,0 +1,445 @@
+'''
+@author Manish Roy
+
+This module contains the reference library. A reference is a waveform collected at a known
+temperature, which later waveforms are compared with. References used to be kept by hand: the
+peaks of a single reference were written to "reference.txt", and there was no way of keeping a
+reference for each waveguide. The library keeps every reference as an .osc file (see the
+oscillo_waveform_files.py module) in the references folder, and indexes them by the parameters
+of the collection (the metal, the delay line, the frequency and the gain, the same as the names
+made by make_directory) and by the temperature of the reference.
+
+Finding a reference is a single lookup in the index, and the references that were used recently
+are kept in memory, so they aren't read from the disk again. The things that are computed from a
+reference (its envelope, its peaks, and the spectrum of its envelope) are computed once, saved
+next to the reference, and reused every time after that.
+
+The peaks of the reference that is in use are also shared by every collection option (see
+get_current). They are read from "reference.txt" the first time they are needed, and when a new
+reference is created they are replaced at once, without restarting the program. Each set of peaks
+has a version, which is stored with every result that was computed from it.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import the operating system. This is used to find the references folder.
+import os
+#Import json. The index of the library is stored as a JSON dictionary.
+import json
+#Import the threading library. The library can be used from the collecting threads.
+import threading
+#Import collections. The references in memory are kept in the order they were used.
+import collections
+#Import datetime. This is used to give each reference a time stamp.
+import datetime as dt
+#Import hashlib. The version of a set of reference peaks is made from a hash of the peaks.
+import hashlib
+#Import the binary waveform files. The references are stored as .osc files.
+import oscillo_waveform_files as owf
+#Import the peak interpolation. The peaks of the references are refined between the samples.
+# (See the oscillo_peak_interpolation.py module.)
+import oscillo_peak_interpolation as opi
+
+#This is the folder that holds the references. It is next to this module, unless another one is given.
+REFERENCE_DIRECTORY = os.environ.get('OSCILLO_REFERENCES',
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'references'))
+
+#This is the number of references that are kept in memory.
+REFERENCE_CACHE_SIZE = int(os.environ.get('OSCILLO_REFERENCE_CACHE', '8'))
+
+#This is the name of the index file in the references folder.
+INDEX_NAME = 'index.json'
+
+#This is added to the name of a reference to name the file that holds what was computed from it.
+ARTIFACT_EXTENSION = '.npz'
+
+#This is the file that holds the peaks of the reference in use, separated by commas. The settings that
+# they were found with are on the second line, as a JSON dictionary (see peak_settings).
+CURRENT_REFERENCE = os.environ.get('OSCILLO_CURRENT_REFERENCE', 'reference.txt')
+
+#This is the library that is shared by all of the collection options (see get_library).
+shared_library = None
+#This lock protects the shared library while it is created.
+library_lock = threading.Lock()
+
+#These are the reference peaks that are shared by all of the collection options (see get_current).
+shared_current = None
+#This lock protects the shared reference peaks while they are created.
+current_lock = threading.Lock()
+
+
+def get_library():
+    '''
+    This function returns the shared reference library. The library is created the first time it
+    is requested, and every request after that receives the same object.
+    '''
+    global shared_library
+    with library_lock:
+        if shared_library is None:
+            shared_library = reference_library()
+        return shared_library
+
+
+def get_current():
+    '''
+    This function returns the shared reference peaks (see the current_reference class). They are
+    created the first time they are requested, and every request after that receives the same object.
+    '''
+    global shared_current
+    with current_lock:
+        if shared_current is None:
+            shared_current = current_reference()
+        return shared_current
+
+
+def reference_key(metal, DL, freq, gain, temperature):
+    '''
+    This function returns the key of a reference in the index. Temperatures are compared as numbers,
+    so "20" and "20.0" are the same temperature.
+    '''
+    return "{}|{}|{}|{}|{:g}".format(metal, DL, freq, gain, float(temperature))
+
+
+def peak_settings(xincr, xend, c, threshold, mindist, method=None):
+    '''
+    This function returns the settings that a set of peaks is found with: the horizontal scale factor
+    of the waveform, the end of the part of it that is kept by clip_tails, the parameters of the
+    gaussian convolution, and the interpolation method. Peaks can only be compared with peaks that were
+    found with the same settings (see the mismatch method of the reference_peaks class).
+    '''
+    if method is None:
+        method = opi.PEAK_INTERPOLATION
+    return {'xincr': float(xincr), 'xend': float(xend), 'c': float(c), 'threshold': float(threshold),
+            'mindist': int(mindist), 'method': method}
+
+
+def write_atomically(file_name, write):
+    '''
+    This function writes a file by writing a temporary file and then putting it in place, so that a
+    file that is only half written is never read. write is called with the open temporary file.
+    '''
+    temporary = file_name + '.tmp'
+    with open(temporary, 'wb') as open_file:
+        write(open_file)
+    os.replace(temporary, file_name)
+
+
+class reference_peaks():
+
+    def __init__(self, peaks, source, settings=None):
+        '''
+        This class holds one set of reference peaks. peaks are the times of the peaks in seconds, from the
+        signal trigger point (see the positions method of the reference class), source names where they
+        came from, and settings are the settings that they were found with (see peak_settings). The peaks
+        can't be changed, so a set of peaks can be used by a collection while the reference is replaced.
+        version is "source#hash", where the hash changes whenever the peaks do.
+
+        The older references hold the index locations of the peaks, without their settings. They keep
+        their versions, but they can't be compared with anything (see mismatch).
+        '''
+        peaks = np.array(peaks, dtype=np.float64)
+        if np.any(peaks != np.round(peaks)):
+            self.peaks = peaks
+        else:
+            self.peaks = peaks.astype(np.int64)
+        self.peaks.setflags(write=False)
+        self.source = source
+        self.settings = settings
+        self.version = "{}#{}".format(source, hashlib.sha1(self.peaks.tobytes()).hexdigest()[:12])
+
+    def __len__(self):
+        return len(self.peaks)
+
+    def __getitem__(self, index):
+        return self.peaks[index]
+
+    def mismatch(self, settings):
+        '''
+        This method returns a description of the first of the settings (see peak_settings) that is
+        different from the one the reference peaks were found with, or None if they are all the same.
+        Peaks measured with different settings don't have the same time base or the same convolution,
+        so they can't be subtracted from the reference peaks.
+        '''
+        if self.settings is None:
+            return "it isn't known how the reference peaks were found"
+        for name in sorted(settings):
+            mine = self.settings.get(name)
+            theirs = settings[name]
+            if isinstance(mine, str) or isinstance(theirs, str) or mine is None:
+                same = mine == theirs
+            else:
+                same = bool(np.isclose(mine, theirs, rtol=1e-6, atol=0))
+            if not same:
+                return "{} is {} for the reference, but {} here".format(name, mine, theirs)
+        return None
+
+
+class current_reference():
+
+    def __init__(self, file_name=CURRENT_REFERENCE):
+        '''
+        This class holds the reference peaks that are in use. file_name is the file that they are read
+        from and written to. The peaks are read when they are first needed, and read again if the
+        file is changed by another program.
+        '''
+        self.file_name = file_name
+        self.lock = threading.Lock()
+        self.peaks = None
+        self.modified = None
+
+    def get(self):
+        '''
+        This method returns the reference peaks in use (a reference_peaks object).
+        '''
+        with self.lock:
+            try:
+                modified = os.path.getmtime(self.file_name)
+            except OSError:
+                modified = None
+            if self.peaks is None or (modified is not None and modified != self.modified):
+                with open(self.file_name) as ref_file:
+                    ref_line = ref_file.readline()
+                    settings_line = ref_file.readline().strip()
+                #the older files only hold the peaks
+                settings = None
+                if settings_line != '':
+                    settings = json.loads(settings_line)
+                self.peaks = reference_peaks(np.fromstring(ref_line, dtype=np.float64, sep=','), os.path.basename(self.file_name), settings)
+                self.modified = modified
+            return self.peaks
+
+    def replace(self, peaks, source=None, settings=None):
+        '''
+        This method makes peaks the reference peaks in use, and writes them to the file with the settings
+        that they were found with, so that they are still used after the program is restarted. The
+        collections that are running keep the peaks they started with. It returns the new reference_peaks
+        object.
+        '''
+        if source is None:
+            source = os.path.basename(self.file_name)
+        new_peaks = reference_peaks(peaks, source, settings)
+        mystring = ",".join(repr(peak) for peak in new_peaks.peaks.tolist())
+        if settings is not None:
+            mystring = mystring + "\n" + json.dumps(settings, sort_keys=True)
+        with self.lock:
+            write_atomically(self.file_name, lambda open_file: open_file.write(mystring.encode()))
+            self.modified = os.path.getmtime(self.file_name)
+            #the new peaks are put in place in one step
+            self.peaks = new_peaks
+        return new_peaks
+
+
+class reference():
+
+    def __init__(self, file_name):
+        '''
+        This class holds one reference. The codes of the reference are memory mapped, and the things
+        computed from it are read from its artifact file, if they have been computed before.
+        '''
+        self.file_name = file_name
+        self.header, self.codes = owf.open_waveform(file_name)
+        self.parameters = self.header['parameters']
+        self.artifact_name = file_name + ARTIFACT_EXTENSION
+        self.artifacts = {}
+        if os.path.exists(self.artifact_name):
+            with np.load(self.artifact_name) as artifacts:
+                for name in artifacts.files:
+                    self.artifacts[name] = artifacts[name]
+        #an artifact can be computed from another one (the peaks from the envelope), so the lock is reentrant
+        self.lock = threading.RLock()
+
+    def time(self):
+        '''
+        This method returns the time axis of the reference.
+        '''
+        return owf.waveform_time(self.header)
+
+    def volts(self):
+        '''
+        This method returns the amplitude of the reference in volts.
+        '''
+        return owf.codes_to_volts(self.codes, self.header)
+
+    def artifact(self, name, compute):
+        '''
+        This method returns the artifact with the given name. If it hasn't been computed yet, it is
+        computed by calling compute, and saved in the artifact file so that it is never computed again.
+        '''
+        with self.lock:
+            if name not in self.artifacts:
+                self.artifacts[name] = np.asarray(compute())
+                artifacts = dict(self.artifacts)
+                write_atomically(self.artifact_name, lambda open_file: np.savez(open_file, **artifacts))
+            return self.artifacts[name]
+
+    def envelope(self, odf):
+        '''
+        This method returns the envelope of the reference, with its ends zeroed (see compute_envelope
+        and clip_envelope in the oscillo_data_processing_functions.py module). odf is a data_process object.
+        '''
+        return self.artifact('envelope', lambda: odf.clip_envelope(odf.compute_envelope(self.volts())))
+
+    def peaks(self, odf, c, threshold, mindist):
+        '''
+        This method returns the index locations of the peaks of the reference, found with the gaussian
+        convolution of its envelope. The peaks are kept for each set of convolution parameters.
+        '''
+        name = 'peaks_{:g}_{:g}_{:d}'.format(c, threshold, int(mindist))
+        return self.artifact(name, lambda: odf.gausian_convolution(self.envelope(odf), c, threshold, mindist, plot=False)[0])
+
+    def positions(self, odf, xend, c, threshold, mindist, method=None):
+        '''
+        This method returns the times of the peaks of the reference in seconds, from the signal trigger
+        point. The reference is processed the same way as the collected waveforms: it is clipped at xend
+        by clip_tails, so that the gaussian (whose width depends on the length of the envelope) is the
+        same, and the peaks are refined between the samples (see refine_convolution_peaks) and turned
+        into times with the header of the reference (see peak_times in the
+        oscillo_data_processing_functions.py module). They are kept for each set of settings.
+        '''
+        if method is None:
+            method = opi.PEAK_INTERPOLATION
+        name = 'times_{:g}_{:g}_{:g}_{:d}_{}'.format(xend, c, threshold, int(mindist), method)
+
+        def compute():
+            xzero, xincr = self.header['xzero'], self.header['xincr']
+            time, amplitude = odf.clip_tails(self.time(), self.volts(), xzero, xincr, xend)
+            envelope = odf.clip_envelope(odf.compute_envelope(amplitude))
+            peak_indexes, cc, x_axis = odf.gausian_convolution(envelope, c, threshold, mindist, plot=False)
+            positions, errors = odf.refine_convolution_peaks(envelope, c, cc, peak_indexes, method)
+            return odf.peak_times(time, positions, xzero, xincr)
+        return self.artifact(name, compute)
+
+    def settings(self, xend, c, threshold, mindist, method=None):
+        '''
+        This method returns the settings that the positions method finds the peaks with (see peak_settings).
+        '''
+        return peak_settings(self.header['xincr'], xend, c, threshold, mindist, method)
+
+    def spectrum(self, odf, n):
+        '''
+        This method returns the spectrum of the envelope (its real Fourier transform, padded with zeros
+        to n points), which is what a cross correlation with the reference is computed from.
+        '''
+        return self.artifact('spectrum_{:d}'.format(int(n)), lambda: np.fft.rfft(self.envelope(odf), int(n)))
+
+
+class reference_library():
+
+    def __init__(self, directory=REFERENCE_DIRECTORY, cache_size=REFERENCE_CACHE_SIZE):
+        '''
+        directory is the folder that holds the references. cache_size is the number of references
+        that are kept in memory.
+        '''
+        self.directory = directory
+        self.cache_size = cache_size
+        #the references in memory, with the one used most recently at the end
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.index = None
+
+    def index_path(self):
+        '''
+        This method returns the file name of the index.
+        '''
+        return os.path.join(self.directory, INDEX_NAME)
+
+    def load_index(self):
+        '''
+        This method reads the index of the library. If there is no index, it is rebuilt from the
+        headers of the references in the folder.
+        '''
+        if self.index is not None:
+            return self.index
+        try:
+            with open(self.index_path()) as index_file:
+                self.index = json.load(index_file)
+        except (OSError, ValueError):
+            self.rebuild_index()
+        return self.index
+
+    def rebuild_index(self):
+        '''
+        This method reads the header of every reference in the folder, and writes a new index. If
+        there are several references with the same parameters, the newest one is used.
+        '''
+        self.index = {}
+        if os.path.isdir(self.directory):
+            for file_name in sorted(os.listdir(self.directory)):
+                if not file_name.endswith(owf.EXTENSION):
+                    continue
+                with open(os.path.join(self.directory, file_name), 'rb') as osc_file:
+                    header, offset = owf.read_header(osc_file)
+                p = header['parameters']
+                try:
+                    key = reference_key(p['metal'], p['DL'], p['freq'], p['gain'], p['temperature'])
+                except KeyError:
+                    #this file isn't a reference
+                    continue
+                self.index[key] = file_name
+            self.save_index()
+
+    def save_index(self):
+        '''
+        This method writes the index of the library.
+        '''
+        write_atomically(self.index_path(), lambda open_file: open_file.write(json.dumps(self.index, indent=1).encode()))
+
+    def add(self, time, amplitude, preamble, metal, DL, freq, gain, temperature):
+        '''
+        This method saves a waveform to the library as the reference for its parameters and temperature.
+        preamble is the preamble of the waveform (see the preamble method of the session). An older
+        reference with the same parameters is kept in the folder, but it is no longer used.
+        '''
+        ymult, yzero, yoff, xincr, xzero = preamble
+        codes = owf.volts_to_codes(amplitude, ymult, yzero, yoff)
+        if len(time) > 0:
+            first_point = int(round(time[0] / xincr))
+        else:
+            first_point = 0
+        mytime = dt.datetime.now().strftime("%d_%m_%Y_%H_%M_%S%f")
+        parameters = {'metal': metal, 'DL': DL, 'freq': freq, 'gain': gain,
+                      'temperature': float(temperature), 'time_stamp': mytime}
+        file_name = "{}_{}_{}_{}_{:g}C_{}{}".format(metal, DL, freq, gain, float(temperature), mytime, owf.EXTENSION)
+
+        with self.lock:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            owf.write_waveform(os.path.join(self.directory, file_name), codes, ymult, yzero, yoff,
+                               xincr, xzero, first_point, parameters)
+            key = reference_key(metal, DL, freq, gain, temperature)
+            self.load_index()[key] = file_name
+            self.save_index()
+            #forget the old reference if it is in memory
+            self.cache.pop(key, None)
+        return key
+
+    def find(self, metal, DL, freq, gain, temperature):
+        '''
+        This method returns the reference for the parameters and the temperature. A KeyError is raised
+        if the library doesn't have one.
+        '''
+        key = reference_key(metal, DL, freq, gain, temperature)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            index = self.load_index()
+            if key not in index:
+                raise KeyError("there is no reference for {}".format(key))
+            found = reference(os.path.join(self.directory, index[key]))
+            self.cache[key] = found
+            #forget the reference that was used least recently
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return found
+
+    def keys(self):
+        '''
+        This method returns the keys of the references in the library.
+        '''
+        with self.lock:
+            return sorted(self.load_index())
@@ -0,0 +1,548 @@
+'''
+@author Manish Roy
+
+This module replays waveforms that were saved before, so that the collection options can be run
+again on old data (with new processing parameters, for example) without an oscilloscope. The only
+way of doing this used to be fake_data (see the oscillo_collection_functions.py module), which read
+one waveform from one CSV file, and needed the oscilloscope commands to be commented out.
+
+A replay is opened like an oscilloscope. When the name of the instrument starts with "REPLAY::",
+followed by a file or a folder, the session (see the oscillo_scope_session.py module) is a
+replay_session, which answers each CURVE? query with the next saved waveform, in the order the
+waveforms were collected. The settings sent to it are remembered, but they don't change the data.
+.osc files, run files, archives (see the oscillo_run_files.py module) and CSV files can be replayed.
+When every waveform has been sent, the next CURVE? query raises the source_exhausted exception of
+the acquisition pipeline, which ends the collection.
+
+Running this module directly replays one of the collection options over many files or folders at
+once, in a pool of processes, without a GUI. Each run file, and each folder of single waveforms, is
+replayed in a process of its own, and the results are written to the result files like they are
+during a collection. The questions that the option asks are answered by a replay_window (see below).
+
+>python oscillo_replay.py Processed_waveforms.gaussian_timing C:\\Oscillo\\DataFiles --workers 8
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import the operating system. This is used to find the saved waveforms.
+import os
+#Import re. This is used to find the time stamp in the name of a file.
+import re
+#Import datetime. The time stamp in the name of a file is used to put the files in order.
+import datetime as dt
+#Import time. This is used to measure how long each replay takes.
+import time as t
+#Import multiprocessing. The replays are run in a pool of processes.
+import multiprocessing
+#Import argparse. This is used to read the command line.
+import argparse
+#Import traceback. The error of a replay that failed is printed in full.
+import traceback
+#Import the module that holds the connections to the oscilloscopes. The replay session is built on its session.
+import oscillo_scope_session
+#Import the acquisition pipeline. Its source_exhausted exception ends a replay.
+import oscillo_acquisition_pipeline as oap
+#Import the binary waveform files. (See the oscillo_waveform_files.py module.)
+import oscillo_waveform_files as owf
+#Import the run files. (See the oscillo_run_files.py module.)
+import oscillo_run_files as orf
+#Import the result store. The results are written before each replay process ends.
+import oscillo_result_store as ors
+#Import the background writer. The waveforms are saved before each replay process ends.
+import oscillo_background_writer as obw
+#Import the stand-ins for the GUI. (See the oscillo_scope_simulator.py module.)
+from oscillo_scope_simulator import console_window, console_variable
+
+#This begins the name of every replayed instrument. The rest of the name is the file or folder that is
+# replayed, or several of them separated by os.pathsep.
+RESOURCE_PREFIX = 'REPLAY::'
+
+#These are the files that can be replayed.
+WAVEFORM_EXTENSIONS = (owf.EXTENSION, orf.EXTENSION, orf.ARCHIVE_EXTENSION, '.csv')
+
+#This is the number of processes that replay the files. It is the number of processors, unless another is given.
+REPLAY_WORKERS = int(os.environ.get('OSCILLO_REPLAY_WORKERS', str(os.cpu_count() or 1)))
+
+#CSV files don't keep the signal trigger point (xzero). If it isn't given here, the first point of the file
+# is taken to be the trigger point, which is true of the waveforms that were clipped by clip_tails.
+CSV_XZERO = os.environ.get('OSCILLO_REPLAY_XZERO')
+
+#These options can't be replayed, and the reason why. A replay of them is refused before it starts.
+UNREPLAYABLE = {'Calibration_processes.Gaussian_calibration':
+                "it asks for the furnace temperature of every waveform, and no saved waveform records it, "
+                "so every replayed row would be given the same temperature"}
+
+#This finds the time stamp made by get_time_stamp (see the oscillo_collection_functions.py module) at the
+# end of a file name, like "Al_DL_5MHz_34dB_20_08_2018_14_03_52123456".
+TIME_STAMP = re.compile(r'_(\d{2}_\d{2}_\d{4}_\d{2}_\d{2}_\d{8})$')
+
+
+def file_time(file_name):
+    '''
+    This function returns the time that a file was saved, in seconds since the epoch. The time stamp
+    in the name of the file is used if it has one, because copying a file changes its modification time.
+    '''
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    match = TIME_STAMP.search(stem)
+    if match is not None:
+        try:
+            return dt.datetime.strptime(match.group(1), '%d_%m_%Y_%H_%M_%S%f').timestamp()
+        except ValueError:
+            pass
+    return os.path.getmtime(file_name)
+
+
+def name_parameters(file_name):
+    '''
+    This function reads the parameters of a collection (the metal, the delay line, the frequency and
+    the gain) from the name of a file or folder made by make_directory or save_me. CSV files don't
+    keep their parameters anywhere else.
+    '''
+    stem = os.path.splitext(os.path.basename(os.path.normpath(file_name)))[0]
+    stem = TIME_STAMP.sub('', stem)
+    fields = stem.split('_')
+    if len(fields) < 4:
+        return {}
+    return {'metal': fields[0], 'DL': '_'.join(fields[1:-2]), 'freq': fields[-2], 'gain': fields[-1]}
+
+
+def read_csv(file_name):
+    '''
+    This function reads the time and amplitude columns of a CSV file saved by save_me, or of any
+    file with two columns and a header, like the one read by fake_data.
+    '''
+    with open(file_name) as csv_file:
+        first_line = csv_file.readline()
+        rest = csv_file.read()
+    #keep the first line unless it is a header
+    if first_line.startswith('#') or any(character.isalpha() for character in first_line.replace('e', '').replace('E', '')):
+        first_line = ''
+    #let numpy read all of the numbers at once, the same way the dashboard reads .avg files
+    values = np.fromstring((first_line + rest).replace(',', ' '), dtype=np.float64, sep=' ')
+    values = values.reshape(-1, 2)
+    return values[:, 0], values[:, 1]
+
+
+def is_waveform_csv(file_name):
+    '''
+    This function checks that a CSV file holds a waveform (a time column and an amplitude column), and
+    not the results of a collection, which are also saved as CSV files.
+    '''
+    with open(file_name) as csv_file:
+        for line in [csv_file.readline(), csv_file.readline()]:
+            fields = line.strip().split(',')
+            try:
+                [float(field) for field in fields]
+            except ValueError:
+                continue
+            return len(fields) == 2
+    return False
+
+
+def find_sources(paths):
+    '''
+    This function returns the groups of files that are each replayed by one process. Every run file
+    and archive is a group of its own, and the single waveforms (.osc and CSV files) in a folder are a
+    group, in the order they were collected. Folders are searched all the way down.
+    '''
+    sources = []
+    for path in paths:
+        if os.path.isfile(path):
+            sources.append([path])
+            continue
+        for folder, folders, files in os.walk(path):
+            folders.sort()
+            singles = []
+            for file_name in sorted(files):
+                file_name = os.path.join(folder, file_name)
+                if file_name.endswith((orf.EXTENSION, orf.ARCHIVE_EXTENSION)):
+                    sources.append([file_name])
+                elif file_name.endswith(owf.EXTENSION):
+                    singles.append(file_name)
+                #a CSV file that was converted to an .osc file (see the oscillo_migration.py module) is only replayed once
+                elif file_name.endswith('.csv') and os.path.splitext(os.path.basename(file_name))[0] + owf.EXTENSION not in files \
+                        and is_waveform_csv(file_name):
+                    singles.append(file_name)
+            if len(singles) > 0:
+                sources.append(sorted(singles, key=file_time))
+    return sources
+
+
+class replay_frame():
+
+    def __init__(self, codes, header, file_name):
+        '''
+        This class holds one saved waveform in the form that the oscilloscope sends it: a CURVE? block
+        of one-byte or two-byte unsigned codes, and the preamble that scales them to volts. header is
+        a dictionary like the header of an .osc file. Signed codes are shifted to unsigned codes, and
+        codes that aren't whole numbers (averaged waveforms and CSV files) are rescaled to two-byte codes.
+        '''
+        self.file_name = file_name
+        self.parameters = header.get('parameters') or name_parameters(file_name)
+        self.first_point = int(header['first_point'])
+        ymult, yzero, yoff = header['ymult'], header['yzero'], header['yoff']
+        codes = np.asarray(codes)
+
+        if codes.dtype.kind == 'u' and codes.dtype.itemsize == 1:
+            data = codes
+        elif codes.dtype.kind == 'i' and codes.dtype.itemsize == 1:
+            data = (codes.astype(np.int16) + 128).astype(np.uint8)
+            yoff = yoff + 128
+        elif codes.dtype.kind in 'ui' and codes.dtype.itemsize == 2:
+            shift = 32768 if codes.dtype.kind == 'i' else 0
+            data = (codes.astype(np.int32) + shift).astype('>u2')
+            yoff = yoff + shift
+        else:
+            #A waveform saved in volts still has the steps of the analog-to-digital converter. If it has
+            # no more than 256 evenly spaced levels, it is sent as one-byte codes, like it was collected.
+            # Otherwise the codes are spread over the whole two-byte range. The volts are unchanged either
+            # way, because the preamble is scaled the same way as the codes.
+            values = np.unique(codes)
+            low = float(values[0]) if len(values) > 0 else 0.0
+            step = 1.0
+            dtype = np.uint8
+            if len(values) > 1:
+                step = float(np.min(np.diff(values)))
+                levels = (values - low) / step
+                if levels[-1] > 255 or np.max(np.abs(levels - np.round(levels))) > 1e-3:
+                    step = (float(values[-1]) - low) / 65535
+                    dtype = '>u2'
+            data = np.round((codes - low) / step).astype(dtype)
+            ymult = ymult * step
+            yoff = (yoff - low) / step
+
+        self.width = data.dtype.itemsize
+        self.preamble = oscillo_scope_session.waveform_preamble(ymult, yzero, yoff, header['xincr'], header['xzero'])
+        data = data.tobytes()
+        count = str(len(data))
+        self.block = '#{}{}'.format(len(count), count).encode() + data + b'\n'
+
+
+class replay_source():
+
+    def __init__(self, file_names):
+        '''
+        This class reads the saved waveforms of a list of files (or folders, whose waveforms are read in
+        the order they were collected), one after the other.
+        '''
+        self.file_names = []
+        for file_name in file_names:
+            if os.path.isdir(file_name):
+                found = [os.path.join(file_name, name) for name in os.listdir(file_name) if name.endswith(WAVEFORM_EXTENSIONS)]
+                found = [name for name in found if not name.endswith('.csv') or is_waveform_csv(name)]
+                self.file_names.extend(sorted(found, key=file_time))
+            else:
+                self.file_names.append(file_name)
+
+    def __len__(self):
+        '''
+        The number of waveforms in all of the files. Only the headers of the files are read.
+        '''
+        count = 0
+        for file_name in self.file_names:
+            if file_name.endswith(orf.EXTENSION):
+                count += len(orf.run_reader(file_name))
+            elif file_name.endswith(orf.ARCHIVE_EXTENSION):
+                reader = orf.archive_reader(file_name)
+                count += len(reader)
+                reader.close()
+            else:
+                count += 1
+        return count
+
+    def frames(self):
+        '''
+        This method yields a replay_frame for each saved waveform.
+        '''
+        for file_name in self.file_names:
+            if file_name.endswith(owf.EXTENSION):
+                header, codes = owf.open_waveform(file_name)
+                yield replay_frame(codes, header, file_name)
+            elif file_name.endswith((orf.EXTENSION, orf.ARCHIVE_EXTENSION)):
+                if file_name.endswith(orf.EXTENSION):
+                    reader = orf.run_reader(file_name)
+                else:
+                    reader = orf.archive_reader(file_name)
+                for i in range(len(reader)):
+                    codes, header = reader.frame_codes(i)
+                    yield replay_frame(codes, header, file_name)
+                if hasattr(reader, 'close'):
+                    reader.close()
+            else:
+                time, amplitude = read_csv(file_name)
+                if len(time) > 1:
+                    xincr = float(time[1] - time[0])
+                else:
+                    xincr = 1e-9
+                if CSV_XZERO is not None:
+                    xzero = float(CSV_XZERO)
+                elif len(time) > 0:
+                    xzero = -float(time[0])
+                else:
+                    xzero = 0.0
+                header = {'ymult': 1.0, 'yzero': 0.0, 'yoff': 0.0, 'xincr': xincr, 'xzero': xzero,
+                          'first_point': int(round(time[0] / xincr)) if len(time) > 0 else 0}
+                yield replay_frame(amplitude, header, file_name)
+
+
+class replay_session(oscillo_scope_session.scope_session):
+
+    def __init__(self, resource_name):
+        '''
+        This class stands in for the session of an oscilloscope (see the oscillo_scope_session.py module),
+        and sends the saved waveforms named in resource_name instead of new ones.
+        '''
+        oscillo_scope_session.scope_session.__init__(self, resource_name)
+        #the saved waveforms are sent as fast as they are asked for
+        self.paced = False
+        #the files come after the "::" of the name
+        self.source = replay_source(resource_name.split('::', 1)[-1].split(os.pathsep))
+        self.total = len(self.source)
+        self.frames = self.source.frames()
+        #the waveform that the last CURVE? query sent, and the one that the next CURVE? query will send
+        self.frame = None
+        self.upcoming = None
+        self.count = 0
+
+    def next_frame(self):
+        '''
+        This method returns the waveform that the next CURVE? query will send. The source_exhausted
+        exception is raised if every waveform has been sent.
+        '''
+        with self.lock:
+            if self.upcoming is None:
+                try:
+                    self.upcoming = next(self.frames)
+                except StopIteration:
+                    raise oap.source_exhausted("every waveform in {} has been replayed".format(self.resource_name))
+            return self.upcoming
+
+    def current_frame(self):
+        '''
+        This method returns the waveform that the last CURVE? query sent, or the one that the first
+        CURVE? query will send. The preamble describes this waveform.
+        '''
+        with self.lock:
+            if self.frame is None:
+                return self.next_frame()
+            return self.frame
+
+    def remaining(self):
+        '''
+        This method returns the number of waveforms that haven't been sent yet.
+        '''
+        with self.lock:
+            return self.total - self.count
+
+    def open(self):
+        with self.lock:
+            self.scope = self.source
+            self.idn = 'OSCILLO,REPLAY,{},0'.format(os.path.basename(self.source.file_names[0]) if self.source.file_names else 'empty')
+
+    def close(self):
+        with self.lock:
+            self.scope = None
+
+    def check_health(self):
+        return True
+
+    def write(self, command):
+        with self.lock:
+            self.remember(command)
+
+    def query(self, command):
+        '''
+        This method answers the queries that the collection options send, other than CURVE?.
+        '''
+        with self.lock:
+            header = command.strip().split(' ', 1)[0].upper().lstrip(':')
+            if header == '*IDN?':
+                return self.idn + '\n'
+            if header == '*OPC?':
+                return '1\n'
+            return self.settings.get(header.rstrip('?'), '0') + '\n'
+
+    def query_raw(self, command):
+        '''
+        This method answers the CURVE? query with the next saved waveform.
+        '''
+        with self.lock:
+            if not command.strip().upper().lstrip(':').startswith('CURV'):
+                return self.query(command).encode()
+            self.frame = self.next_frame()
+            self.upcoming = None
+            self.count += 1
+            return self.frame.block
+
+    def preamble(self):
+        '''
+        The preamble of the waveform that was sent last (see current_frame). Saved waveforms can each
+        have a different preamble, so the preamble isn't kept like it is for an oscilloscope.
+        '''
+        return self.current_frame().preamble
+
+    def first_point(self):
+        return self.current_frame().first_point
+
+    def data_width(self):
+        return self.current_frame().width
+
+
+class replay_window(console_window):
+
+    def __init__(self, session, answers=None):
+        '''
+        This class stands in for the GUI window during a replay, and answers the questions that the
+        collection options ask (see the get_value class in the oscillo_option_windows.py module).
+        answers is a dictionary of answers, keyed by a part of the question. The questions that aren't
+        in it are answered from the replay: the parameters of the collection come from the saved
+        waveforms, and the number of waveforms is the number left to replay. A temperature is only
+        answered from a saved file that records one (like a reference in the reference library). The
+        waveforms that are collected don't record the temperature they were collected at.
+        '''
+        self.session = session
+        self.answers = answers or {}
+
+    def answer(self, prompt, kind):
+        '''
+        This method answers one question. kind is the kind of dialog box that would have been shown.
+        '''
+        question = prompt.lower()
+        for key in self.answers:
+            if key.lower() in question:
+                return self.convert(self.answers[key], kind)
+
+        remaining = self.session.remaining()
+        if remaining > 0:
+            parameters = self.session.next_frame().parameters
+        else:
+            parameters = {}
+
+        if kind == 'parameters':
+            return [str(parameters.get(name, '')) for name in ('metal', 'DL', 'freq', 'gain')]
+        if kind == 'int':
+            if 'temperature' in question and 'temperature' in parameters:
+                return self.convert(parameters['temperature'], kind)
+            if 'how many waveforms per minute' in question:
+                return 60
+            if 'how many minutes' in question:
+                #long enough for every waveform. The collection stops when they run out.
+                return remaining + 1
+            if 'how many waveforms' in question:
+                return remaining
+            raise ValueError("the replay has no answer for \"{}\". Give one with --answer.".format(prompt))
+        if kind == 'yn':
+            if 'another' in question or 'ready' in question:
+                return 'y' if remaining > 0 else 'n'
+            return 'n'
+        if kind == 'str':
+            return ''
+        return None
+
+    def convert(self, value, kind):
+        '''
+        This method converts an answer to the type that the dialog box would have returned.
+        '''
+        if kind == 'int':
+            value = float(value)
+            return int(value) if value.is_integer() else value
+        if kind == 'parameters' and isinstance(value, str):
+            return [item.strip() for item in value.split(',')]
+        return value
+
+
+def headless():
+    '''
+    This function prepares a replay process. Plots are drawn without being shown, since there is no
+    screen to show them on.
+    '''
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def replay_files(routine, file_names, answers=None):
+    '''
+    This function replays a group of files through a collection option, without a GUI. routine is the
+    name of the class and the method of the option, like "Processed_waveforms.gaussian_timing". It
+    returns the files, what happened, and how many seconds it took.
+    '''
+    check_routine(routine)
+    #the collection options are imported here, so that importing this module doesn't import them
+    import oscillo_collection_options
+
+    resource_name = RESOURCE_PREFIX + os.pathsep.join(file_names)
+    #the collection options use the instrument in SCOPE_RESOURCE, so the replay is put there
+    oscillo_scope_session.SCOPE_RESOURCE = resource_name
+    session = oscillo_scope_session.get_session(resource_name)
+    class_name, method_name = routine.split('.')
+    options = getattr(oscillo_collection_options, class_name)(replay_window(session, answers), console_variable())
+
+    then = t.time()
+    try:
+        getattr(options, method_name)()
+        status = 'replayed {} of {} waveforms'.format(session.count, session.total)
+    except oap.source_exhausted:
+        status = 'replayed all {} waveforms'.format(session.total)
+    except Exception as error:
+        traceback.print_exc()
+        status = 'failed: {!r}'.format(error)
+    finally:
+        #the process may be ended without running the atexit functions, so the results are written now
+        if obw.shared_writer is not None:
+            obw.shared_writer.flush()
+        if ors.shared_store is not None:
+            ors.shared_store.flush()
+    return file_names, status, t.time() - then
+
+
+def check_routine(routine):
+    '''
+    This function raises a ValueError if the option can't be replayed (see UNREPLAYABLE).
+    '''
+    if routine in UNREPLAYABLE:
+        raise ValueError("{} can't be replayed: {}.".format(routine, UNREPLAYABLE[routine]))
+
+
+def replay_task(task):
+    '''
+    This function unpacks a task for the process pool (see replay).
+    '''
+    return replay_files(*task)
+
+
+def replay(routine, paths, workers=REPLAY_WORKERS, answers=None):
+    '''
+    This function replays every run file and folder of waveforms found in paths (see find_sources)
+    through a collection option, in a pool of workers processes. Each group of files gets a new
+    process, so that nothing is shared between them. It returns what happened to each group.
+    '''
+    check_routine(routine)
+    sources = find_sources(paths)
+    print("Replaying {} with {} groups of files in {} processes.".format(routine, len(sources), workers))
+    tasks = [(routine, file_names, answers) for file_names in sources]
+    outcomes = []
+    then = t.time()
+    with multiprocessing.Pool(workers, initializer=headless, maxtasksperchild=1) as pool:
+        for file_names, status, seconds in pool.imap_unordered(replay_task, tasks):
+            outcomes.append((file_names, status, seconds))
+            print("[{}/{}] {} ({} files): {} in {:.1f} s".format(len(outcomes), len(tasks), os.path.dirname(file_names[0]) if len(file_names) > 1 else file_names[0],
+                                                            len(file_names), status, seconds))
+    failed = len([outcome for outcome in outcomes if outcome[1].startswith('failed')])
+    print("Replayed {} groups of files in {:.1f} s. {} failed.".format(len(outcomes), t.time() - then, failed))
+    return outcomes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay saved waveforms through a collection option.")
+    parser.add_argument('routine', help='the class and method of the option, like Processed_waveforms.gaussian_timing')
+    parser.add_argument('paths', nargs='+', help='run files, archives, waveform files, or folders of them')
+    parser.add_argument('--workers', type=int, default=REPLAY_WORKERS, help='the number of processes')
+    parser.add_argument('--answer', action='append', default=[],
+                        help='an answer to a question, as "part of the question=answer"')
+    arguments = parser.parse_args()
+    answers = dict(item.split('=', 1) for item in arguments.answer)
+    replay(arguments.routine, arguments.paths, arguments.workers, answers)
@@ -0,0 +1,251 @@
+'''
+@author Manish Roy
+
+This module contains the result store. The timing and sensing options used to write their results
+(the times of flight, the time shifts, and the temperatures) to a CSV file of their own, one row at a
+time, with headers that were different from option to option. Every report meant reading thousands
+of these files again, and the rows that hadn't been written yet were lost if the program stopped.
+
+The result store keeps the results of every collection in a single SQLite database, with the same
+columns for every option (see COLUMNS below). The rows are held in memory and written to the
+database in batches, and the database is in write-ahead logging mode, so it can be queried (for
+example with the sqlite3 program, or with pandas) while a collection is still running. When a
+collection is finished, its rows are also written to a CSV file in its directory, like before.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import sqlite3. The results are stored in an SQLite database.
+import sqlite3
+#Import csv. The results of each collection are also written to a CSV file.
+import csv
+#Import the threading library. The store can be used from the processing threads.
+import threading
+#Import atexit. This is used to write the rows that are still in memory before the program exits.
+import atexit
+#Import the operating system. This is used to read the settings of the store from the environment.
+import os
+#Import time. Each row is given the time that it was added.
+import time as t
+#Import json. Every time shift of a row is kept in a single column, as a JSON list.
+import json
+
+#This is the database that holds the results. It is next to the data files, unless another one is given.
+RESULT_DATABASE = os.environ.get('OSCILLO_RESULTS', "C:\\Oscillo\\DataFiles\\results.sqlite")
+
+#The rows are written to the database when this many of them are waiting...
+BATCH_SIZE = int(os.environ.get('OSCILLO_RESULT_BATCH', '20'))
+#...or when the oldest of them has waited this many seconds.
+FLUSH_INTERVAL = float(os.environ.get('OSCILLO_RESULT_INTERVAL', '5'))
+
+#These are the columns of every row, and their types in the database. "run" names the collection that
+# the row belongs to, and "routine" is the option that collected it. fwg is the time of flight of the
+# full waveguide and s1 to s4 are the times of flight of its segments, in seconds. "dts" holds the
+# shifts of every peak from the peaks of the reference, in samples, as a JSON list, and dt1 to dt5 are
+# the first five of them (so that they are easy to query). "reference" is the version of the reference
+# peaks they were measured from (see the reference_peaks class in the oscillo_reference_library.py
+# module). "flags" holds the quality flags below.
+COLUMNS = [('run', 'TEXT'), ('routine', 'TEXT'), ('time_stamp', 'REAL'),
+           ('metal', 'TEXT'), ('DL', 'TEXT'), ('freq', 'TEXT'), ('gain', 'TEXT'),
+           ('instrument', 'TEXT'), ('waveform', 'INTEGER'),
+           ('fwg', 'REAL'), ('s1', 'REAL'), ('s2', 'REAL'), ('s3', 'REAL'), ('s4', 'REAL'),
+           ('dt1', 'REAL'), ('dt2', 'REAL'), ('dt3', 'REAL'), ('dt4', 'REAL'), ('dt5', 'REAL'),
+           ('dts', 'TEXT'),
+           ('temperature', 'REAL'), ('reference', 'TEXT'), ('flags', 'INTEGER')]
+COLUMN_NAMES = [name for name, kind in COLUMNS]
+
+#These are the quality flags. They are added together in the "flags" column.
+# A value (like a time of flight) that should have been found is missing.
+FLAG_INCOMPLETE = 1
+# A time of flight is zero or negative, which usually means that the peaks were matched wrongly.
+FLAG_NONPOSITIVE_TOF = 2
+# More times of flight were found than the columns can hold, so some of them weren't stored.
+FLAG_TRUNCATED = 4
+
+#This is the store that is shared by all of the collection options (see get_store).
+shared_store = None
+#This lock protects the shared store while it is created.
+store_lock = threading.Lock()
+
+
+def get_store():
+    '''
+    This function returns the shared result store. The store is created the first time it is
+    requested, and the rows that are still in memory are written when the program exits.
+    '''
+    global shared_store
+    with store_lock:
+        if shared_store is None:
+            shared_store = result_store()
+            atexit.register(shared_store.close)
+        return shared_store
+
+
+def as_number(value):
+    '''
+    This function converts a value to a float, or to None if it is missing.
+    '''
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+class result_store():
+
+    def __init__(self, file_name=RESULT_DATABASE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        '''
+        file_name is the database. It is created if it doesn't exist. batch_size and flush_interval
+        decide when the rows in memory are written to the database.
+        '''
+        self.file_name = file_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        #the rows waiting to be written, and when the oldest of them was added
+        self.pending = []
+        self.oldest = None
+        self.connection = sqlite3.connect(file_name, check_same_thread=False)
+        #let the database be read while it is written
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY, {})'.format(
+            ', '.join('{} {}'.format(name, kind) for name, kind in COLUMNS)))
+        #add the columns that a database made by an older version of this module doesn't have
+        existing = [row[1] for row in self.connection.execute('PRAGMA table_info(results)')]
+        for name, kind in COLUMNS:
+            if name not in existing:
+                self.connection.execute('ALTER TABLE results ADD COLUMN {} {}'.format(name, kind))
+        self.connection.execute('CREATE INDEX IF NOT EXISTS results_run ON results (run)')
+        self.connection.commit()
+
+    def add(self, row):
+        '''
+        This method adds a row (a dictionary keyed by the names in COLUMNS) to the store. The row
+        is written to the database with the next batch.
+        '''
+        with self.lock:
+            self.pending.append(tuple(row.get(name) for name in COLUMN_NAMES))
+            if self.oldest is None:
+                self.oldest = t.time()
+            due = len(self.pending) >= self.batch_size or t.time() - self.oldest >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        '''
+        This method writes the rows in memory to the database.
+        '''
+        with self.lock:
+            if len(self.pending) == 0 or self.connection is None:
+                return
+            self.connection.executemany('INSERT INTO results ({}) VALUES ({})'.format(
+                ', '.join(COLUMN_NAMES), ', '.join('?' * len(COLUMN_NAMES))), self.pending)
+            self.connection.commit()
+            self.pending = []
+            self.oldest = None
+
+    def query(self, sql, parameters=()):
+        '''
+        This method writes the rows in memory, and then runs a query on the database and returns the
+        rows that it found. For example, query("SELECT fwg FROM results WHERE metal = ?", ("Al",)).
+        '''
+        self.flush()
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        '''
+        This method writes the rows in memory and closes the database.
+        '''
+        self.flush()
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+class result_sink():
+
+    def __init__(self, run, routine, metal, DL, freq, gain, store=None, reference=None):
+        '''
+        This class adds the results of one collection to the result store. run is the name of the
+        collection, routine is the name of the option that collects it, and the rest are the
+        parameters of the collection. reference is the version of the reference peaks that the
+        collection uses, if it uses any. The shared store is used unless another one is given.
+        '''
+        if store is None:
+            store = get_store()
+        self.store = store
+        self.row = {'run': run, 'routine': routine, 'metal': metal, 'DL': DL, 'freq': freq, 'gain': gain,
+                    'reference': reference}
+
+    def add(self, fwg=None, segments=(), dts=(), temperature=None, instrument=None, waveform=None, flags=0):
+        '''
+        This method adds the results of one waveform. fwg is the time of flight of the full waveguide,
+        segments are the times of flight of its segments, dts are the time shifts from the reference,
+        and temperature is the measured or calculated temperature. Values that weren't found can be
+        left out. The quality flags are set from the values, and added to the flags that are given.
+        '''
+        row = dict(self.row)
+        row['time_stamp'] = t.time()
+        row['instrument'] = instrument
+        row['waveform'] = waveform
+        row['fwg'] = as_number(fwg)
+        row['temperature'] = as_number(temperature)
+
+        segments = [as_number(value) for value in segments]
+        dts = [as_number(value) for value in dts]
+        if len(segments) > 4:
+            flags |= FLAG_TRUNCATED
+        for j, value in enumerate(segments[:4]):
+            row['s{}'.format(j + 1)] = value
+        #every time shift is kept (there is one for each peak), and the first five also have columns of their own
+        if len(dts) > 0:
+            row['dts'] = json.dumps(dts)
+        for j, value in enumerate(dts[:5]):
+            row['dt{}'.format(j + 1)] = value
+
+        #the sensing options don't find times of flight, so they are only checked if some were given
+        times_of_flight = [row['fwg']] + segments
+        if (fwg is not None or len(segments) > 0) and None in times_of_flight:
+            flags |= FLAG_INCOMPLETE
+        if None in dts:
+            flags |= FLAG_INCOMPLETE
+        if any(value is not None and value <= 0 for value in times_of_flight):
+            flags |= FLAG_NONPOSITIVE_TOF
+        row['flags'] = flags
+
+        self.store.add(row)
+
+    def rows(self):
+        '''
+        This method returns every row of this collection that is in the store.
+        '''
+        return self.store.query('SELECT {} FROM results WHERE run = ? ORDER BY id'.format(', '.join(COLUMN_NAMES)),
+                                (self.row['run'],))
+
+    def close(self, file_name_csv=None):
+        '''
+        This method writes the rows of this collection to the database. If a file name is given, the
+        rows are also written to that CSV file, with a header that names every column. Every time shift
+        gets a column of its own in the CSV file (dt1, dt2, ... up to the most that a row has).
+        '''
+        self.store.flush()
+        if file_name_csv is not None:
+            first = COLUMN_NAMES.index('dt1')
+            last = COLUMN_NAMES.index('dts')
+            rows = []
+            for row in self.rows():
+                if row[last] is not None:
+                    dts = json.loads(row[last])
+                else:
+                    #a row written by an older version of this module only has dt1 to dt5
+                    dts = list(row[first:first + 5])
+                rows.append((row[:first], dts, row[last + 1:]))
+            count = max([5] + [len(dts) for before, dts, after in rows])
+            with open(file_name_csv, 'w', newline='') as myfile:
+                writer = csv.writer(myfile)
+                writer.writerow(COLUMN_NAMES[:first] + ['dt{}'.format(j + 1) for j in range(count)] + COLUMN_NAMES[last + 1:])
+                for before, dts, after in rows:
+                    writer.writerow(list(before) + dts + [None] * (count - len(dts)) + list(after))
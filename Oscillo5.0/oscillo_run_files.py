@@ -0,0 +1,565 @@
+'''
+@author Manish Roy
+
+This module contains the run file format (".oscrun" files). Collections like multiple_waveforms
+and continuous_waveform used to save every waveform to its own file, so a run of a few hours left
+tens of thousands of files in its directory, and listing, copying and reloading them was slow. A
+run file holds every waveform of a collection, one after the other, in a single file that is only
+ever added to.
+
+The layout of an .oscrun file is:
+
+    8 bytes     the magic string b"OSCRUN1\n"
+    4 bytes     the length of the header, as a little-endian unsigned integer
+    header      a JSON dictionary with the parameters of the collection, the format of the codes
+                ("dtype"), the number of codes in each frame ("frame_length") and the size of each
+                frame record in bytes ("record_size"), padded with spaces so that the frames start
+                on a multiple of 16 bytes
+    frames      one record per waveform, all of the same size. Each record starts with the time
+                stamp and the preamble of its waveform (see RECORD_FIELDS below), followed by the
+                codes, padded with zeros up to frame_length
+    index       the byte offset and the time stamp of every frame, written when the run is closed
+    footer      the position of the index and the number of frames, followed by b"OSCIDX1\n"
+
+Because every record has the same size, any frame can be read by its offset without reading the
+frames before it, and the index lets a range of time stamps be found without reading the frames at
+all. If a run is never closed (for example if the program is stopped), the index is missing, but
+the frames that were written can still be read.
+
+Waveforms collected one after the other are almost the same, because the echoes only move a little
+as the temperature changes. For long runs, the frames can instead be saved to an archive file
+(".oscarc" files, see archive_writer below). An archive stores a whole frame (a keyframe) every so
+often, and every other frame as its difference from the last keyframe. The keyframes and the
+differences are compressed, and the differences compress much better than the frames themselves.
+Nothing is lost: the codes read from an archive are exactly the codes that were saved. The frames
+have different sizes in an archive, so they are found through the index, and reading a frame needs
+at most its keyframe and itself.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import json. The header of each file is stored as a JSON dictionary.
+import json
+#Import struct. This is used to write the length of the header and the footer as raw bytes.
+import struct
+#Import the operating system. This is used to find the size of a run file.
+import os
+#Import time. Each frame is given the time that it was saved.
+import time as t
+#Import zlib. The frames of an archive are compressed with it.
+import zlib
+#Import the binary waveform files. The run files use the same codes and the same alignment.
+import oscillo_waveform_files as owf
+
+#This is at the start of every .oscrun file.
+MAGIC = b'OSCRUN1\n'
+
+#This is at the end of every .oscrun file that was closed properly.
+INDEX_MAGIC = b'OSCIDX1\n'
+
+#This is the file extension of the run files.
+EXTENSION = '.oscrun'
+
+#This is at the start of every .oscarc file.
+ARCHIVE_MAGIC = b'OSCARC1\n'
+
+#This is the file extension of the archive files.
+ARCHIVE_EXTENSION = '.oscarc'
+
+#This is the number of frames between the keyframes of an archive.
+KEYFRAME_INTERVAL = int(os.environ.get('OSCILLO_KEYFRAME_INTERVAL', '50'))
+
+#This is how hard zlib works to compress the frames of an archive (from 1, the fastest, to 9, the smallest).
+COMPRESSION_LEVEL = int(os.environ.get('OSCILLO_COMPRESSION_LEVEL', '6'))
+
+#These are the kinds of frame in an archive. A keyframe holds the codes, and a delta holds the
+# difference between the codes and the codes of a keyframe (or of the reference of the archive).
+KEYFRAME = 0
+DELTA = 1
+REFERENCE = 2
+
+#These are stored at the start of every frame record, before the codes.
+RECORD_FIELDS = [('time_stamp', '<f8'), ('ymult', '<f8'), ('yzero', '<f8'), ('yoff', '<f8'),
+                 ('xincr', '<f8'), ('xzero', '<f8'), ('first_point', '<i8'), ('count', '<i8')]
+
+#These are the entries of the index, one per frame.
+INDEX_FIELDS = [('offset', '<u8'), ('time_stamp', '<f8')]
+
+#The footer holds the position of the index and the number of frames.
+FOOTER = struct.Struct('<QQ')
+
+#These are stored at the start of every frame record of an archive, before the compressed data. base is
+# the number of the keyframe that a delta is taken from (or -1 for the reference), width is the number of
+# bytes of each difference in a delta, and length is the number of bytes of compressed data.
+ARCHIVE_FIELDS = np.dtype(RECORD_FIELDS + [('kind', '<i8'), ('base', '<i8'), ('width', '<i8'), ('length', '<i8')])
+
+
+def record_dtype(dtype, frame_length):
+    '''
+    This function returns the numpy type of one frame record, so that the frames of a run file can
+    be read as a single array of records.
+    '''
+    fields = RECORD_FIELDS + [('codes', np.dtype(dtype), (frame_length,))]
+    used = np.dtype(fields).itemsize
+    #pad the record so that every record is aligned
+    padding = -used % owf.ALIGNMENT
+    if padding > 0:
+        fields.append(('padding', 'V{}'.format(padding)))
+    return np.dtype(fields)
+
+
+def read_preamble(osc_file, magic):
+    '''
+    This function reads the magic string and the header of a run file or an archive, and returns the
+    header dictionary and the position of the first frame.
+    '''
+    if osc_file.read(len(magic)) != magic:
+        raise ValueError("{} is not a {} file".format(osc_file.name, magic.decode().strip()))
+    length = struct.unpack('<I', osc_file.read(4))[0]
+    header = json.loads(osc_file.read(length).decode())
+    return header, len(magic) + 4 + length
+
+
+def read_index(osc_file, size, data_start):
+    '''
+    This function reads the index at the end of a run file or an archive. It returns None if the file
+    wasn't closed properly.
+    '''
+    footer_size = FOOTER.size + len(INDEX_MAGIC)
+    if size - data_start < footer_size:
+        return None
+    osc_file.seek(size - footer_size)
+    footer = osc_file.read(footer_size)
+    if footer[FOOTER.size:] != INDEX_MAGIC:
+        return None
+    index_start, count = FOOTER.unpack(footer[:FOOTER.size])
+    osc_file.seek(index_start)
+    return np.frombuffer(osc_file.read(count * np.dtype(INDEX_FIELDS).itemsize), dtype=INDEX_FIELDS)
+
+
+def delta_dtype(delta):
+    '''
+    This function returns the smallest type that holds every value of a difference between two frames.
+    '''
+    if len(delta) == 0:
+        return np.dtype('i1')
+    low = delta.min()
+    high = delta.max()
+    for dtype in ('i1', '<i2'):
+        limits = np.iinfo(np.dtype(dtype))
+        if low >= limits.min and high <= limits.max:
+            return np.dtype(dtype)
+    return np.dtype('<i4')
+
+
+class run_writer():
+
+    def __init__(self, file_name, parameters=None):
+        '''
+        This class writes the waveforms of one collection to a run file. parameters is a dictionary
+        of anything that should be kept with the run, like the waveguide material and the gain. The
+        header is written with the first frame, because the length of the frames isn't known before.
+        '''
+        self.file_name = file_name
+        self.parameters = parameters or {}
+        self.run_file = open(file_name, 'wb')
+        self.dtype = None
+        self.frame_length = None
+        self.record = None
+        self.data_start = None
+        #the offsets and time stamps of the frames, written to the index when the run is closed
+        self.offsets = []
+        self.time_stamps = []
+
+    def write_header(self, dtype, frame_length):
+        '''
+        This method writes the header of the run file, once the format of the frames is known.
+        '''
+        self.dtype = np.dtype(dtype)
+        self.frame_length = int(frame_length)
+        self.record = record_dtype(self.dtype, self.frame_length)
+        header = {'dtype': self.dtype.str, 'frame_length': self.frame_length,
+                  'record_size': self.record.itemsize, 'parameters': self.parameters}
+        header = json.dumps(header).encode()
+        #pad the header so that the frames are aligned
+        used = len(MAGIC) + 4 + len(header)
+        header = header + b' ' * (-used % owf.ALIGNMENT)
+        self.run_file.write(MAGIC)
+        self.run_file.write(struct.pack('<I', len(header)))
+        self.run_file.write(header)
+        self.data_start = self.run_file.tell()
+
+    def append(self, codes, ymult, yzero, yoff, xincr, xzero, first_point=0, time_stamp=None):
+        '''
+        This method adds one waveform to the end of the run file. The codes are given with the
+        preamble values that turn them back into volts and seconds (see write_waveform in the
+        oscillo_waveform_files.py module). The frame is written to the disk right away, so that it
+        isn't lost if the program is stopped. It returns the number of the frame in the run.
+        '''
+        codes = np.asarray(codes)
+        if time_stamp is None:
+            time_stamp = t.time()
+        if self.record is None:
+            self.write_header(codes.dtype, len(codes))
+
+        if len(codes) > self.frame_length:
+            raise ValueError("the waveform has {} points, but the frames of this run hold {}".format(
+                len(codes), self.frame_length))
+        #every frame of a run is stored in the same format
+        converted = codes.astype(self.dtype)
+        if not np.array_equal(converted, codes):
+            raise ValueError("the codes can't be stored as {} without losing precision".format(self.dtype))
+
+        record = np.zeros(1, dtype=self.record)
+        record['time_stamp'] = time_stamp
+        record['ymult'] = ymult
+        record['yzero'] = yzero
+        record['yoff'] = yoff
+        record['xincr'] = xincr
+        record['xzero'] = xzero
+        record['first_point'] = first_point
+        record['count'] = len(codes)
+        record['codes'][0, :len(codes)] = converted
+
+        self.offsets.append(self.run_file.tell())
+        self.time_stamps.append(time_stamp)
+        self.run_file.write(record.tobytes())
+        self.run_file.flush()
+        return len(self.offsets) - 1
+
+    def close(self):
+        '''
+        This method writes the index of the frames and the footer, and closes the run file.
+        '''
+        if self.run_file.closed:
+            return
+        if self.record is None:
+            #no frames were added, so the header is written with empty frames
+            self.write_header('u1', 0)
+        index = np.zeros(len(self.offsets), dtype=INDEX_FIELDS)
+        index['offset'] = self.offsets
+        index['time_stamp'] = self.time_stamps
+        index_start = self.run_file.tell()
+        self.run_file.write(index.tobytes())
+        self.run_file.write(FOOTER.pack(index_start, len(self.offsets)))
+        self.run_file.write(INDEX_MAGIC)
+        self.run_file.close()
+
+
+class run_reader():
+
+    def __init__(self, file_name):
+        '''
+        This class reads the frames of a run file. The frames are memory mapped, so only the frames
+        that are actually used are read from the disk.
+        '''
+        self.file_name = file_name
+        size = os.path.getsize(file_name)
+        with open(file_name, 'rb') as run_file:
+            self.header, data_start = read_preamble(run_file, MAGIC)
+            #read the index, if the run was closed properly
+            index = read_index(run_file, size, data_start)
+
+        self.parameters = self.header['parameters']
+        self.record = record_dtype(self.header['dtype'], self.header['frame_length'])
+        if index is not None:
+            count = len(index)
+        else:
+            #the run wasn't closed, so every whole record after the header is a frame
+            count = (size - data_start) // self.record.itemsize
+
+        if count > 0:
+            self.frames = np.memmap(file_name, dtype=self.record, mode='r', offset=data_start, shape=(count,))
+        else:
+            self.frames = np.zeros(0, dtype=self.record)
+
+        if index is not None:
+            self.time_stamps = index['time_stamp']
+        else:
+            self.time_stamps = np.array(self.frames['time_stamp'])
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame_header(self, i):
+        '''
+        This method returns the preamble values of frame i as a dictionary, in the same form as the
+        header of an .osc file, so that the functions of the oscillo_waveform_files.py module can use it.
+        '''
+        record = self.frames[i]
+        header = {'dtype': self.header['dtype'], 'parameters': self.parameters}
+        for name, dtype in RECORD_FIELDS:
+            header[name] = record[name].item()
+        return header
+
+    def frame_codes(self, i):
+        '''
+        This method returns the codes of frame i, and its header dictionary.
+        '''
+        header = self.frame_header(i)
+        return self.frames[i]['codes'][:header['count']], header
+
+    def read_frame(self, i):
+        '''
+        This method returns the time and volts arrays of frame i, and its header dictionary.
+        '''
+        codes, header = self.frame_codes(i)
+        return owf.waveform_time(header), owf.codes_to_volts(codes, header), header
+
+    def frames_between(self, start, stop):
+        '''
+        This method returns the numbers of the frames that were saved between the time stamps start
+        and stop (in seconds since the epoch, like time.time()). The frames are saved in order, so
+        the range is found with a binary search of the index.
+        '''
+        first = np.searchsorted(self.time_stamps, start, side='left')
+        last = np.searchsorted(self.time_stamps, stop, side='right')
+        return range(first, last)
+
+
+class archive_writer():
+
+    def __init__(self, file_name, parameters=None, keyframe_interval=KEYFRAME_INTERVAL, reference=None):
+        '''
+        This class writes the waveforms of one collection to an archive file. It is used the same way
+        as run_writer. keyframe_interval is the number of frames between the keyframes. If the codes of
+        a reference waveform are given, they are stored at the start of the archive, and every frame
+        of the same length is stored as its difference from the reference, so no keyframes are needed.
+        '''
+        self.file_name = file_name
+        self.parameters = parameters or {}
+        self.keyframe_interval = keyframe_interval
+        self.run_file = open(file_name, 'wb')
+        self.dtype = None
+        #the codes of the last keyframe, and its number
+        self.key_codes = None
+        self.key_number = None
+        self.reference = None
+        self.offsets = []
+        self.time_stamps = []
+        if reference is not None:
+            reference = np.asarray(reference)
+            self.write_header(reference.dtype)
+            self.reference = reference.astype('<i4')
+            self.write_record(REFERENCE, -1, reference, 0, 0, 0, 0, 0, 0, 0)
+
+    def write_header(self, dtype):
+        '''
+        This method writes the header of the archive, once the format of the codes is known.
+        '''
+        self.dtype = np.dtype(dtype)
+        header = {'dtype': self.dtype.str, 'keyframe_interval': self.keyframe_interval,
+                  'parameters': self.parameters}
+        header = json.dumps(header).encode()
+        self.run_file.write(ARCHIVE_MAGIC)
+        self.run_file.write(struct.pack('<I', len(header)))
+        self.run_file.write(header)
+
+    def write_record(self, kind, base, data, ymult, yzero, yoff, xincr, xzero, first_point, time_stamp, compressed=None):
+        '''
+        This method writes data as one record of the archive. data is compressed here, unless it has
+        already been compressed.
+        '''
+        data = np.ascontiguousarray(data)
+        if compressed is None:
+            compressed = zlib.compress(data.tobytes(), COMPRESSION_LEVEL)
+        record = np.zeros(1, dtype=ARCHIVE_FIELDS)
+        record['time_stamp'] = time_stamp
+        record['ymult'] = ymult
+        record['yzero'] = yzero
+        record['yoff'] = yoff
+        record['xincr'] = xincr
+        record['xzero'] = xzero
+        record['first_point'] = first_point
+        record['count'] = len(data)
+        record['kind'] = kind
+        record['base'] = base
+        if kind == DELTA:
+            record['width'] = data.dtype.itemsize
+        record['length'] = len(compressed)
+        offset = self.run_file.tell()
+        self.run_file.write(record.tobytes())
+        self.run_file.write(compressed)
+        self.run_file.flush()
+        return offset
+
+    def append(self, codes, ymult, yzero, yoff, xincr, xzero, first_point=0, time_stamp=None):
+        '''
+        This method adds one waveform to the end of the archive, as a keyframe or as a delta. It returns
+        the number of the frame in the archive.
+        '''
+        codes = np.asarray(codes)
+        if time_stamp is None:
+            time_stamp = t.time()
+        if self.dtype is None:
+            self.write_header(codes.dtype)
+        #every frame of an archive is stored in the same format
+        converted = codes.astype(self.dtype)
+        if not np.array_equal(converted, codes):
+            raise ValueError("the codes can't be stored as {} without losing precision".format(self.dtype))
+
+        number = len(self.offsets)
+        preamble = (ymult, yzero, yoff, xincr, xzero, first_point, time_stamp)
+
+        #choose what the difference is taken from. Differences are only taken between whole numbers
+        # of the same length, so that they are exact.
+        base = None
+        if self.dtype.kind in 'iu':
+            if self.reference is not None:
+                if len(codes) == len(self.reference):
+                    base, base_codes = -1, self.reference
+            elif (self.key_codes is not None and len(codes) == len(self.key_codes)
+                  and number - self.key_number < self.keyframe_interval):
+                base, base_codes = self.key_number, self.key_codes
+
+        compressed = zlib.compress(converted.tobytes(), COMPRESSION_LEVEL)
+        if base is not None:
+            delta = converted.astype('<i4') - base_codes
+            delta = delta.astype(delta_dtype(delta))
+            compressed_delta = zlib.compress(delta.tobytes(), COMPRESSION_LEVEL)
+        #when the waveforms are mostly noise, the difference can be larger than the frame itself,
+        # so the frame is stored as a keyframe instead
+        if base is not None and len(compressed_delta) < len(compressed):
+            offset = self.write_record(DELTA, base, delta, *preamble, compressed=compressed_delta)
+        else:
+            offset = self.write_record(KEYFRAME, number, converted, *preamble, compressed=compressed)
+            self.key_codes = converted.astype('<i4')
+            self.key_number = number
+
+        self.offsets.append(offset)
+        self.time_stamps.append(time_stamp)
+        return number
+
+    def close(self):
+        '''
+        This method writes the index of the frames and the footer, and closes the archive.
+        '''
+        if self.run_file.closed:
+            return
+        if self.dtype is None:
+            self.write_header('u1')
+        index = np.zeros(len(self.offsets), dtype=INDEX_FIELDS)
+        index['offset'] = self.offsets
+        index['time_stamp'] = self.time_stamps
+        index_start = self.run_file.tell()
+        self.run_file.write(index.tobytes())
+        self.run_file.write(FOOTER.pack(index_start, len(self.offsets)))
+        self.run_file.write(INDEX_MAGIC)
+        self.run_file.close()
+
+
+class archive_reader():
+
+    def __init__(self, file_name):
+        '''
+        This class reads the frames of an archive. It is used the same way as run_reader.
+        '''
+        self.file_name = file_name
+        size = os.path.getsize(file_name)
+        self.run_file = open(file_name, 'rb')
+        self.header, data_start = read_preamble(self.run_file, ARCHIVE_MAGIC)
+        self.parameters = self.header['parameters']
+        self.dtype = np.dtype(self.header['dtype'])
+        index = read_index(self.run_file, size, data_start)
+
+        #the reference is the first record, if there is one
+        self.reference = None
+        self.run_file.seek(data_start)
+        first = self.run_file.read(ARCHIVE_FIELDS.itemsize)
+        if len(first) == ARCHIVE_FIELDS.itemsize and np.frombuffer(first, ARCHIVE_FIELDS)['kind'][0] == REFERENCE:
+            record, self.reference = self.read_record(data_start)
+            self.reference = self.reference.astype('<i4')
+
+        if index is not None:
+            self.offsets = index['offset']
+            self.time_stamps = index['time_stamp']
+        else:
+            self.offsets, self.time_stamps = self.scan(data_start, size)
+        #the last keyframe that was read, so that it isn't read again for every delta
+        self.key_number = None
+        self.key_codes = None
+
+    def scan(self, offset, size):
+        '''
+        This method finds the frames of an archive that wasn't closed, by reading the records one
+        after the other until one of them is incomplete.
+        '''
+        offsets = []
+        time_stamps = []
+        while offset + ARCHIVE_FIELDS.itemsize <= size:
+            self.run_file.seek(offset)
+            record = np.frombuffer(self.run_file.read(ARCHIVE_FIELDS.itemsize), ARCHIVE_FIELDS)[0]
+            end = offset + ARCHIVE_FIELDS.itemsize + int(record['length'])
+            if end > size:
+                break
+            if record['kind'] != REFERENCE:
+                offsets.append(offset)
+                time_stamps.append(float(record['time_stamp']))
+            offset = end
+        return np.array(offsets, dtype='<u8'), np.array(time_stamps)
+
+    def read_record(self, offset):
+        '''
+        This method reads the record at offset, and returns the record and its decompressed data.
+        '''
+        self.run_file.seek(int(offset))
+        record = np.frombuffer(self.run_file.read(ARCHIVE_FIELDS.itemsize), ARCHIVE_FIELDS)[0]
+        data = zlib.decompress(self.run_file.read(int(record['length'])))
+        if record['kind'] == DELTA:
+            dtype = np.dtype('<i{}'.format(int(record['width'])))
+        else:
+            dtype = self.dtype
+        return record, np.frombuffer(data, dtype=dtype)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def read_codes(self, i):
+        '''
+        This method returns the codes of frame i, and its record.
+        '''
+        record, data = self.read_record(self.offsets[i])
+        if record['kind'] == KEYFRAME:
+            self.key_number = i
+            self.key_codes = data.astype('<i4')
+            return data, record
+        if record['base'] < 0:
+            base = self.reference
+        else:
+            if self.key_number != record['base']:
+                self.read_codes(int(record['base']))
+            base = self.key_codes
+        return (base + data).astype(self.dtype), record
+
+    def frame_codes(self, i):
+        '''
+        This method returns the codes of frame i, and its header dictionary (see run_reader.frame_codes).
+        '''
+        codes, record = self.read_codes(i)
+        header = {'dtype': self.header['dtype'], 'parameters': self.parameters}
+        for name, dtype in RECORD_FIELDS:
+            header[name] = record[name].item()
+        return codes, header
+
+    def read_frame(self, i):
+        '''
+        This method returns the time and volts arrays of frame i, and its header dictionary.
+        '''
+        codes, header = self.frame_codes(i)
+        return owf.waveform_time(header), owf.codes_to_volts(codes, header), header
+
+    def frames_between(self, start, stop):
+        '''
+        This method returns the numbers of the frames that were saved between the time stamps start
+        and stop (see run_reader.frames_between).
+        '''
+        first = np.searchsorted(self.time_stamps, start, side='left')
+        last = np.searchsorted(self.time_stamps, stop, side='right')
+        return range(first, last)
+
+    def close(self):
+        self.run_file.close()
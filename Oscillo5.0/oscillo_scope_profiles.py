@@ -0,0 +1,235 @@
+'''
+@author Manish Roy
+
+This module contains the settings profiles of the oscilloscope. A profile is a text file in the
+profiles folder that holds one setting per line, in the same form that the setting is sent to the
+oscilloscope. The "default" profile holds the archived settings that Oscillo(TM) was developed with.
+Other profiles can be saved for other waveguides.
+
+Restoring a profile used to mean sending every one of its settings, one at a time, which took long
+enough that it was rarely done. Now the current settings are read from the oscilloscope in a single
+query, and only the settings that are different from the profile are sent. Those are joined with
+semicolons into a few long commands, so that each one is sent in a single round trip.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import the operating system. This is used to find the profiles folder.
+import os
+
+#This is the folder that holds the profiles. It is next to this module.
+PROFILE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+
+#This is the profile that is restored when no other profile is chosen.
+DEFAULT_PROFILE = 'default'
+
+#This is the longest command (in characters) that the settings are joined into. Longer commands
+# can overflow the input buffer of the oscilloscope.
+BATCH_LIMIT = 1000
+
+
+def profile_path(name):
+    '''
+    This function returns the file name of the profile with the given name.
+    '''
+    return os.path.join(PROFILE_DIRECTORY, name + '.txt')
+
+
+def list_profiles():
+    '''
+    This function returns the names of the profiles in the profiles folder.
+    '''
+    if not os.path.isdir(PROFILE_DIRECTORY):
+        return []
+    return sorted(file_name[:-4] for file_name in os.listdir(PROFILE_DIRECTORY) if file_name.endswith('.txt'))
+
+
+def split_outside_quotes(text, separator):
+    '''
+    This function splits the text at each separator that isn't inside a quoted string. Labels on
+    the oscilloscope are quoted, and they can contain any character.
+    '''
+    parts = []
+    current = ''
+    quote = None
+    for character in text:
+        if quote is not None:
+            if character == quote:
+                quote = None
+        elif character in '"\'':
+            quote = character
+        elif character == separator:
+            parts.append(current)
+            current = ''
+            continue
+        current += character
+    parts.append(current)
+    return parts
+
+
+def split_setting(text):
+    '''
+    This function splits a setting like "CH1:SCALE 5.0" into its header and its value.
+    '''
+    words = text.strip().split(' ', 1)
+    header = words[0].upper()
+    if len(words) > 1:
+        value = words[1].strip()
+    else:
+        value = ''
+    return header, value
+
+
+def load_profile(name=DEFAULT_PROFILE):
+    '''
+    This function reads a profile and returns its settings as a list of (header, value) pairs, in
+    the order that they appear in the file. Blank lines and comments (after a "#") are skipped.
+    '''
+    settings = []
+    with open(profile_path(name)) as profile_file:
+        for line in profile_file:
+            #remove the comment, unless the "#" is inside a quoted string
+            line = split_outside_quotes(line, '#')[0].strip()
+            if line == '':
+                continue
+            settings.append(split_setting(line))
+    return settings
+
+
+def save_profile(name, settings):
+    '''
+    This function writes a list of (header, value) pairs to a profile.
+    '''
+    if not os.path.isdir(PROFILE_DIRECTORY):
+        os.makedirs(PROFILE_DIRECTORY)
+    with open(profile_path(name), 'w') as profile_file:
+        profile_file.write('# This settings profile was saved from the oscilloscope by Oscillo(TM).\n')
+        for header, value in settings:
+            profile_file.write((header + ' ' + value).strip() + '\n')
+
+
+def parse_settings(response):
+    '''
+    This function converts the answer to the *LRN? query into a list of (header, value) pairs.
+    The oscilloscope joins the settings with semicolons. A header that starts with a colon is
+    complete, while a header that doesn't is relative to the previous one, so
+    ":ACQUIRE:MODE SAMPLE;NUMAVG 16" means "ACQUIRE:MODE SAMPLE" and "ACQUIRE:NUMAVG 16".
+    '''
+    settings = []
+    path = ''
+    for part in split_outside_quotes(response.strip(), ';'):
+        part = part.strip()
+        if part == '':
+            continue
+        header, value = split_setting(part)
+        if header.startswith(':'):
+            header = header[1:]
+        elif not header.startswith('*') and path != '':
+            header = path + header
+        if ':' in header:
+            path = header[:header.rindex(':') + 1]
+        settings.append((header, value))
+    return settings
+
+
+def same_value(first, second):
+    '''
+    This function decides if two values of a setting are the same. The oscilloscope answers
+    with its own formatting (for example "20.0000" for "20" and "RUNSTOP" for "runstop"), so
+    numbers are compared as numbers and words are compared without regard to case. Quoted
+    strings must match exactly.
+    '''
+    if first == second:
+        return True
+    try:
+        return float(first) == float(second)
+    except ValueError:
+        pass
+    if first.startswith(('"', "'")) or second.startswith(('"', "'")):
+        return first.strip('"\'') == second.strip('"\'')
+    return first.upper() == second.upper()
+
+
+def diff_profile(current, profile):
+    '''
+    This function returns the settings of the profile that are different from the current settings
+    (a list of (header, value) pairs read from the oscilloscope). A setting that the oscilloscope
+    didn't report, like "SELECT:DALL", can't be compared, so it is always included.
+    '''
+    current = dict(current)
+    changes = []
+    for header, value in profile:
+        if header not in current or not same_value(current[header], value):
+            changes.append((header, value))
+    return changes
+
+
+def batch_commands(settings, limit=BATCH_LIMIT):
+    '''
+    This function joins the settings into as few commands as possible. Each setting is given a
+    leading colon, so that it doesn't depend on the setting before it. (Common commands, like *ESE,
+    don't take one.)
+    '''
+    batches = []
+    current = ''
+    for header, value in settings:
+        command = (header + ' ' + value).strip()
+        if not header.startswith('*'):
+            command = ':' + command
+        if current != '' and len(current) + 1 + len(command) > limit:
+            batches.append(current)
+            current = ''
+        if current == '':
+            current = command
+        else:
+            current = current + ';' + command
+    if current != '':
+        batches.append(current)
+    return batches
+
+
+def read_settings(scope):
+    '''
+    This function reads every setting from the oscilloscope in a single query. If the answer can't
+    be read, an empty list is returned, which means that every setting of a profile will be sent.
+    '''
+    try:
+        return parse_settings(scope.query('*LRN?'))
+    except:
+        return []
+
+
+def restore_profile(scope, name=DEFAULT_PROFILE):
+    '''
+    This function puts the oscilloscope into the settings of a profile. Only the settings that are
+    different are sent. It returns the number of settings that were sent and the number of settings
+    in the profile.
+    '''
+    profile = load_profile(name)
+    changes = diff_profile(read_settings(scope), profile)
+    for command in batch_commands(changes):
+        scope.write(command)
+    #wait until the oscilloscope has applied all of the settings
+    scope.query('*OPC?')
+    #Now the oscilloscope holds every setting of the profile, including the ones that weren't sent
+    # because they already matched. The session only remembers what it sent, and a setting changed on
+    # the front panel would otherwise be remembered wrongly, so the session is told about all of them.
+    with scope.lock:
+        scope.settings = {}
+        for header, value in profile:
+            scope.remember(scope.join_command(header, value))
+        scope.preambles = {}
+    return len(changes), len(profile)
+
+
+def snapshot_profile(scope, name):
+    '''
+    This function saves the current settings of the oscilloscope as a profile. It returns the
+    number of settings that were saved.
+    '''
+    settings = read_settings(scope)
+    #don't overwrite the profile with nothing if the settings couldn't be read
+    if len(settings) > 0:
+        save_profile(name, settings)
+    return len(settings)
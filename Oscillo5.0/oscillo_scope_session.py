@@ -0,0 +1,430 @@
+'''
+@author Manish Roy
+
+This module contains the long-lived connection to the oscilloscope. Opening the instrument
+and sending it the collection settings takes a noticable ammount of time, so instead of doing
+this every time a waveform is collected, the connection is opened once and then shared by
+every class in the Oscillo(TM) software package. The session checks that the instrument is
+still responding before it is handed out, and it quietly reconnects if the instrument has
+crashed or been unplugged.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import the visa. This is a library that finds the oscilloscope and allows python to interact with it.
+# The simulated oscilloscope doesn't need it, so Oscillo(TM) can still be run on computers without it.
+try:
+    import visa
+except ImportError:
+    visa = None
+#Import the simulated oscilloscope. (See the oscillo_scope_simulator.py module.)
+import oscillo_scope_simulator
+#Import the operating system. This allows the name of the instrument to be set from the environment.
+import os
+#Import the threading library. The lock makes sure two threads never talk to the instrument at the same time.
+import threading
+#Import namedtuple. This is used to store the waveform preamble as a small, read-only record.
+from collections import namedtuple
+#Import the settings profiles. The settings are sent again in batches after a reconnection.
+# (See the oscillo_scope_profiles.py module.)
+import oscillo_scope_profiles as osp
+
+#This is the name of the oscilloscope that was used during development. If a new oscilloscope is being used,
+# then the name of the new oscilloscope must be discovered by running the following commands in a terminal.
+'''
+>python
+>>>import visa
+>>>rm = visa.ResourceManager()
+>>>rm.list_resources()
+'''
+#The name can also be given in the OSCILLO_SCOPE environment variable. Names that start with "SIM" open
+# the simulated oscilloscope instead of a real one, and names like "REPLAY::C:\Oscillo\DataFiles\run"
+# replay the waveforms saved in a file or folder (see the oscillo_replay.py module).
+SCOPE_RESOURCE = os.environ.get('OSCILLO_SCOPE', 'USB0::0x0699::0x0378::C011202::INSTR')
+
+#When several oscilloscopes are connected (one for each waveguide), their names can be given in the
+# OSCILLO_SCOPES environment variable, separated by commas. Otherwise they are discovered (see list_instruments).
+SCOPE_RESOURCES = os.environ.get('OSCILLO_SCOPES', '')
+
+#Other instruments (like a multimeter or a power supply) can be on the same bus. A discovered instrument
+# is only used if its answer to *IDN? starts with one of these manufacturers, and its model starts with
+# one of these model families. They can be given in the OSCILLO_SCOPE_VENDORS and OSCILLO_SCOPE_MODELS
+# environment variables, separated by commas.
+SCOPE_VENDORS = os.environ.get('OSCILLO_SCOPE_VENDORS', 'TEKTRONIX')
+SCOPE_MODELS = os.environ.get('OSCILLO_SCOPE_MODELS', 'TDS,DPO,MSO,MDO')
+
+#This query asks for all of the preamble values that are needed to convert the waveform data into volts
+# and seconds. Joining the queries with semicolons means that they are all answered in a single round trip.
+PREAMBLE_QUERY = 'WFMPRE:YMULT?;YZERO?;YOFF?;XINCR?;XZERO?'
+
+#Sending a setting whose header starts with any of these can change the preamble.
+PREAMBLE_HEADERS = ('CH', 'DATA', 'DAT:', 'WFMPRE', 'WFMO', 'HORIZONTAL', 'HOR:', 'ZOOM', 'ACQUIRE:MODE', 'ACQ:MOD')
+
+#These settings only choose which part of the record is sent by CURVE?. The preamble is always queried
+# with DATA:START at 1 (see the preamble method), so that its values describe the whole record, and so
+# changing the part that is sent doesn't require a new preamble query.
+WINDOW_HEADERS = ('DATA:START', 'DATA:STOP', 'DAT:STAR', 'DAT:STOP')
+
+#These commands change the instrument in ways that can't be tracked, so everything we knew about
+# the instrument has to be forgotten.
+RESET_HEADERS = ('*RST', 'FACTORY', '*RCL', 'RECALL:SETUP')
+
+#The preamble values of a waveform. ymult is the vertical scale factor, yzero and yoff are the vertical
+# offsets, xincr is the horizontal scale factor, and xzero is the signal trigger point.
+waveform_preamble = namedtuple('waveform_preamble', ['ymult', 'yzero', 'yoff', 'xincr', 'xzero'])
+
+#These are the sessions that have already been opened, keyed by the name of the instrument.
+sessions = {}
+#This lock protects the dictionary of sessions.
+sessions_lock = threading.Lock()
+
+
+def get_session(resource_name=SCOPE_RESOURCE):
+    '''
+    This function returns the shared session for the instrument. The session is created the first
+    time it is requested, and every request after that receives the same object.
+    '''
+    with sessions_lock:
+        #create the session if it does not exist yet
+        if resource_name not in sessions:
+            if resource_name.upper().startswith('REPLAY'):
+                #names that start with "REPLAY" replay saved waveforms instead (see the oscillo_replay.py
+                # module). It is imported here because its session is built on the scope_session class below.
+                import oscillo_replay
+                sessions[resource_name] = oscillo_replay.replay_session(resource_name)
+            else:
+                sessions[resource_name] = scope_session(resource_name)
+        #return the shared session
+        return sessions[resource_name]
+
+
+def list_instruments():
+    '''
+    This function returns the names of the oscilloscopes that should be used when collecting from
+    several instruments at once. The names in SCOPE_RESOURCES are used if there are any. Otherwise
+    the visa library is asked for every connected instrument, and the ones that aren't oscilloscopes
+    are left out (see is_oscilloscope). If none are found, the single instrument in SCOPE_RESOURCE is used.
+    '''
+    #use the instruments that were configured
+    names = [name.strip() for name in SCOPE_RESOURCES.split(',') if name.strip() != '']
+    if len(names) > 0:
+        return names
+
+    #discover the instruments that are connected
+    if visa is not None:
+        try:
+            names = [name for name in visa.ResourceManager().list_resources() if name.upper().endswith('::INSTR')]
+        except:
+            names = []
+        names = [name for name in names if is_oscilloscope(name)]
+    if len(names) == 0:
+        names = [SCOPE_RESOURCE]
+    return names
+
+
+def is_oscilloscope(resource_name):
+    '''
+    This function asks a discovered instrument who it is, and returns True if the answer to *IDN?
+    names one of the oscilloscopes in SCOPE_VENDORS and SCOPE_MODELS. An instrument that can't be
+    opened, or doesn't answer, isn't used. The session that was opened is kept for the collection.
+    '''
+    try:
+        session = get_session(resource_name)
+        session.connect()
+        fields = [field.strip().upper() for field in session.idn.split(',')]
+    except Exception as error:
+        print("The instrument {} didn't answer, so it will be skipped: {!r}".format(resource_name, error))
+        return False
+    vendors = [vendor.strip().upper() for vendor in SCOPE_VENDORS.split(',') if vendor.strip() != '']
+    models = [model.strip().upper() for model in SCOPE_MODELS.split(',') if model.strip() != '']
+    if len(fields) < 2 or not any(fields[0].startswith(vendor) for vendor in vendors) or \
+            not any(fields[1].startswith(model) for model in models):
+        print("The instrument {} ({}) isn't an oscilloscope, so it will be skipped.".format(resource_name, session.idn))
+        return False
+    return True
+
+
+def parse_preamble(response):
+    '''
+    This function converts the answer to PREAMBLE_QUERY into a waveform_preamble. The answers are
+    separated by semicolons. If the instrument has headers turned on, each answer looks like
+    ":WFMOUTPRE:YMULT 4.0E-2" instead of "4.0E-2", so only the last word of each answer is used.
+    '''
+    values = [float(item.split()[-1]) for item in response.strip().split(';')]
+    return waveform_preamble(*values)
+
+
+class scope_session():
+
+    def __init__(self, resource_name):
+        '''
+        Store the name of the instrument. The instrument is not actually opened until
+        it is needed (see the connect method below).
+        '''
+        self.resource_name = resource_name
+        self.resource_manager = None
+        self.scope = None
+        self.idn = None
+        #This dictionary remembers the last value sent for every setting, so that settings
+        # which are already in place don't need to be sent again.
+        self.settings = {}
+        #These are the preambles that have already been queried, keyed by the settings that affect
+        # the preamble. Changing the vertical scale back and forth doesn't require a new query.
+        self.preambles = {}
+        #A re-entrant lock so that a write followed by a read can't be interrupted by another thread.
+        self.lock = threading.RLock()
+        #A real instrument collects in real time, so the options that collect at a given rate wait between
+        # waveforms. Saved waveforms that are replayed don't need to wait (see the oscillo_replay.py module).
+        self.paced = True
+
+    def open(self):
+        '''
+        This method opens the instrument and asks it to identify itself. If the instrument
+        can not be found, the error from the visa library is passed on to the caller.
+        '''
+        with self.lock:
+            if self.resource_name.upper().startswith('SIM'):
+                #create the simulated oscilloscope
+                self.scope = oscillo_scope_simulator.open_resource(self.resource_name)
+            else:
+                #create the resource manager only once. It is the slowest part of opening the instrument.
+                if self.resource_manager is None:
+                    self.resource_manager = visa.ResourceManager()
+                #create the handle for the oscilloscope
+                self.scope = self.resource_manager.open_resource(self.resource_name)
+            #ask the instrument who it is. This also proves that it is responding.
+            self.idn = self.scope.query('*IDN?').strip()
+
+    def close(self):
+        '''
+        This method closes the handle for the instrument. Errors are ignored because the
+        instrument is often closed precisely because it has stopped responding.
+        '''
+        with self.lock:
+            try:
+                self.scope.close()
+            except:
+                pass
+            self.scope = None
+
+    def reconnect(self):
+        '''
+        This method closes and reopens the instrument, and then sends it every setting that had
+        been sent before. This way the methods using the session never notice that the instrument
+        was reconnected.
+        '''
+        with self.lock:
+            self.close()
+            self.open()
+            #the instrument may have been changed while it was disconnected
+            self.preambles = {}
+            #restore the settings that the instrument lost when it crashed. After a profile is restored
+            # there are hundreds of them, so they are joined into a few long commands.
+            for command in osp.batch_commands(list(self.settings.items())):
+                self.scope.write(command)
+
+    def instrument_id(self):
+        '''
+        This method returns a short name for the instrument, which is used to tag the data that comes
+        from it. This is the serial number from the answer to *IDN? (for example "C011202"), or the
+        name of the instrument if it hasn't answered yet.
+        '''
+        if self.idn is not None:
+            fields = self.idn.split(',')
+            if len(fields) > 2 and fields[2].strip() != '':
+                return fields[2].strip()
+        return self.resource_name
+
+    def check_health(self):
+        '''
+        This method is a cheap way to find out if the instrument is still responding. The
+        "*OPC?" query returns 1 once the instrument has finished all pending operations.
+        '''
+        with self.lock:
+            try:
+                return self.scope.query('*OPC?').strip() == '1'
+            except:
+                return False
+
+    def connect(self):
+        '''
+        This method makes sure that the session is ready to be used. The instrument is opened the
+        first time this method is called. Every call after that only checks the instrument's health,
+        and reconnects if the instrument has stopped responding.
+        '''
+        with self.lock:
+            if self.scope is None:
+                self.open()
+            elif not self.check_health():
+                self.reconnect()
+
+    def split_command(self, command):
+        '''
+        This method splits a command like "CH1:SCALE 5" into its header and its value.
+        '''
+        parts = command.strip().split(' ', 1)
+        header = parts[0].upper()
+        if len(parts) > 1:
+            value = parts[1].strip()
+        else:
+            value = ''
+        return header, value
+
+    def join_command(self, header, value):
+        '''
+        This method does the opposite of split_command.
+        '''
+        if value == '':
+            return header
+        return header + ' ' + value
+
+    def remember(self, command):
+        '''
+        This method records the value of a setting after it has been sent to the instrument.
+        Several settings can be joined by semicolons, like ":CH1:SCALE 5;:CH2:SCALE 1" (see the
+        oscillo_scope_profiles.py module). A header without a leading colon is relative to the
+        header before it, so ":CH1:SCALE 5;OFFSET 0" also sets CH1:OFFSET.
+        '''
+        path = ''
+        for part in command.split(';'):
+            if part.strip() == '':
+                continue
+            header, value = self.split_command(part)
+            if header.startswith(':'):
+                header = header[1:]
+            elif not header.startswith('*') and path != '':
+                header = path + header
+            if ':' in header:
+                path = header[:header.rindex(':') + 1]
+            #queries don't change anything on the instrument
+            if header.endswith('?'):
+                continue
+            #these commands return the instrument to its factory settings, so everything we
+            # knew about the instrument is no longer true.
+            if header in RESET_HEADERS:
+                self.settings = {}
+                self.preambles = {}
+                continue
+            self.settings[header] = value
+
+    def write(self, command):
+        '''
+        This method sends a command to the instrument. If the instrument has crashed, it is
+        reconnected and the command is sent again.
+        '''
+        with self.lock:
+            try:
+                self.scope.write(command)
+            except:
+                self.reconnect()
+                self.scope.write(command)
+            self.remember(command)
+
+    def query(self, command):
+        '''
+        This method sends a query to the instrument and returns the answer. If the instrument
+        has crashed, it is reconnected and the query is sent again.
+        '''
+        with self.lock:
+            try:
+                return self.scope.query(command)
+            except:
+                self.reconnect()
+                return self.scope.query(command)
+
+    def read_raw(self):
+        '''
+        This method reads the raw bytes that the instrument sends after a query. It can not be
+        retried on its own because the query that produced the bytes would be lost. Use query_raw
+        if the query should be retried.
+        '''
+        with self.lock:
+            return self.scope.read_raw()
+
+    def query_raw(self, command):
+        '''
+        This method sends a query and reads back the raw bytes of the answer. It is used to
+        retrieve the waveform data. If the instrument has crashed, it is reconnected and the
+        query is sent again.
+        '''
+        with self.lock:
+            try:
+                self.scope.write(command)
+                return self.scope.read_raw()
+            except:
+                self.reconnect()
+                self.scope.write(command)
+                return self.scope.read_raw()
+
+    def configure(self, command):
+        '''
+        This method sends a setting to the instrument only if the setting is different from
+        the one that was last sent. This makes it cheap to make sure that the instrument is
+        configured correctly before every collection.
+        '''
+        with self.lock:
+            header, value = self.split_command(command)
+            if self.settings.get(header) != value:
+                self.write(command)
+
+    def preamble_key(self):
+        '''
+        This method collects the settings that affect the preamble. Two collections with the same
+        key have the same preamble.
+        '''
+        return tuple(sorted((header, self.settings[header]) for header in self.settings
+                            if header.startswith(PREAMBLE_HEADERS) and not header.startswith(WINDOW_HEADERS)))
+
+    def preamble(self):
+        '''
+        This method returns the waveform preamble. The preamble is only queried from the instrument
+        if a setting that affects it has been sent since the last time it was queried.
+        '''
+        with self.lock:
+            key = self.preamble_key()
+            if key not in self.preambles:
+                #On some oscilloscopes (the DPO and MDO series) XZERO is the time of the first point
+                # that CURVE? sends, so it changes with DATA:START. The preamble is queried with DATA:START
+                # at 1, so that xzero is always the time of the first point of the whole record.
+                moved = []
+                if self.first_point() != 0:
+                    for header in WINDOW_HEADERS[::2]:
+                        if header in self.settings:
+                            moved.append((header, self.settings[header]))
+                            self.write(self.join_command(header, '1'))
+                self.preambles[key] = parse_preamble(self.query(PREAMBLE_QUERY))
+                #put the window back the way it was
+                for header, value in moved:
+                    self.write(self.join_command(header, value))
+            return self.preambles[key]
+
+    def first_point(self):
+        '''
+        This method returns the position in the record (counting from zero) of the first point that
+        CURVE? sends. This is the DATA:START setting, which counts from one.
+        '''
+        with self.lock:
+            for header in WINDOW_HEADERS[::2]:
+                if header in self.settings:
+                    return max(int(float(self.settings[header])) - 1, 0)
+            return 0
+
+    def data_width(self):
+        '''
+        This method returns the number of bytes that CURVE? sends for each point. This is the
+        DATA:WIDTH setting.
+        '''
+        with self.lock:
+            for header in ('DATA:WIDTH', 'DATA:WID', 'DAT:WID'):
+                if header in self.settings:
+                    return int(self.settings[header])
+            return 1
+
+    def invalidate_preamble(self):
+        '''
+        This method forgets every preamble that has been queried. It should be called if the settings
+        are changed on the front panel of the instrument, since the session can't see those changes.
+        '''
+        with self.lock:
+            self.preambles = {}
@@ -0,0 +1,431 @@
+'''
+@author Manish Roy
+
+This module contains a simulated oscilloscope. It understands the part of the oscilloscope's
+command set that Oscillo(TM) uses, and it answers the CURVE? query with a synthetic echo train
+from a waveguide whose segments can be set to any temperature. This makes it possible to run
+and time the collection options on a computer that has no oscilloscope attached.
+
+To use the simulator, set the OSCILLO_SCOPE environment variable to a name that starts with
+"SIM" (for example SIM::SCOPE1) before starting Oscillo(TM). The session (see the
+oscillo_scope_session.py module) then opens a simulated_scope instead of a real instrument.
+The simulated waveguide can be changed with the configure function below.
+
+Running this module directly collects a number of waveforms from the simulator and reports
+how many waveforms per second each collection path achieves:
+
+>python oscillo_scope_simulator.py 20
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import time. This is used to imitate the time that the instrument takes to answer.
+import time as t
+#Import the system so that the number of waveforms can be read from the command line.
+import sys
+
+#These are the options of the simulators that have been configured, keyed by the name of the instrument.
+# See the configure function below.
+instrument_options = {}
+
+#These are the options used when a simulator has not been configured. The delays are the round trip
+# times of each segment of the waveguide at the reference temperature, in seconds.
+DEFAULT_OPTIONS = {
+    #round trip time of each of the four segments at the reference temperature
+    'segment_delays': [6.0e-5, 6.0e-5, 6.0e-5, 6.0e-5],
+    #amplitude (V) of the echo from the end of each segment. The last segment is the distal end.
+    'echo_amplitudes': [0.6, 0.45, 0.35, 8.0],
+    #amplitude (V) of the initial bang
+    'bang_amplitude': 12.0,
+    #temperature ('C) of each segment, and the temperature at which segment_delays were measured
+    'temperatures': [20.0, 20.0, 20.0, 20.0],
+    'reference_temperature': 20.0,
+    #relative change in the time of flight per degree. Sound travels slower in hot metal.
+    'delay_coefficient': 1.5e-4,
+    #frequency (Hz) and width (s) of the echoes
+    'frequency': 5e6,
+    'pulse_width': 1e-6,
+    #standard deviation (V) of the noise added to every acquisition
+    'noise': 0.005,
+    #number of points in the record, time between points (s), and the trigger point (s)
+    'record_length': 1000000,
+    'xincr': 1e-9,
+    'xzero': -2e-5,
+    #number of points returned when DATA:RESOLUTION is REDUCED
+    'reduced_length': 10000,
+    #time (s) taken to answer any query, and the speed (bytes per second) of the USB link
+    'latency': 5e-4,
+    'transfer_rate': 8e6,
+    #time (s) between triggers of the pulser. Averaging on the instrument waits for this many triggers.
+    'trigger_period': 1e-3,
+    #seed for the random numbers, so that runs can be repeated
+    'seed': None,
+}
+
+#The number of vertical divisions covered by the full range of the analog-to-digital converter.
+DIVISIONS = 10.24
+
+
+def configure(resource_name, **options):
+    '''
+    This function sets the options of the simulator with the given name. Any option that is not
+    given keeps its default value (see DEFAULT_OPTIONS). It must be called before the session for
+    the simulator is opened.
+    '''
+    instrument_options[resource_name] = options
+
+
+def open_resource(resource_name):
+    '''
+    This function creates a simulator with the options that were configured for its name.
+    '''
+    return simulated_scope(resource_name, **instrument_options.get(resource_name, {}))
+
+
+class simulated_scope():
+
+    def __init__(self, resource_name, **options):
+        '''
+        Store the options of the simulator and put the simulated instrument into the state that
+        the real oscilloscope is in after its settings are restored.
+        '''
+        self.resource_name = resource_name
+        self.options = dict(DEFAULT_OPTIONS)
+        self.options.update(options)
+        self.random = np.random.RandomState(self.options['seed'])
+        #these are the settings of the simulated instrument, keyed by their full header
+        self.settings = {
+            'DATA:SOURCE': 'CH1', 'DATA:WIDTH': '1', 'DATA:ENCDG': 'RPBINARY',
+            'DATA:START': '1', 'DATA:STOP': str(self.options['record_length']),
+            'DATA:RESOLUTION': 'FULL',
+            'CH1:SCALE': '5.0', 'CH1:OFFSET': '0.0', 'CH2:SCALE': '5.0', 'CH2:OFFSET': '0.0',
+            'ACQUIRE:MODE': 'SAMPLE', 'ACQUIRE:NUMAVG': '16', 'ACQUIRE:STATE': '1',
+            'ACQUIRE:STOPAFTER': 'RUNSTOP', 'HEADER': '0',
+            'HORIZONTAL:RECORDLENGTH': str(self.options['record_length']),
+            'HORIZONTAL:FASTFRAME:STATE': '0', 'HORIZONTAL:FASTFRAME:COUNT': '2',
+            'DATA:FRAMESTART': '1', 'DATA:FRAMESTOP': '1',
+        }
+        #the answers waiting to be read
+        self.output = []
+        #the most recent acquisition (a list of frames in volts), and whether a new one is needed
+        self.acquisition = None
+        self.armed = True
+
+    '''
+    These methods give the simulator the same surface as a visa instrument.
+    '''
+
+    def write(self, command):
+        '''
+        This method accepts commands and queries. Several commands can be joined by semicolons,
+        like they can on the real instrument.
+        '''
+        t.sleep(self.options['latency'])
+        for header, value in self.split(command):
+            if header.endswith('?'):
+                self.output.append(self.answer(header[:-1]))
+            else:
+                self.set(header, value)
+
+    def read(self):
+        '''
+        This method returns the answers to the queries that were written, joined by semicolons.
+        '''
+        answer = ';'.join(str(item) for item in self.output)
+        self.output = []
+        return answer + '\n'
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def read_raw(self):
+        '''
+        This method returns the answer as bytes. The CURVE? query produces a binary block, which
+        takes time to cross the USB link.
+        '''
+        data = b''.join(item if isinstance(item, bytes) else str(item).encode() for item in self.output)
+        self.output = []
+        t.sleep(len(data) / self.options['transfer_rate'])
+        return data + b'\n'
+
+    def close(self):
+        pass
+
+    '''
+    These methods interpret the commands.
+    '''
+
+    def split(self, command):
+        '''
+        This method splits a line of commands into (header, value) pairs. On the instrument, a
+        header that does not start with a colon is relative to the previous header, so
+        "WFMPRE:YMULT?;YZERO?" means "WFMPRE:YMULT?" followed by "WFMPRE:YZERO?".
+        '''
+        pairs = []
+        path = ''
+        for part in command.split(';'):
+            part = part.strip()
+            if part == '':
+                continue
+            words = part.split(' ', 1)
+            header = words[0].upper()
+            if len(words) > 1:
+                value = words[1].strip()
+            else:
+                value = ''
+            if header.startswith(':'):
+                header = header[1:]
+            elif not header.startswith('*') and ':' not in header and path != '':
+                header = path + header
+            if ':' in header:
+                path = header[:header.rindex(':') + 1]
+            pairs.append((self.expand(header), value))
+        return pairs
+
+    def expand(self, header):
+        '''
+        This method turns the short forms of the headers that Oscillo(TM) uses into their long forms.
+        '''
+        short_forms = {'DATA:SOU': 'DATA:SOURCE', 'DATA:ENC': 'DATA:ENCDG', 'DAT': 'DATA',
+                       'WFMOUTPRE': 'WFMPRE', 'WFMO': 'WFMPRE', 'ACQ': 'ACQUIRE', 'HOR': 'HORIZONTAL',
+                       'DATA:RES': 'DATA:RESOLUTION', 'HORIZONTAL:FAST': 'HORIZONTAL:FASTFRAME',
+                       'DATA:FRAMESTAR': 'DATA:FRAMESTART', 'DATA:FRAMESTO': 'DATA:FRAMESTOP'}
+        question = header.endswith('?')
+        header = header.rstrip('?')
+        for short in short_forms:
+            if header == short or header.startswith(short + ':'):
+                header = short_forms[short] + header[len(short):]
+        if question:
+            header = header + '?'
+        return header
+
+    def set(self, header, value):
+        '''
+        This method stores a setting. Starting the acquisition arms a new trigger.
+        '''
+        if header in ('*RST', '*CLS', 'FACTORY'):
+            return
+        if header == 'DATA:ENCDG':
+            value = {'RPB': 'RPBINARY', 'RIB': 'RIBINARY'}.get(value.upper(), value.upper())
+        self.settings[header] = value
+        if header == 'ACQUIRE:STATE' and value.upper() in ('1', 'ON', 'RUN'):
+            self.armed = True
+
+    def answer(self, header):
+        '''
+        This method produces the answer to a query.
+        '''
+        if header == '*IDN':
+            return 'TEKTRONIX,SIMULATED,{},CF:91.1CT FV:v1.0'.format(self.resource_name)
+        if header == '*OPC':
+            return '1'
+        if header in ('*LRN', 'SET'):
+            return ';'.join(':{} {}'.format(key, self.settings[key]) for key in sorted(self.settings))
+        if header == 'CURVE':
+            return self.curve()
+        if header.startswith('WFMPRE:'):
+            return self.preamble()[header[len('WFMPRE:'):]]
+        return self.settings.get(header, '0')
+
+    '''
+    These methods synthesise the waveform.
+    '''
+
+    def channel(self):
+        '''
+        The channel being transferred, and its vertical scale and offset.
+        '''
+        source = self.settings['DATA:SOURCE'].split(',')[0].strip().upper()
+        scale = float(self.settings.get(source + ':SCALE', '5.0'))
+        offset = float(self.settings.get(source + ':OFFSET', '0.0'))
+        return source, scale, offset
+
+    def window(self):
+        '''
+        The first point, the number of points, and the spacing between points (in record points)
+        of the transferred data.
+        '''
+        length = self.options['record_length']
+        step = 1
+        if self.settings['DATA:RESOLUTION'].upper().startswith('RED'):
+            step = max(length // self.options['reduced_length'], 1)
+        start = min(max(int(self.settings['DATA:START']), 1), length) - 1
+        stop = min(max(int(self.settings['DATA:STOP']), 1), length)
+        count = max(len(range(start, stop, step)), 0)
+        return start, count, step
+
+    def preamble(self):
+        '''
+        The preamble values of the waveform that CURVE? returns.
+        '''
+        source, scale, offset = self.channel()
+        width = int(self.settings['DATA:WIDTH'])
+        levels = 2 ** (8 * width)
+        if self.settings['DATA:ENCDG'].upper().startswith('RP'):
+            yoff = levels / 2
+        else:
+            yoff = 0
+        start, count, step = self.window()
+        return {'YMULT': scale * DIVISIONS / levels, 'YZERO': offset, 'YOFF': yoff,
+                'XINCR': self.options['xincr'] * step, 'XZERO': self.options['xzero'],
+                'NR_PT': count, 'BYT_NR': width}
+
+    def echo_times(self):
+        '''
+        This method returns the times (after the trigger) and amplitudes of the echoes. The echo
+        train is the initial bang, an echo from the end of each segment, and then the same echoes
+        again after the sound has travelled the length of the waveguide a second time.
+        '''
+        options = self.options
+        delays = []
+        for delay, temperature in zip(options['segment_delays'], options['temperatures']):
+            delays.append(delay * (1 + options['delay_coefficient'] * (temperature - options['reference_temperature'])))
+        arrivals = np.cumsum(delays)
+        times = [0.0] + list(arrivals) + list(arrivals[-1] + arrivals)
+        amplitudes = [options['bang_amplitude']] + list(options['echo_amplitudes']) + [a * 0.7 for a in options['echo_amplitudes']]
+        return times, amplitudes
+
+    def acquire(self):
+        '''
+        This method simulates one trigger of the instrument. The result is in volts for every point
+        of the record, before the analog-to-digital conversion.
+        '''
+        options = self.options
+        length = options['record_length']
+        xincr = options['xincr']
+        signal = np.zeros(length)
+        #only the points near each echo are computed, so that the million points are quick to make
+        half_width = int(6 * options['pulse_width'] / xincr)
+        times, amplitudes = self.echo_times()
+        for arrival, amplitude in zip(times, amplitudes):
+            centre = int(round((arrival - options['xzero']) / xincr))
+            first = max(centre - half_width, 0)
+            last = min(centre + half_width, length)
+            if first >= last:
+                continue
+            tau = (np.arange(first, last) * xincr + options['xzero']) - arrival
+            signal[first:last] += amplitude * np.exp(-tau**2 / (2 * options['pulse_width']**2)) * np.sin(2 * np.pi * options['frequency'] * tau)
+        #averaging reduces the noise by the square root of the number of averages, but the instrument
+        # has to wait for that many triggers
+        noise = options['noise']
+        triggers = 1
+        mode = self.settings['ACQUIRE:MODE'].upper()
+        if mode.startswith('AVE'):
+            triggers = int(self.settings['ACQUIRE:NUMAVG'])
+            noise = noise / np.sqrt(triggers)
+        elif mode.startswith('HIR'):
+            noise = noise / 4
+        t.sleep(triggers * options['trigger_period'])
+        signal += self.random.normal(0, noise, length)
+        return signal
+
+    def fastframe(self):
+        '''
+        This method returns whether FastFrame is on, and the first frame and number of frames that
+        CURVE? sends. With FastFrame on, one sequence captures a number of frames (one per trigger),
+        and CURVE? sends all of the requested frames, one after the other, in a single block.
+        '''
+        if self.settings['HORIZONTAL:FASTFRAME:STATE'].upper() not in ('1', 'ON'):
+            return False, 0, 1
+        count = int(self.settings['HORIZONTAL:FASTFRAME:COUNT'])
+        first = min(max(int(self.settings['DATA:FRAMESTART']), 1), count) - 1
+        last = min(max(int(self.settings['DATA:FRAMESTOP']), first + 1), count)
+        return True, first, last - first
+
+    def curve(self):
+        '''
+        This method answers the CURVE? query with an IEEE 488.2 block. A new trigger (or a new set
+        of frames) is simulated unless the acquisition was stopped after a single sequence.
+        '''
+        fastframe, first, frames = self.fastframe()
+        single = self.settings['ACQUIRE:STOPAFTER'].upper().startswith('SEQ')
+        if self.acquisition is None or self.armed or not single:
+            if fastframe:
+                count = int(self.settings['HORIZONTAL:FASTFRAME:COUNT'])
+                self.acquisition = [self.acquire() for i in range(count)]
+            else:
+                self.acquisition = [self.acquire()]
+            self.armed = False
+
+        preamble = self.preamble()
+        start, count, step = self.window()
+        volts = np.concatenate([frame[start:start + count * step:step]
+                                for frame in self.acquisition[first:first + frames]])
+        #convert to the codes of the analog-to-digital converter. Signals that are too big for the
+        # vertical scale are clipped, just like on the real instrument.
+        width = preamble['BYT_NR']
+        codes = np.round((volts - preamble['YZERO']) / preamble['YMULT'] + preamble['YOFF'])
+        if preamble['YOFF'] == 0:
+            codes = np.clip(codes, -2 ** (8 * width - 1), 2 ** (8 * width - 1) - 1)
+            dtype = {1: 'i1', 2: '>i2'}[width]
+        else:
+            codes = np.clip(codes, 0, 2 ** (8 * width) - 1)
+            dtype = {1: 'u1', 2: '>u2'}[width]
+        data = codes.astype(dtype).tobytes()
+        count = str(len(data))
+        return '#{}{}'.format(len(count), count).encode() + data
+
+
+def benchmark(n):
+    '''
+    This function collects n waveforms from a simulator through each of the collection paths in
+    the oscillo_collection_functions.py module, and reports how many waveforms per second each
+    path achieves.
+    '''
+    import oscillo_collection_functions
+    import oscillo_scope_session
+
+    #the collection functions print their messages to the terminal instead of the GUI
+    cf = oscillo_collection_functions.data_collection(console_window(), console_variable())
+    resource_name = 'SIM::BENCHMARK'
+    configure(resource_name, seed=0)
+    scope = oscillo_scope_session.get_session(resource_name)
+    scope.connect()
+    buffer = cf.allocate_buffer()
+
+    paths = {'new arrays': {}, 'reused buffer': {'out': buffer},
+             'reused buffer, lazy time': {'out': buffer, 'lazy_time': True}}
+    for name in paths:
+        then = t.time()
+        for i in range(n):
+            cf.retrieve_waveform(scope, **paths[name])
+        elapsed = t.time() - then
+        print('{:>28}: {:.2f} waveforms per second'.format(name, n / elapsed))
+
+
+class console_window():
+    '''
+    This class stands in for the GUI window when Oscillo(TM) is run without a GUI.
+    '''
+
+    def update(self):
+        pass
+
+
+class console_variable():
+    '''
+    This class stands in for the message center's string variable when Oscillo(TM) is run without
+    a GUI. The messages are printed to the terminal instead.
+    '''
+
+    def __init__(self):
+        self.text = ''
+
+    def set(self, text):
+        self.text = text
+        print(text)
+
+    def get(self):
+        return self.text
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        benchmark(int(sys.argv[1]))
+    else:
+        benchmark(10)
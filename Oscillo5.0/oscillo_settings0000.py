@@ -1,654 +0,0 @@
-"""
-This module was intended to reset the 
-oscilloscope settings to the the archived
-settings
-"""
-
-def oscillo_settings(scope):
-
-
-    
-    #these are the settings for the oscilloscope
-    scope.write("SELECT:DALL 0")
-    scope.write("ACQUIRE:STOPAFTER RUNSTOP")
-    scope.write("ACQUIRE:STATE 1")
-    scope.write("ACQUIRE:MODE SAMPLE")
-    scope.write("ACQUIRE:NUMENV INFINITE")
-    scope.write("ACQUIRE:NUMAVG 16")
-    scope.write("ACQUIRE:MAGNIVU 0")
-    scope.write("HEADER 0")
-    scope.write("LOCK NONE")
-    scope.write("VERBOSE 1")
-    scope.write("MESSAGE:SHOW """)
-    scope.write("MESSAGE:BOX 101,39,101,49")
-    scope.write("MESSAGE:STATE 0")
-    scope.write("ALIAS:STATE 0")
-    scope.write("DISPLAY:COLOR:PALETTE NORMAL")
-    scope.write("DISPLAY:STYLE:DOTSONLY 0")
-    scope.write("DISPLAY:PERSISTENCE 0.0E+0")
-    scope.write("DISPLAY:CLOCK TIMEONLY")
-    scope.write("DISPLAY:FORMAT YT")
-    scope.write("DISPLAY:GRATICULE FULL")
-    scope.write("DISPLAY:INTENSITY:WAVEFORM 35")
-    scope.write("DISPLAY:INTENSITY:GRATICULE 35")
-    scope.write("DISPLAY:INTENSITY:BACKLIGHT HIGH")
-    scope.write("DISPLAY:INTENSITY:GLITCH 5")
-    scope.write("DISPLAY:GLITCH 1")
-    scope.write("DISPLAY:DIGITAL:HEIGHT MEDIUM")
-    scope.write("FILTERVU:FREQUENCY 200000000")
-    scope.write("HARDCOPY:INKSAVER 1")
-    scope.write("HARDCOPY:LAYOUT LANDSCAPE")
-    scope.write("HARDCOPY:PREVIEW 0")
-    scope.write("PICTBRIDGE:PAPERSIZE DEFLT")
-    scope.write("PICTBRIDGE:IMAGESIZE DEFLT")
-    scope.write("PICTBRIDGE:PAPERTYPE DEFLT")
-    scope.write("PICTBRIDGE:PRINTQUAL DEFLT")
-    scope.write("PICTBRIDGE:DATEPRINT DEFLT")
-    scope.write("PICTBRIDGE:IDPRINT OFF")
-    scope.write("SAVE:IMAGE:LAYOUT LANDSCAPE")
-    scope.write("SAVE:IMAGE:FILEFORMAT PNG")
-    scope.write("SAVE:IMAGE:INKSAVER 0")
-    scope.write("SAVE:WAVEFORM:FILEFORMAT SPREADSHEET")
-    scope.write("SAVE:WAVEFORM:GATING NONE")
-    scope.write("SAVE:WAVEFORM:SPREADSHEET:RESOLUTION FULL")
-    scope.write("SAVE:ASSIGN:TYPE SETUP")
-    scope.write("D0:THRESHOLD 1.4000")
-    scope.write("D1:THRESHOLD 1.4000")
-    scope.write("D2:THRESHOLD 1.4000")
-    scope.write("D3:THRESHOLD 1.4000")
-    scope.write("D4:THRESHOLD 1.4000")
-    scope.write("D5:THRESHOLD 1.4000")
-    scope.write("D6:THRESHOLD 1.4000")
-    scope.write("D7:THRESHOLD 1.4000")
-    scope.write("D8:THRESHOLD 1.4000")
-    scope.write("D9:THRESHOLD 1.4000")
-    scope.write("D10:THRESHOLD 1.4000")
-    scope.write("D11:THRESHOLD 1.4000")
-    scope.write("D12:THRESHOLD 1.4000")
-    scope.write("D13:THRESHOLD 1.4000")
-    scope.write("D14:THRESHOLD 1.4000")
-    scope.write("D15:THRESHOLD 1.4000")
-    scope.write("D0:POSITION 60.0000E-3")
-    scope.write("D1:POSITION 60.0000E-3")
-    scope.write("D2:POSITION 60.0000E-3")
-    scope.write("D3:POSITION 60.0000E-3")
-    scope.write("D4:POSITION 60.0000E-3")
-    scope.write("D5:POSITION 60.0000E-3")
-    scope.write("D6:POSITION 60.0000E-3")
-    scope.write("D7:POSITION 60.0000E-3")
-    scope.write("D8:POSITION 60.0000E-3")
-    scope.write("D9:POSITION 60.0000E-3")
-    scope.write("D10:POSITION 60.0000E-3")
-    scope.write("D11:POSITION 60.0000E-3")
-    scope.write("D12:POSITION 60.0000E-3")
-    scope.write("D13:POSITION 60.0000E-3")
-    scope.write("D14:POSITION 60.0000E-3")
-    scope.write("D15:POSITION 60.0000E-3")
-    scope.write("D0:LABEL """)
-    scope.write("D1:LABEL """)
-    scope.write("D2:LABEL """)
-    scope.write("D3:LABEL """)
-    scope.write("D4:LABEL """)
-    scope.write("D5:LABEL """)
-    scope.write("D6:LABEL """)
-    scope.write("D7:LABEL """)
-    scope.write("D8:LABEL """)
-    scope.write("D9:LABEL """)
-    scope.write("D10:LABEL """)
-    scope.write("D11:LABEL """)
-    scope.write("D12:LABEL """)
-    scope.write("D13:LABEL """)
-    scope.write("D14:LABEL """)
-    scope.write("D15:LABEL """)
-    scope.write("HORIZONTAL:POSITION 50.0000")
-    scope.write("HORIZONTAL:SCALE 100.0000E-6")
-    scope.write("HORIZONTAL:RECORDLENGTH 1000000")
-    scope.write("HORIZONTAL:DELAY:MODE 1")
-    scope.write("HORIZONTAL:DELAY:TIME 25.4000E-6")
-    scope.write("SELECT:CH1 1")
-    scope.write("SELECT:CH2 0")
-    scope.write("SELECT:CH3 0")
-    scope.write("SELECT:CH4 0")
-    scope.write("SELECT:MATH 0")
-    scope.write("SELECT:REF1 0")
-    scope.write("SELECT:REF2 0")
-    scope.write("SELECT:D0 0")
-    scope.write("SELECT:D1 0")
-    scope.write("SELECT:D2 0")
-    scope.write("SELECT:D3 0")
-    scope.write("SELECT:D4 0")
-    scope.write("SELECT:D5 0")
-    scope.write("SELECT:D6 0")
-    scope.write("SELECT:D7 0")
-    scope.write("SELECT:D8 0")
-    scope.write("SELECT:D9 0")
-    scope.write("SELECT:D10 0")
-    scope.write("SELECT:D11 0")
-    scope.write("SELECT:D12 0")
-    scope.write("SELECT:D13 0")
-    scope.write("SELECT:D14 0")
-    scope.write("SELECT:D15 0")
-    scope.write("SELECT:BUS1 0")
-    scope.write("SELECT:BUS2 0")
-    scope.write("SELECT:CONTROL CH1")
-    scope.write("CH1:AMPSVIAVOLTS:ENABLE 0")
-    scope.write("CH2:AMPSVIAVOLTS:ENABLE 0")
-    scope.write("CH3:AMPSVIAVOLTS:ENABLE 0")
-    scope.write("CH4:AMPSVIAVOLTS:ENABLE 0")
-    scope.write("CH1:AMPSVIAVOLTS:FACTOR 10.0000")
-    scope.write("CH2:AMPSVIAVOLTS:FACTOR 10.0000")
-    scope.write("CH3:AMPSVIAVOLTS:FACTOR 10.0000")
-    scope.write("CH4:AMPSVIAVOLTS:FACTOR 10.0000")
-    scope.write("CH1:PROBE:GAIN 100.0000E-3")
-    scope.write("CH2:PROBE:GAIN 100.0000E-3")
-    scope.write("CH3:PROBE:GAIN 100.0000E-3")
-    scope.write("CH4:PROBE:GAIN 100.0000E-3")
-    scope.write("CH1:PROBE:FORCEDRANGE 0.0E+0")
-    scope.write("CH2:PROBE:FORCEDRANGE 0.0E+0")
-    scope.write("CH3:PROBE:FORCEDRANGE 0.0E+0")
-    scope.write("CH4:PROBE:FORCEDRANGE 0.0E+0")
-    scope.write("CH1:BANDWIDTH 200.0000E+6")
-    scope.write("CH2:BANDWIDTH 200.0000E+6")
-    scope.write("CH3:BANDWIDTH 200.0000E+6")
-    scope.write("CH4:BANDWIDTH 200.0000E+6")
-    scope.write("CH1:COUPLING DC")
-    scope.write("CH2:COUPLING DC")
-    scope.write("CH3:COUPLING DC")
-    scope.write("CH4:COUPLING DC")
-    scope.write("CH1:DESKEW 0.0E+0")
-    scope.write("CH2:DESKEW 0.0E+0")
-    scope.write("CH3:DESKEW 0.0E+0")
-    scope.write("CH4:DESKEW 0.0E+0")
-    scope.write("CH1:OFFSET 0.0E+0")
-    scope.write("CH2:OFFSET 0.0E+0")
-    scope.write("CH3:OFFSET 0.0E+0")
-    scope.write("CH4:OFFSET 0.0E+0")
-    scope.write("CH1:INVERT 0")
-    scope.write("CH2:INVERT 0")
-    scope.write("CH3:INVERT 0")
-    scope.write("CH4:INVERT 0")
-    scope.write("CH1:POSITION 720.0000E-3")
-    scope.write("CH2:POSITION 0.0E+0")
-    scope.write("CH3:POSITION 0.0E+0")
-    scope.write("CH4:POSITION 0.0E+0")
-    scope.write("CH1:SCALE 20.0000") #
-    scope.write("CH2:SCALE 1.0000")
-    scope.write("CH3:SCALE 1.0000")
-    scope.write("CH4:SCALE 1.0000")
-    scope.write("CH1:YUNITS \"V\"")
-    scope.write("CH2:YUNITS \"V\"")
-    scope.write("CH3:YUNITS \"V\"")
-    scope.write("CH4:YUNITS \"V\"")
-    scope.write("CH1:TERMINATION 1.0000E+6")
-    scope.write("CH2:TERMINATION 1.0000E+6")
-    scope.write("CH3:TERMINATION 1.0000E+6")
-    scope.write("CH4:TERMINATION 1.0000E+6")
-    scope.write("CH1:LABEL """)
-    scope.write("CH2:LABEL """)
-    scope.write("CH3:LABEL """)
-    scope.write("CH4:LABEL """)
-    scope.write("AUXIN:PROBE:GAIN 100.0000E-3")
-    scope.write("AUXIN:PROBE:FORCEDRANGE 0.0E+0")
-    scope.write("REF1:VERTICAL:POSITION 320.0000E-3")
-    scope.write("REF2:VERTICAL:POSITION 0.0E+0")
-    scope.write("REF1:VERTICAL:SCALE 5.0000") #
-    scope.write("REF2:VERTICAL:SCALE 100.0000E-3")
-    scope.write("REF1:HORIZONTAL:DELAY:TIME 416.0000E-6")
-    scope.write("REF2:HORIZONTAL:DELAY:TIME 0.0E+0")
-    scope.write("REF1:HORIZONTAL:SCALE 4.0000E-6")
-    scope.write("REF2:HORIZONTAL:SCALE 4.0000E-6")
-    scope.write("MATH:TYPE DUAL")
-    scope.write("MATH:DEFINE \"CH1+CH2\"")
-    scope.write("MATH:VERTICAL:SCALE 100.0000E-3")
-    scope.write("MATH:VERTICAL:POSITION 0.0E+0")
-    scope.write("MATH:VERTICAL:UNITS \"V\"")
-    scope.write("MATH:HORIZONTAL:SCALE 400.0000E-6")
-    scope.write("MATH:HORIZONTAL:POSITION 50.0000")
-    scope.write("MATH:HORIZONTAL:UNITS \"s\"")
-    scope.write("MATH:SPECTRAL:MAG DB")
-    scope.write("MATH:SPECTRAL:WINDOW HANNING")
-    scope.write("MATH:SPECTRAL:GATING:INDICATORS 0")
-    scope.write("MATH:LABEL """)
-    scope.write("TRIGGER:A:MODE AUTO")
-    scope.write("TRIGGER:A:TYPE EDGE")
-    scope.write("TRIGGER:A:LEVEL 1.0000")
-    scope.write("TRIGGER:A:LEVEL:CH1 -6.4000") #
-    scope.write("TRIGGER:A:LEVEL:CH2 0.0E+0")
-    scope.write("TRIGGER:A:LEVEL:CH3 0.0E+0")
-    scope.write("TRIGGER:A:LEVEL:CH4 0.0E+0")
-    scope.write("TRIGGER:A:LEVEL:AUXIN 1.0000")
-    scope.write("TRIGGER:A:LEVEL:D0 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D1 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D2 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D3 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D4 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D5 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D6 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D7 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D8 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D9 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D10 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D11 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D12 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D13 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D14 1.4000")
-    scope.write("TRIGGER:A:LEVEL:D15 1.4000")
-    scope.write("TRIGGER:A:UPPERTHRESHOLD:CH1 4.8000") #
-    scope.write("TRIGGER:A:UPPERTHRESHOLD:CH2 1.4000")
-    scope.write("TRIGGER:A:UPPERTHRESHOLD:CH3 1.4000")
-    scope.write("TRIGGER:A:UPPERTHRESHOLD:CH4 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:CH1 -6.4000") #
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:CH2 0.0E+0")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:CH3 0.0E+0")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:CH4 0.0E+0")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:EXT 1.0000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D0 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D1 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D2 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D3 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D4 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D5 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D6 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D7 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D8 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D9 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D10 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D11 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D12 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D13 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D14 1.4000")
-    scope.write("TRIGGER:A:LOWERTHRESHOLD:D15 1.4000")
-    scope.write("TRIGGER:A:HOLDOFF:TIME 20.0000E-9") ##
-    scope.write("TRIGGER:A:EDGE:SOURCE AUX")
-    scope.write("TRIGGER:A:EDGE:COUPLING DC")
-    scope.write("TRIGGER:A:EDGE:SLOPE RISE")
-    scope.write("TRIGGER:A:LOGIC:CLASS LOGIC")
-    scope.write("TRIGGER:A:LOGIC:FUNCTION AND")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:CH1 -6.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:CH2 0.0E+0")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:CH3 0.0E+0")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:CH4 0.0E+0")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D0 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D1 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D2 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D3 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D4 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D5 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D6 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D7 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D8 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D9 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D10 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D11 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D12 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D13 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D14 1.4000")
-    scope.write("TRIGGER:A:LOGIC:THRESHOLD:D15 1.4000")
-    scope.write("TRIGGER:A:LOGIC:INPUT:CH1 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:CH2 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:CH3 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:CH4 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:CLOCK:SOURCE NONE")
-    scope.write("TRIGGER:A:LOGIC:INPUT:CLOCK:EDGE RISE")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D0 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D1 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D2 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D3 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D4 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D5 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D6 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D7 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D8 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D9 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D10 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D11 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D12 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D13 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D14 X")
-    scope.write("TRIGGER:A:LOGIC:INPUT:D15 X")
-    scope.write("TRIGGER:A:LOGIC:PATTERN:WHEN TRUE")
-    scope.write("TRIGGER:A:LOGIC:PATTERN:WHEN:LESSLIMIT 8.0000E-9")
-    scope.write("TRIGGER:A:LOGIC:PATTERN:WHEN:MORELIMIT 8.0000E-9")
-    scope.write("TRIGGER:A:LOGIC:PATTERN:DELTATIME 8.0000E-9")
-    scope.write("TRIGGER:A:SETHOLD:CLOCK:SOURCE CH1")
-    scope.write("TRIGGER:A:SETHOLD:CLOCK:EDGE RISE")
-    scope.write("TRIGGER:A:SETHOLD:CLOCK:THRESHOLD -6.4000")
-    scope.write("TRIGGER:A:SETHOLD:DATA:SOURCE NONE")
-    scope.write("TRIGGER:A:SETHOLD:DATA:THRESHOLD 9.9100E+37")
-    scope.write("TRIGGER:A:SETHOLD:HOLDTIME 2.0000E-9")
-    scope.write("TRIGGER:A:SETHOLD:SETTIME 2.0000E-9")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:CH1 -6.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:CH2 0.0E+0")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:CH3 0.0E+0")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:CH4 0.0E+0")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D0 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D1 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D2 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D3 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D4 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D5 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D6 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D7 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D8 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D9 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D10 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D11 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D12 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D13 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D14 1.4000")
-    scope.write("TRIGGER:A:SETHOLD:THRESHOLD:D15 1.4000")
-    scope.write("TRIGGER:A:PULSE:CLASS WIDTH")
-    scope.write("TRIGGER:A:PULSEWIDTH:POLARITY POSITIVE")
-    scope.write("TRIGGER:A:PULSEWIDTH:WHEN LESSTHAN")
-    scope.write("TRIGGER:A:PULSEWIDTH:WIDTH 8.0000E-9") #
-    scope.write("TRIGGER:A:RUNT:POLARITY POSITIVE")
-    scope.write("TRIGGER:A:RUNT:WHEN OCCURS")
-    scope.write("TRIGGER:A:RUNT:WIDTH 8.0000E-9")
-    scope.write("TRIGGER:A:TRANSITION:POLARITY POSITIVE")
-    scope.write("TRIGGER:A:TRANSITION:WHEN SLOWER")
-    scope.write("TRIGGER:A:TRANSITION:DELTATIME 8.0000E-9")
-    scope.write("TRIGGER:A:VIDEO:STANDARD NTSC")
-    scope.write("TRIGGER:A:VIDEO:SYNC ALLLINES")
-    scope.write("TRIGGER:A:VIDEO:LINE 1")
-    scope.write("TRIGGER:A:VIDEO:HOLDOFF:FIELD 0.0E+0")
-    scope.write("TRIGGER:A:VIDEO:POLARITY POSITIVE")
-    scope.write("TRIGGER:A:BUS:SOURCE B1")
-    scope.write("TRIGGER:A:BUS:B1:RS232C:CONDITION TXSTART")
-    scope.write("TRIGGER:A:BUS:B2:RS232C:CONDITION TXSTART")
-    scope.write("TRIGGER:A:BUS:B1:RS232C:RX:DATA:SIZE 1")
-    scope.write("TRIGGER:A:BUS:B2:RS232C:RX:DATA:SIZE 1")
-    scope.write("TRIGGER:A:BUS:B1:RS232C:RX:DATA:VALUE \"XXXXXXXX\"")
-    scope.write("TRIGGER:A:BUS:B2:RS232C:RX:DATA:VALUE \"XXXXXXXX\"")
-    scope.write("TRIGGER:A:BUS:B1:RS232C:TX:DATA:SIZE 1")
-    scope.write("TRIGGER:A:BUS:B2:RS232C:TX:DATA:SIZE 1")
-    scope.write("TRIGGER:A:BUS:B1:RS232C:TX:DATA:VALUE \"XXXXXXXX\"")
-    scope.write("TRIGGER:A:BUS:B2:RS232C:TX:DATA:VALUE \"XXXXXXXX\"")
-    scope.write("TRIGGER:A:BUS:B1:PARALLEL:VALUE \"XXXXXXXXXXXXXXXX\"")
-    scope.write("TRIGGER:A:BUS:B2:PARALLEL:VALUE \"XXXXXXXXXXXXXXXX\"")
-    scope.write("TRIGGER:EXTERNAL:PROBE 10.0000")
-    scope.write("BUS:B1:RS232C:PARITY NONE")
-    scope.write("BUS:B2:RS232C:PARITY NONE")
-    scope.write("BUS:B1:RS232C:BITRATE 9600")
-    scope.write("BUS:B2:RS232C:BITRATE 9600")
-    scope.write("BUS:B1:RS232C:POLARITY NORMAL")
-    scope.write("BUS:B2:RS232C:POLARITY NORMAL")
-    scope.write("BUS:B1:RS232C:DATABITS 8")
-    scope.write("BUS:B2:RS232C:DATABITS 8")
-    scope.write("BUS:B1:RS232C:TX:SOURCE CH1")
-    scope.write("BUS:B2:RS232C:TX:SOURCE CH1")
-    scope.write("BUS:B1:RS232C:RX:SOURCE OFF")
-    scope.write("BUS:B2:RS232C:RX:SOURCE OFF")
-    scope.write("BUS:B1:RS232C:DISPLAYMODE FRAME")
-    scope.write("BUS:B2:RS232C:DISPLAYMODE FRAME")
-    scope.write("BUS:B1:RS232C:DELIMITER LF")
-    scope.write("BUS:B2:RS232C:DELIMITER LF")
-    scope.write("BUS:B1:STATE 0")
-    scope.write("BUS:B2:STATE 0")
-    scope.write("BUS:B1:TYPE PARALLEL")
-    scope.write("BUS:B2:TYPE PARALLEL")
-    scope.write("BUS:B1:POSITION 0.0E+0")
-    scope.write("BUS:B2:POSITION 0.0E+0")
-    scope.write("BUS:B1:DISPLAY:TYPE BUS")
-    scope.write("BUS:B2:DISPLAY:TYPE BUS")
-    scope.write("BUS:B1:DISPLAY:FORMAT HEXADECIMAL")
-    scope.write("BUS:B2:DISPLAY:FORMAT HEXADECIMAL")
-    scope.write("BUS:B1:LABEL \"Parallel\"")
-    scope.write("BUS:B2:LABEL \"Parallel\"")
-    scope.write("BUS:B1:PARALLEL:WIDTH 16")
-    scope.write("BUS:B2:PARALLEL:WIDTH 16")
-    scope.write("BUS:B1:PARALLEL:CLOCK:ISCLOCKED NO")
-    scope.write("BUS:B2:PARALLEL:CLOCK:ISCLOCKED NO")
-    scope.write("BUS:B1:PARALLEL:CLOCK:SOURCE CH1")
-    scope.write("BUS:B2:PARALLEL:CLOCK:SOURCE CH1")
-    scope.write("BUS:B1:PARALLEL:CLOCK:EDGE RISING")
-    scope.write("BUS:B2:PARALLEL:CLOCK:EDGE RISING")
-    scope.write("BUS:B1:PARALLEL:BIT0:SOURCE D0")
-    scope.write("BUS:B1:PARALLEL:BIT1:SOURCE D1")
-    scope.write("BUS:B1:PARALLEL:BIT2:SOURCE D2")
-    scope.write("BUS:B1:PARALLEL:BIT3:SOURCE D3")
-    scope.write("BUS:B1:PARALLEL:BIT4:SOURCE D4")
-    scope.write("BUS:B1:PARALLEL:BIT5:SOURCE D5")
-    scope.write("BUS:B1:PARALLEL:BIT6:SOURCE D6")
-    scope.write("BUS:B1:PARALLEL:BIT7:SOURCE D7")
-    scope.write("BUS:B1:PARALLEL:BIT8:SOURCE D8")
-    scope.write("BUS:B1:PARALLEL:BIT9:SOURCE D9")
-    scope.write("BUS:B1:PARALLEL:BIT10:SOURCE D10")
-    scope.write("BUS:B1:PARALLEL:BIT11:SOURCE D11")
-    scope.write("BUS:B1:PARALLEL:BIT12:SOURCE D12")
-    scope.write("BUS:B1:PARALLEL:BIT13:SOURCE D13")
-    scope.write("BUS:B1:PARALLEL:BIT14:SOURCE D14")
-    scope.write("BUS:B1:PARALLEL:BIT15:SOURCE D15")
-    scope.write("BUS:B1:PARALLEL:BIT16:SOURCE CH1")
-    scope.write("BUS:B1:PARALLEL:BIT17:SOURCE CH2")
-    scope.write("BUS:B1:PARALLEL:BIT18:SOURCE CH3")
-    scope.write("BUS:B1:PARALLEL:BIT19:SOURCE CH4")
-    scope.write("BUS:B2:PARALLEL:BIT0:SOURCE D0")
-    scope.write("BUS:B2:PARALLEL:BIT1:SOURCE D1")
-    scope.write("BUS:B2:PARALLEL:BIT2:SOURCE D2")
-    scope.write("BUS:B2:PARALLEL:BIT3:SOURCE D3")
-    scope.write("BUS:B2:PARALLEL:BIT4:SOURCE D4")
-    scope.write("BUS:B2:PARALLEL:BIT5:SOURCE D5")
-    scope.write("BUS:B2:PARALLEL:BIT6:SOURCE D6")
-    scope.write("BUS:B2:PARALLEL:BIT7:SOURCE D7")
-    scope.write("BUS:B2:PARALLEL:BIT8:SOURCE D8")
-    scope.write("BUS:B2:PARALLEL:BIT9:SOURCE D9")
-    scope.write("BUS:B2:PARALLEL:BIT10:SOURCE D10")
-    scope.write("BUS:B2:PARALLEL:BIT11:SOURCE D11")
-    scope.write("BUS:B2:PARALLEL:BIT12:SOURCE D12")
-    scope.write("BUS:B2:PARALLEL:BIT13:SOURCE D13")
-    scope.write("BUS:B2:PARALLEL:BIT14:SOURCE D14")
-    scope.write("BUS:B2:PARALLEL:BIT15:SOURCE D15")
-    scope.write("BUS:B2:PARALLEL:BIT16:SOURCE CH1")
-    scope.write("BUS:B2:PARALLEL:BIT17:SOURCE CH2")
-    scope.write("BUS:B2:PARALLEL:BIT18:SOURCE CH3")
-    scope.write("BUS:B2:PARALLEL:BIT19:SOURCE CH4")
-    scope.write("BUS:LOWERTHRESHOLD:CH1 -6.4000")
-    scope.write("BUS:LOWERTHRESHOLD:CH2 0.0E+0")
-    scope.write("BUS:LOWERTHRESHOLD:CH3 0.0E+0")
-    scope.write("BUS:LOWERTHRESHOLD:CH4 0.0E+0")
-    scope.write("BUS:UPPERTHRESHOLD:CH1 4.8000")
-    scope.write("BUS:UPPERTHRESHOLD:CH2 1.4000")
-    scope.write("BUS:UPPERTHRESHOLD:CH3 1.4000")
-    scope.write("BUS:UPPERTHRESHOLD:CH4 1.4000")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B1:RS232C:CONDITION TXSTART")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B2:RS232C:CONDITION TXSTART")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B1:RS232C:RX:DATA:SIZE 1")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B2:RS232C:RX:DATA:SIZE 1")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B1:RS232C:RX:DATA:VALUE \"XXXXXXXX\"")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B2:RS232C:RX:DATA:VALUE \"XXXXXXXX\"")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B1:RS232C:TX:DATA:SIZE 1")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B2:RS232C:TX:DATA:SIZE 1")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B1:RS232C:TX:DATA:VALUE \"XXXXXXXX\"")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B2:RS232C:TX:DATA:VALUE \"XXXXXXXX\"")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B1:PARALLEL:VALUE \"XXXXXXXXXXXXXXXX\"")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:B2:PARALLEL:VALUE \"XXXXXXXXXXXXXXXX\"")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:BUS:SOURCE B1")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:TYPE EDGE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LEVEL 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LEVEL:CH1 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LEVEL:CH2 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LEVEL:CH3 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LEVEL:CH4 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LEVEL:MATH 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LEVEL:REF1 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LEVEL:REF2 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:UPPERTHRESHOLD:CH1 1.6000")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:UPPERTHRESHOLD:CH2 1.4000")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:UPPERTHRESHOLD:CH3 1.4000")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:UPPERTHRESHOLD:CH4 1.4000")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:UPPERTHRESHOLD:MATH 492.0000E-3")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:UPPERTHRESHOLD:REF1 1.4000")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:UPPERTHRESHOLD:REF2 492.0000E-3")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOWERTHRESHOLD:CH1 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOWERTHRESHOLD:CH2 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOWERTHRESHOLD:CH3 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOWERTHRESHOLD:CH4 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOWERTHRESHOLD:MATH 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOWERTHRESHOLD:REF1 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOWERTHRESHOLD:REF2 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:EDGE:SOURCE CH1")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:EDGE:SLOPE RISE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:FUNCTION AND")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:THRESHOLD:CH1 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:THRESHOLD:CH2 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:THRESHOLD:CH3 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:THRESHOLD:CH4 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:THRESHOLD:MATH 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:THRESHOLD:REF1 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:THRESHOLD:REF2 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:CH1 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:CH2 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:CH3 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:CH4 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:MATH X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:REF1 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:REF2 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:REF3 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:REF4 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:CLOCK:SOURCE NONE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:CLOCK:EDGE RISE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D0 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D1 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D2 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D3 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D4 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D5 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D6 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D7 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D8 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D9 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D10 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D11 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D12 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D13 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D14 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:INPUT:D15 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:CH1 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:CH2 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:CH3 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:CH4 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:MATH X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:REF1 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:REF2 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:REF3 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:REF4 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D0 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D1 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D2 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D3 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D4 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D5 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D6 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D7 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D8 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D9 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D10 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D11 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D12 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D13 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D14 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:INPUT:D15 X")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:WHEN TRUE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:WHEN:LESSLIMIT 8.0000E-9")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:LOGIC:PATTERN:WHEN:MORELIMIT 8.0000E-9")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:PULSEWIDTH:POLARITY POSITIVE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:PULSEWIDTH:WHEN LESSTHAN")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:PULSEWIDTH:WIDTH 8.0000E-9")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:RUNT:POLARITY POSITIVE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:RUNT:WHEN OCCURS")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:RUNT:WIDTH 8.0000E-9")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:TRANSITION:POLARITY POSITIVE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:TRANSITION:WHEN SLOWER")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:TRANSITION:DELTATIME 8.0000E-9")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:CLOCK:SOURCE CH1")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:CLOCK:EDGE RISE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:CLOCK:THRESHOLD 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:DATA:SOURCE NONE")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:DATA:THRESHOLD 9.9100E+37")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:HOLDTIME 2.0000E-9")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:SETTIME 2.0000E-9")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:THRESHOLD:CH1 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:THRESHOLD:CH2 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:THRESHOLD:CH3 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:THRESHOLD:CH4 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:THRESHOLD:MATH 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:THRESHOLD:REF1 0.0E+0")
-    scope.write("SEARCH:SEARCH1:TRIGGER:A:SETHOLD:THRESHOLD:REF2 0.0E+0")
-    scope.write("SEARCH:SEARCH1:STATE 0")
-    scope.write("ZOOM:MODE 1")
-    scope.write("ZOOM:ZOOM1:STATE 1")
-    scope.write("ZOOM:ZOOM1:SCALE 4.0000E-6")
-    scope.write("ZOOM:ZOOM1:POSITION 49.1400")
-    scope.write("ZOOM:ZOOM1:HORIZONTAL:POSITION 49.1400") #
-    scope.write("ZOOM:ZOOM1:HORIZONTAL:SCALE 4.0000E-6")
-    scope.write("CURSOR:FUNCTION OFF")
-    scope.write("CURSOR:MODE INDEPENDENT")
-    scope.write("CURSOR:VBARS:POSITION1 0.0E+0")
-    scope.write("CURSOR:VBARS:POSITION2 0.0E+0")
-    scope.write("CURSOR:VBARS:UNITS SECONDS")
-    scope.write("CURSOR:HBARS:POSITION1 0.0E+0")
-    scope.write("CURSOR:HBARS:POSITION2 0.0E+0")
-    scope.write("CURSOR:HBARS:UNITS BASE")
-    scope.write("CURSOR:XY:READOUT RECTANGULAR")
-    scope.write("CURSOR:XY:RECTANGULAR:X:POSITION1 0.0E+0")
-    scope.write("CURSOR:XY:RECTANGULAR:X:POSITION2 0.0E+0")
-    scope.write("CURSOR:XY:RECTANGULAR:Y:POSITION1 0.0E+0")
-    scope.write("CURSOR:XY:RECTANGULAR:Y:POSITION2 0.0E+0")
-    scope.write("MEASUREMENT:IMMED:DELAY:DIRECTION FORWARDS")
-    scope.write("MEASUREMENT:IMMED:DELAY:EDGE1 RISE")
-    scope.write("MEASUREMENT:IMMED:DELAY:EDGE2 RISE")
-    scope.write("MEASUREMENT:IMMED:TYPE PERIOD")
-    scope.write("MEASUREMENT:IMMED:SOURCE1 CH1")
-    scope.write("MEASUREMENT:IMMED:SOURCE2 CH2")
-    scope.write("MEASUREMENT:MEAS1:DELAY:DIRECTION FORWARDS")
-    scope.write("MEASUREMENT:MEAS2:DELAY:DIRECTION FORWARDS")
-    scope.write("MEASUREMENT:MEAS3:DELAY:DIRECTION FORWARDS")
-    scope.write("MEASUREMENT:MEAS4:DELAY:DIRECTION FORWARDS")
-    scope.write("MEASUREMENT:MEAS1:DELAY:EDGE1 RISE")
-    scope.write("MEASUREMENT:MEAS1:DELAY:EDGE2 RISE")
-    scope.write("MEASUREMENT:MEAS2:DELAY:EDGE1 RISE")
-    scope.write("MEASUREMENT:MEAS2:DELAY:EDGE2 RISE")
-    scope.write("MEASUREMENT:MEAS3:DELAY:EDGE1 RISE")
-    scope.write("MEASUREMENT:MEAS3:DELAY:EDGE2 RISE")
-    scope.write("MEASUREMENT:MEAS4:DELAY:EDGE1 RISE")
-    scope.write("MEASUREMENT:MEAS4:DELAY:EDGE2 RISE")
-    scope.write("MEASUREMENT:MEAS1:TYPE PERIOD")
-    scope.write("MEASUREMENT:MEAS2:TYPE PERIOD")
-    scope.write("MEASUREMENT:MEAS3:TYPE PERIOD")
-    scope.write("MEASUREMENT:MEAS4:TYPE PERIOD")
-    scope.write("MEASUREMENT:MEAS1:SOURCE1 CH1")
-    scope.write("MEASUREMENT:MEAS1:SOURCE2 CH2")
-    scope.write("MEASUREMENT:MEAS2:SOURCE1 CH1")
-    scope.write("MEASUREMENT:MEAS2:SOURCE2 CH2")
-    scope.write("MEASUREMENT:MEAS3:SOURCE1 CH1")
-    scope.write("MEASUREMENT:MEAS3:SOURCE2 CH2")
-    scope.write("MEASUREMENT:MEAS4:SOURCE1 CH1")
-    scope.write("MEASUREMENT:MEAS4:SOURCE2 CH2")
-    scope.write("MEASUREMENT:MEAS1:STATE 0")
-    scope.write("MEASUREMENT:MEAS2:STATE 0")
-    scope.write("MEASUREMENT:MEAS3:STATE 0")
-    scope.write("MEASUREMENT:MEAS4:STATE 0")
-    scope.write("MEASUREMENT:METHOD AUTO")
-    scope.write("MEASUREMENT:REFLEVEL:METHOD PERCENT")
-    scope.write("MEASUREMENT:REFLEVEL:ABSOLUTE:HIGH 0.0E+0")
-    scope.write("MEASUREMENT:REFLEVEL:ABSOLUTE:LOW 0.0E+0")
-    scope.write("MEASUREMENT:REFLEVEL:ABSOLUTE:MID1 0.0E+0")
-    scope.write("MEASUREMENT:REFLEVEL:ABSOLUTE:MID2 0.0E+0")
-    scope.write("MEASUREMENT:REFLEVEL:PERCENT:HIGH 90.0000")
-    scope.write("MEASUREMENT:REFLEVEL:PERCENT:LOW 10.0000")
-    scope.write("MEASUREMENT:REFLEVEL:PERCENT:MID1 50.0000")
-    scope.write("MEASUREMENT:REFLEVEL:PERCENT:MID2 50.0000")
-    scope.write("MEASUREMENT:INDICATORS:STATE OFF")
-    scope.write("MEASUREMENT:STATISTICS:MODE ALL")
-    scope.write("MEASUREMENT:STATISTICS:WEIGHTING 32")
-    scope.write("MEASUREMENT:GATING SCREEN")
-    scope.write("DATA:DESTINATION REF1")
-    scope.write("DATA:ENCDG RPBINARY") #this line used to say RIBINARY. That won't work for python collection
-    scope.write("DATA:SOURCE CH1")
-    scope.write("DATA:START 1")
-    scope.write("DATA:STOP 1000000") # increased to 1 million (just added a zero) MJ
-    scope.write("DATA:RESOLUTION FULL")
-    scope.write("DATA:COMPOSITION COMPOSITE_YT")
-    
-
-    print("Oscilloscope returned to original settings.")
@@ -0,0 +1,256 @@
+'''
+@author Manish Roy
+
+This module finds the width (sigma) of the gaussian that the envelope of a waveform is convolved with
+(see gausian_convolution in the oscillo_data_processing_functions.py module). There is an ideal
+ammount of filtering that produces a consistent number of peaks, and it is different every time the
+instrument is turned on and the transducer is replaced. A narrow gaussian leaves the noise in, so the
+convolution has too many peaks, and a wide one merges the real peaks together, so the number of peaks
+falls as sigma grows. The values of sigma that give the number of peaks that is wanted are a plateau,
+and the best sigma is well inside it.
+
+sigma used to be found by stepping it .001 at a time until the number of peaks had been right for a
+long enough stretch, which took thousands of convolutions, and never stopped if the number of peaks
+was never right. The sigma_tuner class brackets the two edges of the plateau and then narrows both
+brackets together. Every step computes the convolutions for a set of values of sigma at once, with a
+filter bank (see gaussian_filter_bank), and the number of steps is limited. The tuner also reports how
+confident it is, from how wide the plateau it found is.
+
+The sigma that is found for each waveguide and transducer is kept in a JSON file (see SIGMA_CACHE),
+and the next search for the same waveguide and transducer starts from it, so it only has to check
+that the plateau hasn't moved.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import the operating system. This is used to read the settings of the tuner from the environment.
+import os
+#Import json. The sigma cache is a JSON dictionary.
+import json
+#Import the threading library. The sigma cache can be used from the processing threads.
+import threading
+#Import time. Each sigma in the cache is stored with the time that it was found.
+import time as t
+#Import the reference library. The sigma cache is written the same way as the reference peaks.
+# (See the oscillo_reference_library.py module.)
+import oscillo_reference_library as orl
+
+#This is the file that holds the values of sigma that were found before.
+SIGMA_CACHE = os.environ.get('OSCILLO_SIGMA_CACHE', 'sigma_cache.json')
+
+#This is the largest number of filter banks that a search computes.
+TUNER_BUDGET = int(os.environ.get('OSCILLO_TUNER_BUDGET', '16'))
+#This is the number of values of sigma in each filter bank.
+TUNER_POINTS = int(os.environ.get('OSCILLO_TUNER_POINTS', '16'))
+
+#These are the smallest and largest values of sigma that are tried. The gaussian is drawn on a domain
+# from -100 to 100, so a wider one isn't a gaussian any more.
+MIN_SIGMA = .001
+MAX_SIGMA = 100.
+
+#This is the sigma cache that is shared by all of the collection options (see get_sigma_cache).
+shared_sigma_cache = None
+#This lock protects the shared sigma cache while it is created.
+sigma_cache_lock = threading.Lock()
+
+
+def get_sigma_cache():
+    '''
+    This function returns the shared sigma cache. The cache is created the first time it is
+    requested, and every request after that receives the same object.
+    '''
+    global shared_sigma_cache
+    with sigma_cache_lock:
+        if shared_sigma_cache is None:
+            shared_sigma_cache = sigma_cache()
+        return shared_sigma_cache
+
+
+def sigma_key(metal, DL, freq, gain, instrument, segment=''):
+    '''
+    This function returns the key of a sigma in the cache. The waveguide is named by its metal and
+    delay line, and the transducer by its frequency and gain and the instrument it is connected to.
+    segment names the part of the waveform, when the parts are filtered separately.
+    '''
+    return "{}|{}|{}|{}|{}|{}".format(metal, DL, freq, gain, instrument, segment)
+
+
+class sigma_cache():
+
+    def __init__(self, file_name=SIGMA_CACHE):
+        '''
+        This class holds the values of sigma that were found before. file_name is the JSON file that
+        they are kept in. It is read when the cache is first used.
+        '''
+        self.file_name = file_name
+        self.lock = threading.Lock()
+        self.entries = None
+
+    def load(self):
+        '''
+        This method reads the file, if it hasn't been read yet. A file that can't be read is ignored,
+        since the values of sigma can always be found again.
+        '''
+        if self.entries is None:
+            self.entries = {}
+            if os.path.exists(self.file_name):
+                try:
+                    with open(self.file_name) as cache_file:
+                        self.entries = json.load(cache_file)
+                except ValueError:
+                    print("The sigma cache {} can't be read, so it will be replaced.".format(self.file_name))
+
+    def get(self, key):
+        '''
+        This method returns the entry for a key (a dictionary with the sigma, the edges of its plateau
+        and the confidence), or None if there isn't one.
+        '''
+        with self.lock:
+            self.load()
+            return self.entries.get(key)
+
+    def put(self, key, tuned):
+        '''
+        This method stores what a search found (a tuned_sigma object) for a key, and writes the file.
+        '''
+        with self.lock:
+            self.load()
+            self.entries[key] = {'sigma': tuned.sigma, 'low': tuned.low, 'high': tuned.high,
+                                 'confidence': tuned.confidence, 'time': t.time()}
+            mystring = json.dumps(self.entries, indent=1, sort_keys=True)
+            orl.write_atomically(self.file_name, lambda open_file: open_file.write(mystring.encode()))
+
+
+class tuned_sigma():
+
+    def __init__(self, sigma, low, high, confidence, evaluations):
+        '''
+        This class holds the result of a search. sigma is the value to use, low and high are the edges
+        of the plateau that were found (or None), confidence is between 0 (the number of peaks was never
+        right) and 1 (the plateau is at least as wide as was asked for), and evaluations is the number of
+        filter banks that were computed.
+        '''
+        self.sigma = sigma
+        self.low = low
+        self.high = high
+        self.confidence = confidence
+        self.evaluations = evaluations
+
+    def __repr__(self):
+        return "tuned_sigma(sigma={:.4f}, plateau={}..{}, confidence={:.2f}, evaluations={})".format(
+            self.sigma, self.low, self.high, self.confidence, self.evaluations)
+
+
+class sigma_tuner():
+
+    def __init__(self, odf, threshold=0, mindist=0, budget=TUNER_BUDGET, points=TUNER_POINTS, cache=None):
+        '''
+        odf is a data_process object, which computes the filter banks. threshold and mindist are used to
+        find the peaks of each convolution (see gausian_convolution). budget is the largest number of
+        filter banks that a search computes, and points is the number of values of sigma in each of
+        them. The shared sigma cache is used unless another one is given.
+        '''
+        self.odf = odf
+        self.threshold = threshold
+        self.mindist = mindist
+        self.budget = budget
+        self.points = points
+        if cache is None:
+            cache = get_sigma_cache()
+        self.cache = cache
+
+    def tune(self, envelope, count, start, width, resolution=.001, key=None):
+        '''
+        This method returns the sigma (a tuned_sigma object) that gives count peaks in the convolution
+        of the envelope. The search starts around start, or around the sigma found before if a key is
+        given and the cache has it. width is how wide (in sigma) the plateau should be for the sigma to
+        be trusted, and the edges of the plateau are found to within resolution. The sigma that is
+        chosen is in the middle of the plateau, but no further than width above its lower edge.
+        '''
+        #the number of peaks of every sigma that has been tried
+        samples = {}
+
+        def evaluate(sigmas):
+            sigmas = [float(sigma) for sigma in np.unique(np.clip(sigmas, MIN_SIGMA, MAX_SIGMA)) if float(sigma) not in samples]
+            if len(sigmas) > 0:
+                counts = self.odf.gaussian_filter_bank(envelope, sigmas, self.threshold, self.mindist)
+                samples.update(zip(sigmas, (int(n) for n in counts)))
+
+        def brackets():
+            #the lower edge of the plateau is between the first sigma that doesn't have too many peaks
+            # and the sigma before it. The upper edge is between the first sigma after that with too few
+            # peaks and the sigma before it. A gaussian much wider than the peaks is almost flat, and its
+            # convolution can have many small peaks again, so only the first edges are used.
+            sigmas = sorted(samples)
+            low_inside = next((sigma for sigma in sigmas if samples[sigma] <= count), None)
+            if low_inside is None:
+                return sigmas[-1], None, None, None
+            low_outside = max([sigma for sigma in sigmas if sigma < low_inside], default=None)
+            high_outside = next((sigma for sigma in sigmas if sigma > low_inside and samples[sigma] < count), None)
+            high_inside = max(sigma for sigma in sigmas if sigma >= low_inside and (high_outside is None or sigma < high_outside))
+            if samples[low_inside] < count:
+                #the number of peaks jumps past count, so there is no plateau
+                high_inside = None
+                high_outside = low_inside
+            return low_outside, low_inside, high_inside, high_outside
+
+        #start from the sigma that was found before. The plateau usually hasn't moved far, so the
+        # first filter bank is spread over a narrower range.
+        cached = self.cache.get(key) if key is not None else None
+        if cached is not None:
+            start = cached['sigma']
+            octaves = 1.
+        else:
+            octaves = 3.
+
+        #bracket both edges of the plateau. The first filter bank is spread evenly in log(sigma) around
+        # start, and the next ones go further down or up until both edges are inside them.
+        start = float(np.clip(start, MIN_SIGMA, MAX_SIGMA))
+        evaluate(start * 2 ** np.linspace(-octaves, octaves, self.points))
+        evaluations = 1
+        while evaluations < self.budget:
+            low_outside, low_inside, high_inside, high_outside = brackets()
+            if low_outside is None and min(samples) > MIN_SIGMA:
+                evaluate(min(samples) * 2 ** np.linspace(-2 * octaves, 0, self.points + 1)[:-1])
+            elif high_outside is None and max(samples) < MAX_SIGMA:
+                evaluate(max(samples) * 2 ** np.linspace(0, 2 * octaves, self.points + 1)[1:])
+            else:
+                break
+            evaluations += 1
+
+        #narrow both brackets together. Each filter bank puts half of its values of sigma inside each
+        # bracket that is still wider than the resolution.
+        while evaluations < self.budget:
+            low_outside, low_inside, high_inside, high_outside = brackets()
+            sigmas = []
+            for outside, inside in ((low_outside, low_inside), (high_inside, high_outside)):
+                if outside is not None and inside is not None and abs(inside - outside) > resolution:
+                    sigmas.extend(np.linspace(outside, inside, self.points // 2 + 2)[1:-1])
+            if len(sigmas) == 0:
+                break
+            evaluate(sigmas)
+            evaluations += 1
+
+        low_outside, low_inside, high_inside, high_outside = brackets()
+        on_target = [sigma for sigma in sorted(samples) if samples[sigma] == count]
+        if len(on_target) == 0 or low_inside is None or high_inside is None or low_inside > high_inside:
+            #the number of peaks is never right. The sigma with the closest number of peaks is used, but
+            # it can't be trusted.
+            sigma = min(samples, key=lambda value: (abs(samples[value] - count), value))
+            tuned = tuned_sigma(sigma, None, None, 0., evaluations)
+        else:
+            plateau = high_inside - low_inside
+            sigma = low_inside + min(plateau / 2, width)
+            #the number of peaks should be right everywhere on the plateau. If some of the values of
+            # sigma on it gave another number of peaks, the number of peaks isn't falling steadily.
+            inside = [samples[value] == count for value in samples if low_inside <= value <= high_inside]
+            steady = sum(inside) / len(inside)
+            tuned = tuned_sigma(sigma, low_inside, high_inside, min(1., plateau / width) * steady, evaluations)
+
+        if key is not None and tuned.confidence > 0:
+            self.cache.put(key, tuned)
+        return tuned
@@ -0,0 +1,147 @@
+'''
+@author Manish Roy
+
+This module contains the binary waveform file format (".osc" files). Saving waveforms as text,
+with a time column and a volts column, made the files large and the saving slow, because every
+number had to be formatted as text. An .osc file stores the raw codes of the analog-to-digital
+converter instead (one or two bytes per point), together with the preamble values that are needed
+to turn them back into volts and seconds, and the parameters of the collection.
+
+The layout of an .osc file is:
+
+    8 bytes     the magic string b"OSCWFM1\n"
+    4 bytes     the length of the header, as a little-endian unsigned integer
+    header      a JSON dictionary (see write_waveform below), padded with spaces so that the
+                data starts on a multiple of 16 bytes
+    data        the codes, one after the other, in the format given by the header's "dtype"
+
+Because the data is stored as it is, it can be read with memory mapping (see open_waveform), so
+only the parts of a waveform that are actually used are read from the disk.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import json. The header of each file is stored as a JSON dictionary.
+import json
+#Import struct. This is used to write the length of the header as raw bytes.
+import struct
+
+#This is at the start of every .osc file.
+MAGIC = b'OSCWFM1\n'
+
+#This is the file extension of the binary waveform files.
+EXTENSION = '.osc'
+
+#The data starts on a multiple of this many bytes, so that it can be memory mapped efficiently.
+ALIGNMENT = 16
+
+
+def volts_to_codes(volts, ymult, yzero, yoff):
+    '''
+    This function undoes the scaling done by retrieve_waveform, and recovers the codes of the
+    analog-to-digital converter. The codes are stored in the smallest type that holds them
+    exactly. Averaged waveforms have codes that aren't whole numbers, so they are stored as
+    32-bit floats.
+    '''
+    codes = (np.asarray(volts, dtype=np.float64) - yzero) / ymult + yoff
+    rounded = np.round(codes)
+    #check if the codes are whole numbers
+    if len(codes) > 0 and np.max(np.abs(codes - rounded)) < 1e-3:
+        low = rounded.min()
+        high = rounded.max()
+        for dtype in ('u1', 'i1', '<u2', '<i2'):
+            limits = np.iinfo(np.dtype(dtype))
+            if low >= limits.min and high <= limits.max:
+                return rounded.astype(dtype)
+    return codes.astype('<f4')
+
+
+def write_waveform(file_name, codes, ymult, yzero, yoff, xincr, xzero, first_point=0, parameters=None):
+    '''
+    This function writes the codes and the preamble values to an .osc file. first_point is the
+    position in the oscilloscope's record of the first code, so that the time axis can be
+    rebuilt exactly (see the time_axis class in the oscillo_collection_functions.py module).
+    parameters is a dictionary of anything else that should be kept with the waveform, like
+    the waveguide material, the gain, and the time stamp.
+    '''
+    codes = np.ascontiguousarray(codes)
+    with open(file_name, 'wb') as osc_file:
+        write_header(osc_file, codes.dtype, len(codes), ymult, yzero, yoff, xincr, xzero, first_point, parameters)
+        osc_file.write(codes.tobytes())
+
+
+def write_header(osc_file, dtype, count, ymult, yzero, yoff, xincr, xzero, first_point=0, parameters=None):
+    '''
+    This function writes the magic string and the header of an .osc file to an open file. The count
+    codes of the given dtype must be written after it. write_waveform uses it, and so does anything
+    that writes the codes a piece at a time (see the oscillo_migration.py module).
+    '''
+    header = {'dtype': np.dtype(dtype).str, 'count': int(count),
+              'ymult': float(ymult), 'yzero': float(yzero), 'yoff': float(yoff),
+              'xincr': float(xincr), 'xzero': float(xzero), 'first_point': int(first_point),
+              'parameters': parameters or {}}
+    header = json.dumps(header).encode()
+    #pad the header so that the data is aligned
+    used = len(MAGIC) + 4 + len(header)
+    header = header + b' ' * (-used % ALIGNMENT)
+
+    osc_file.write(MAGIC)
+    osc_file.write(struct.pack('<I', len(header)))
+    osc_file.write(header)
+
+
+def read_header(osc_file):
+    '''
+    This function reads the header of an open .osc file, and returns the header dictionary and
+    the position of the data in the file.
+    '''
+    magic = osc_file.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ValueError("{} is not an .osc waveform file".format(osc_file.name))
+    length = struct.unpack('<I', osc_file.read(4))[0]
+    header = json.loads(osc_file.read(length).decode())
+    return header, len(MAGIC) + 4 + length
+
+
+def open_waveform(file_name):
+    '''
+    This function opens an .osc file without reading its data. It returns the header dictionary
+    and the codes as a memory mapped array, which reads from the disk only when it is used.
+    '''
+    with open(file_name, 'rb') as osc_file:
+        header, offset = read_header(osc_file)
+    if header['count'] == 0:
+        return header, np.zeros(0, dtype=header['dtype'])
+    codes = np.memmap(file_name, dtype=np.dtype(header['dtype']), mode='r', offset=offset, shape=(header['count'],))
+    return header, codes
+
+
+def codes_to_volts(codes, header):
+    '''
+    This function scales the codes to volts, the same way that retrieve_waveform does.
+    '''
+    volts = np.subtract(codes, header['yoff'], dtype=np.float64)
+    volts *= header['ymult']
+    volts += header['yzero']
+    return volts
+
+
+def waveform_time(header):
+    '''
+    This function rebuilds the time axis of a waveform. As in retrieve_waveform, the time is
+    measured from the start of the oscilloscope's record.
+    '''
+    return (header['first_point'] + np.arange(header['count'])) * header['xincr']
+
+
+def load_waveform(file_name):
+    '''
+    This function reads an .osc file and returns the time and volts arrays and the header
+    dictionary (which holds xzero, xincr, and the parameters of the collection).
+    '''
+    header, codes = open_waveform(file_name)
+    return waveform_time(header), codes_to_volts(codes, header), header
@@ -0,0 +1,92 @@
+"""
+@author Manish Roy
+
+This module loads the averaged waveform files (".avg" files) that the dashboard compares. An .avg
+file is text, with the time and the amplitude of one point on each line. Reading it one line at a
+time with float() was the slowest part of starting the dashboard, so the whole file is now parsed
+at once with numpy. The parsed data is then saved next to the .avg file as a binary sidecar (the
+same name with ".npy" added), and later loads memory map the sidecar instead of parsing the text.
+"""
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import numpy. This library contains many methods used in vectorized calculations, and other
+# operations involving arrays.
+import numpy as np
+#Import the operating system. This is used to check if the sidecar is older than the .avg file.
+import os
+
+#This is where the dashboard cuts off the waveforms (in seconds). The points after it aren't used.
+END_TIME = 0.000572
+
+#This is added to the name of an .avg file to name its sidecar.
+SIDECAR_EXTENSION = '.npy'
+
+
+def sidecar_path(filepath):
+    '''
+    This function returns the name of the sidecar of an .avg file.
+    '''
+    return filepath + SIDECAR_EXTENSION
+
+
+def parse_avg(filepath):
+    '''
+    This function parses an .avg file into an array with one row for each point, and one column
+    for each number on a line (the time and the amplitude).
+    '''
+    with open(filepath) as avg_file:
+        first_line = avg_file.readline()
+        rest = avg_file.read()
+    columns = len(first_line.split())
+    if columns == 0:
+        return np.zeros((0, 2))
+    #let numpy read all of the numbers at once. Any whitespace (including the line breaks) separates them.
+    values = np.fromstring(first_line + rest, dtype=np.float64, sep=' ')
+    return values.reshape(-1, columns)
+
+
+def read_avg(filepath):
+    '''
+    This function returns the data of an .avg file, as parse_avg does. If the sidecar is up to date,
+    it is memory mapped. Otherwise the .avg file is parsed, and the sidecar is written for next time.
+    '''
+    sidecar = sidecar_path(filepath)
+    if os.path.exists(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(filepath):
+        try:
+            return np.load(sidecar, mmap_mode='r')
+        except (ValueError, OSError):
+            #the sidecar is damaged, so it is written again below
+            pass
+
+    data = parse_avg(filepath)
+    try:
+        #write to a temporary file first, so that a half written sidecar is never loaded
+        temporary = sidecar + '.tmp'
+        with open(temporary, 'wb') as sidecar_file:
+            np.save(sidecar_file, data)
+        os.replace(temporary, sidecar)
+    except OSError:
+        #the sidecar is only a speed up, so the data is still returned if it can't be written
+        pass
+    return data
+
+
+def cut_index(x, end_time=END_TIME):
+    '''
+    This function returns the index of the first point of x that is later than end_time. x must be
+    in order, which the time axis of a waveform always is.
+    '''
+    return int(np.searchsorted(x, end_time, side='right'))
+
+
+def load_avg(filepath, end_time=END_TIME):
+    '''
+    This function returns the time and amplitude arrays of an .avg file, cut off at end_time.
+    '''
+    data = read_avg(filepath)
+    x = data[:, 0]
+    y = data[:, 1]
+    end_index = cut_index(x, end_time)
+    return x[0:end_index], y[0:end_index]
@@ -7,6 +7,7 @@ import numpy as np
 
 
 import oscillo_collection_functions
+import avg_files
 
 class App:
     def __init__(self, master):
@@ -106,47 +107,12 @@ class App:
     def get_ref_data(self):
 
         filepath = 'Al_sample_20C_no_DL_5MHz_22dB_12_04_2019_12_18_41131601.avg'
-        my_list_x = []
-        my_list_y = []
-        with open(filepath) as ref_data:
-            line = ref_data.readline()
-            cnt = 1
-            while line:
-                raw_out = line.strip().split()
-                my_list_x.append(float(raw_out[0]))
-                my_list_y.append(float(raw_out[1]))
-                line = ref_data.readline()
-                cnt += 1
-
-        # Slicing data array
-        end_index = [n for n, i in enumerate(my_list_x) if i > 0.000572][0]
-        my_list_x = my_list_x[0:end_index]
-        my_list_y = my_list_y[0:end_index]
-
-        return my_list_x, my_list_y
+        return avg_files.load_avg(filepath, 0.000572)
 
     def get_current_data(self):
 
         filepath = 'Al_sample_75C_no_DL_5MHz_22dB_12_04_2019_17_16_33280082.avg'
-        my_list_x = []
-        my_list_y = []
-        with open(filepath) as ref_data:
-            line = ref_data.readline()
-            cnt = 1
-            while line:
-                ##print("Line {}: {}".format(cnt, line.strip()))
-                raw_out = line.strip().split()
-                my_list_x.append(float(raw_out[0]))
-                my_list_y.append(float(raw_out[1]))
-                line = ref_data.readline()
-                cnt += 1
-
-        # Slicing data array
-        end_index = [n for n, i in enumerate(my_list_x) if i > 0.000572][0]
-        my_list_x = my_list_x[0:end_index]
-        my_list_y = my_list_y[0:end_index]
-
-        return my_list_x, my_list_y
+        return avg_files.load_avg(filepath, 0.000572)
 
 
 
@@ -273,7 +239,7 @@ class App:
         return wind_max_indx
 
     def slicer_index(self, my_list, val):
-        index = [n for n, i in enumerate(my_list) if i > val][0]
+        index = avg_files.cut_index(my_list, val)
         return index
 
 
@@ -306,7 +272,7 @@ class App:
         print(amplitude[1])
 
         # Slicing data array
-        end_index = [n for n, i in enumerate(time) if i > 0.000572][0]
+        end_index = avg_files.cut_index(time, 0.000572)
         time = time[0:end_index]
         amplitude = amplitude[0:end_index]
 
@@ -1,33 +1,17 @@
 
 import peakutils as pu
 import matplotlib.pyplot as plt
+import numpy as np
+import avg_files
 
 def slicer_index (my_list, val):
-    index = [n for n, i in enumerate(my_list) if i > val][0]
+    index = avg_files.cut_index(my_list, val)
     return index
 
 
 def get_ref_data():
     filepath = 'Al_sample_20C_no_DL_5MHz_22dB_12_04_2019_12_18_41131601.avg'
-    my_list_x = []
-    my_list_y = []
-    with open(filepath) as ref_data:
-        line = ref_data.readline()
-        cnt = 1
-        while line:
-            ##print("Line {}: {}".format(cnt, line.strip()))
-            raw_out = line.strip().split()
-            my_list_x.append(float(raw_out[0]))
-            my_list_y.append(float(raw_out[1]))
-            line = ref_data.readline()
-            cnt += 1
-
-    # Slicing data array
-    end_index = [n for n, i in enumerate(my_list_x) if i > 0.000572][0]
-    my_list_x = my_list_x[0:end_index]
-    my_list_y = my_list_y[0:end_index]
-
-    return my_list_x, my_list_y
+    return avg_files.load_avg(filepath, 0.000572)
 
 
 def find_peak(amplitude):
@@ -79,7 +63,7 @@ y_trimmed2 = y[window_2_x_indx[0]:window_2_x_indx[1]]
 # plt.close()
 
 max_value = max(y_trimmed1)
-max_index = y_trimmed1.index(max_value)
+max_index = int(np.argmax(y_trimmed1))
 
 x_loc = window_1_x_indx[0]+max_index
 x_val = x[x_loc]
@@ -16,8 +16,8 @@ from struct import unpack
 #Import numpy. This library contains many methods used in vectorized calculations, and other
 # operations involving arrays.
 import numpy as np
-#Import the visa. This is a library that finds the oscilloscope and allows python to interact with it.
-import visa 
+#Import the module that holds the shared connection to the oscilloscope. (See the oscillo_scope_session.py module.)
+import oscillo_scope_session
 #Import the operating system. This allows python to run terminal commands.
 import os
 #Import datetime. This allows python to create time stamps for naming files. It also allows it to 
@@ -65,50 +65,42 @@ class data_collection():
     def setup_scope(self):
 
         '''
-        This method uses the visa library to identify the oscilloscope instrument. It then
-        creates an object that serves as a handle for the instrument so that other methods 
-        can interact with it. Additionally, this method sends some key settings to the oscilloscope
-        to ensure that the proper data set is retrieved.
+        This method retrieves the shared session for the oscilloscope (see the oscillo_scope_session.py
+        module). The session serves as a handle for the instrument so that other methods can interact
+        with it. The instrument is only opened the first time this method is called. After that, the
+        session just checks that the instrument is still responding. Additionally, this method makes
+        sure that the key settings are in place so that the proper data set is retrieved. Settings that
+        are already in place are not sent again.
         '''
 
         #During development, the oscilloscope was prone to crashing. This try block catches that problem
         # ans alerts the user that the oscilloscope needs to be rebooted.
         try:
 
-            #create a resource manager object. This object contains a list of all the instruments connected to the 
-            # computer.
-            rm = visa.ResourceManager()
-
-            #create an object that acts as a handel for the oscilloscope. The argument presented her is the name of the
-            # oscilloscope that was used during development. If a new oscilloscope is being used, then the name of the new
-            # oscilloscope must be discovered by running the following commands in a terminal.
-            '''
-            >python
-            >>>import visa
-            >>>rm = visa.ResourceManager()
-            >>>rm.list_resources()
-            '''
-            #the last line displays a list of all the instruments connected to the computer. Select the name that corresponds
-            # to the oscilloscope that you are using, and place it here in the argument below.
-            scope = rm.open_resource('USB0::0x0699::0x0378::C011202::INSTR')
+            #retrieve the shared session. If a new oscilloscope is being used, then the name of the new
+            # oscilloscope must be placed in the SCOPE_RESOURCE variable of the oscillo_scope_session.py module.
+            scope = oscillo_scope_session.get_session()
+
+            #open the instrument if it is not open yet, or reconnect to it if it has stopped responding.
+            scope.connect()
 
             #these are settings that the oscilloscope needs in order to collect the spectrum properly
             #The data source needs to be Channel 1 if that is the channel being used.
-            scope.write('DATA:SOU CH1')
+            scope.configure('DATA:SOU CH1')
             #I have no idea what this one does.
-            scope.write('DATA:WIDTH 1')
+            scope.configure('DATA:WIDTH 1')
             #This tells the oscilloscope how to encode the data. Other encoding formats have proven not to work. 
-            scope.write('DATA:ENC RPB')
+            scope.configure('DATA:ENC RPB')
             #The data collected starts at data point 1
-            scope.write('DATA:START 1') 
+            scope.configure('DATA:START 1') 
             #The data collected ends at 1 million data points
-            scope.write('DATA:STOP 1000000') 
+            scope.configure('DATA:STOP 1000000') 
             #Full resolution needs to be collected. If you replace "FULL" with "REDUCED" then the data collection will be faster
             # but you will lose a considerable ammount of resolution.
-            scope.write('DATA:RESOLUTION FULL')
+            scope.configure('DATA:RESOLUTION FULL')
             #This indicates the amount of vertical offeset from the y=0 axis. If this is not set to zero,
             #  then the envelope computation will not work. 
-            scope.write("CH1:OFFSET 0.0E+0") 
+            scope.configure("CH1:OFFSET 0.0E+0") 
 
         except:
             #notify the user that the instrument was not found
@@ -150,12 +142,10 @@ class data_collection():
         
         print("Collecting Data...")
         
-        #I have no idea what this line does, I just know it's necessary. See the programmers manual 
-        # if you really want to know.
-        scope.write('CURVE?')
-        
-        #Retrieve the raw data from the oscilloscope
-        data = scope.read_raw()
+        #Ask the oscilloscope for the waveform data and retrieve the raw bytes. The session sends the
+        # query again if the instrument had to be reconnected. See the programmers manual if you want
+        # to know more about the CURVE? query.
+        data = scope.query_raw('CURVE?')
 
         #These lines remove the header from the data.
         headerlen = 2 + int(data[1])
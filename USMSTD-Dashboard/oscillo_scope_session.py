@@ -0,0 +1,221 @@
+'''
+@author Manish Roy
+
+This module contains the long-lived connection to the oscilloscope. Opening the instrument
+and sending it the collection settings takes a noticable ammount of time, so instead of doing
+this every time a waveform is collected, the connection is opened once and then shared by
+every class in the Oscillo(TM) software package. The session checks that the instrument is
+still responding before it is handed out, and it quietly reconnects if the instrument has
+crashed or been unplugged.
+'''
+
+'''
+Import the libraries and modules that are needed to run the methods in this module.
+'''
+#Import the visa. This is a library that finds the oscilloscope and allows python to interact with it.
+import visa
+#Import the threading library. The lock makes sure two threads never talk to the instrument at the same time.
+import threading
+
+#This is the name of the oscilloscope that was used during development. If a new oscilloscope is being used,
+# then the name of the new oscilloscope must be discovered by running the following commands in a terminal.
+'''
+>python
+>>>import visa
+>>>rm = visa.ResourceManager()
+>>>rm.list_resources()
+'''
+SCOPE_RESOURCE = 'USB0::0x0699::0x0378::C011202::INSTR'
+
+#These are the sessions that have already been opened, keyed by the name of the instrument.
+sessions = {}
+#This lock protects the dictionary of sessions.
+sessions_lock = threading.Lock()
+
+
+def get_session(resource_name=SCOPE_RESOURCE):
+    '''
+    This function returns the shared session for the instrument. The session is created the first
+    time it is requested, and every request after that receives the same object.
+    '''
+    with sessions_lock:
+        #create the session if it does not exist yet
+        if resource_name not in sessions:
+            sessions[resource_name] = scope_session(resource_name)
+        #return the shared session
+        return sessions[resource_name]
+
+
+class scope_session():
+
+    def __init__(self, resource_name):
+        '''
+        Store the name of the instrument. The instrument is not actually opened until
+        it is needed (see the connect method below).
+        '''
+        self.resource_name = resource_name
+        self.resource_manager = None
+        self.scope = None
+        self.idn = None
+        #This dictionary remembers the last value sent for every setting, so that settings
+        # which are already in place don't need to be sent again.
+        self.settings = {}
+        #A re-entrant lock so that a write followed by a read can't be interrupted by another thread.
+        self.lock = threading.RLock()
+
+    def open(self):
+        '''
+        This method opens the instrument and asks it to identify itself. If the instrument
+        can not be found, the error from the visa library is passed on to the caller.
+        '''
+        with self.lock:
+            #create the resource manager only once. It is the slowest part of opening the instrument.
+            if self.resource_manager is None:
+                self.resource_manager = visa.ResourceManager()
+            #create the handle for the oscilloscope
+            self.scope = self.resource_manager.open_resource(self.resource_name)
+            #ask the instrument who it is. This also proves that it is responding.
+            self.idn = self.scope.query('*IDN?').strip()
+
+    def close(self):
+        '''
+        This method closes the handle for the instrument. Errors are ignored because the
+        instrument is often closed precisely because it has stopped responding.
+        '''
+        with self.lock:
+            try:
+                self.scope.close()
+            except:
+                pass
+            self.scope = None
+
+    def reconnect(self):
+        '''
+        This method closes and reopens the instrument, and then sends it every setting that had
+        been sent before. This way the methods using the session never notice that the instrument
+        was reconnected.
+        '''
+        with self.lock:
+            self.close()
+            self.open()
+            #restore the settings that the instrument lost when it crashed
+            for header in self.settings:
+                self.scope.write(self.join_command(header, self.settings[header]))
+
+    def check_health(self):
+        '''
+        This method is a cheap way to find out if the instrument is still responding. The
+        "*OPC?" query returns 1 once the instrument has finished all pending operations.
+        '''
+        with self.lock:
+            try:
+                return self.scope.query('*OPC?').strip() == '1'
+            except:
+                return False
+
+    def connect(self):
+        '''
+        This method makes sure that the session is ready to be used. The instrument is opened the
+        first time this method is called. Every call after that only checks the instrument's health,
+        and reconnects if the instrument has stopped responding.
+        '''
+        with self.lock:
+            if self.scope is None:
+                self.open()
+            elif not self.check_health():
+                self.reconnect()
+
+    def split_command(self, command):
+        '''
+        This method splits a command like "CH1:SCALE 5" into its header and its value.
+        '''
+        parts = command.strip().split(' ', 1)
+        header = parts[0].upper()
+        if len(parts) > 1:
+            value = parts[1].strip()
+        else:
+            value = ''
+        return header, value
+
+    def join_command(self, header, value):
+        '''
+        This method does the opposite of split_command.
+        '''
+        if value == '':
+            return header
+        return header + ' ' + value
+
+    def remember(self, command):
+        '''
+        This method records the value of a setting after it has been sent to the instrument.
+        '''
+        header, value = self.split_command(command)
+        #queries don't change anything on the instrument
+        if header.endswith('?'):
+            return
+        #these commands return the instrument to its factory settings, so everything we
+        # knew about the instrument is no longer true.
+        if header in ('*RST', 'FACTORY'):
+            self.settings = {}
+            return
+        self.settings[header] = value
+
+    def write(self, command):
+        '''
+        This method sends a command to the instrument. If the instrument has crashed, it is
+        reconnected and the command is sent again.
+        '''
+        with self.lock:
+            try:
+                self.scope.write(command)
+            except:
+                self.reconnect()
+                self.scope.write(command)
+            self.remember(command)
+
+    def query(self, command):
+        '''
+        This method sends a query to the instrument and returns the answer. If the instrument
+        has crashed, it is reconnected and the query is sent again.
+        '''
+        with self.lock:
+            try:
+                return self.scope.query(command)
+            except:
+                self.reconnect()
+                return self.scope.query(command)
+
+    def read_raw(self):
+        '''
+        This method reads the raw bytes that the instrument sends after a query. It can not be
+        retried on its own because the query that produced the bytes would be lost. Use query_raw
+        if the query should be retried.
+        '''
+        with self.lock:
+            return self.scope.read_raw()
+
+    def query_raw(self, command):
+        '''
+        This method sends a query and reads back the raw bytes of the answer. It is used to
+        retrieve the waveform data. If the instrument has crashed, it is reconnected and the
+        query is sent again.
+        '''
+        with self.lock:
+            try:
+                self.scope.write(command)
+                return self.scope.read_raw()
+            except:
+                self.reconnect()
+                self.scope.write(command)
+                return self.scope.read_raw()
+
+    def configure(self, command):
+        '''
+        This method sends a setting to the instrument only if the setting is different from
+        the one that was last sent. This makes it cheap to make sure that the instrument is
+        configured correctly before every collection.
+        '''
+        with self.lock:
+            header, value = self.split_command(command)
+            if self.settings.get(header) != value:
+                self.write(command)